@@ -34,7 +34,10 @@ get_ipython().run_line_magic('matplotlib', 'inline')
 #load Evict_FMR_merged dataset
 #path = '/Users/ameliaingram/Documents/My_GitHub+Repository/eviction-rent/assets/data/raw/Evict_FMR_merged.csv'
 
-df = pd.read_csv(r'https://raw.githubusercontent.com/amelia-ingram/eviction-rent/main/assets/data/raw/Evict_FMR_merged.csv')            # read eviction data from online
+#read eviction data from the local mirror; it's only downloaded on the first run
+from eviction_analysis import mirror
+
+df = pd.read_csv(mirror.fetch('Evict_FMR_merged.csv'))
 
 
 #%%
@@ -98,12 +101,11 @@ from folium.plugins import HeatMap
 #%%
 
 
-#load geojson dataset
-from urllib.request import urlopen
+#load the simplified NYC ZCTA polygons from the geometry cache; feature ids are zip codes
+from eviction_analysis import geometry
 
-with urlopen('https://raw.githubusercontent.com/OpenDataDE/State-zip-code-GeoJSON/master/ny_new_york_zip_codes_geo.min.json') as response:
-    geojson = json.load(response)
-#local version: geojson = json.load(open('/Users/ameliaingram/Documents/My_GitHub+Repository/eviction-rent/assets/data/raw/new_york_zip_codes_geo.min.json'))
+geojson = geometry.geojson(zoom=10)
+#statewide version: geojson = json.load(open(mirror.fetch('ny_new_york_zip_codes_geo.min.json')))
 
 
 #%%
@@ -111,7 +113,7 @@ with urlopen('https://raw.githubusercontent.com/OpenDataDE/State-zip-code-GeoJSO
 
 #map eviction filings by zipcode
 fig = px.choropleth(df, geojson=geojson, locations='zipcode', color='filings_2020',
-                           color_continuous_scale="Viridis", featureidkey='properties.ZCTA5CE10',
+                           color_continuous_scale="Viridis", featureidkey='id',
                            range_color=(0, 100),
                            scope="usa", center = {"lat": 40.81, "lon": -73.90},
                            labels={'filings_2020':'# Evictions'}
@@ -130,7 +132,7 @@ fig.show()
 
 #map eviction filings by zipcode
 fig = px.choropleth(df, geojson=geojson, locations='zipcode', color='SAFMR22 2BR',
-                           color_continuous_scale="Viridis",featureidkey='properties.ZCTA5CE10',
+                           color_continuous_scale="Viridis",featureidkey='id',
                            range_color=(0, 100), 
                            zoom=3, center = {"lat": 40.81, "lon": -73.90},
                            opacity=0.5, title='Fair Market Rent 2 BD 2022',
@@ -141,7 +143,7 @@ fig.update_layout(margin={"r":0,"t":5,"l":0,"b":0})
 fig.show()
 
 
-# ### Map using Folium--Not working yet...
+# ### Map using Folium (batch renderer in eviction_analysis.maps)
 
 #%%
 
@@ -170,11 +172,9 @@ df.drop(['count'], axis = 1, inplace = True)
 #%%
 
 
-# Get geojson data file path
-geo_data_file = '/Users/ameliaingram/Documents/My_GitHub+Repository/eviction-rent/data/nyc-zip-code-tabulation-areas-polygons.geojson'
-#load GEOJSON
-with open(geo_data_file, 'r') as jsonFile:
-    geo_data = json.load(jsonFile)
+#load the simplified NYC ZCTA polygons from the geometry cache (built once from
+#assets/data/raw/nyc-zip-code-tabulation-areas-polygons.geojson)
+geo_data = geometry.geojson(zoom=10)
 
 tmp = geo_data
 
@@ -200,38 +200,26 @@ def subgroup_distribution(df, location, racial_majority):
 #%%
 
 
-def map_feature_by_zipcode(zipcode_data, col):
+def map_feature_by_zipcode(cols, periods, out_dir=None):
     """
-    Generates a folium map of NYC
-    :param zipcode_data: zipcode dataset
-    :param col: feature to display
-    :return: m
+    Generates a folium map of NYC per feature and period with the batch renderer
+    :param cols: features to display, e.g. ['filings_2020', 'fmr_2br']
+    :param periods: years or months to display, e.g. [2021, '2021-03']
+    :param out_dir: directory of the maps (defaults to assets/maps)
+    :return: paths of the maps by name
     """
+    from eviction_analysis import maps
 
-    # Initialize Folium Map with NYC latitude and longitude
-    m = folium.Map(location=[40.81, -73.90], zoom_start=9,
-                   detect_retina=True, control_scale=False)
+    specs = [maps.MapSpec(col, period) for col in cols for period in periods]
+    return maps.render_maps(specs, out_dir or maps.MAPS_DIR)
 
-    # Create choropleth map
-    m.choropleth(
-        geo_data=geo_data,
-        name='choropleth',
-        data=zipcode_data,
-        # col: feature of interest
-        columns=['zipcode', 'group_counts', 'group_pcts'],
-        key_on='feature.properties.ZIPCODE',
-        fill_color='OrRd',
-        fill_opacity=0.9,
-        line_opacity=0.2,
-        legend_name='Evictions' + col
-    )
 
-    folium.LayerControl().add_to(m)
+#%%
 
-    # Save map based on feature of interest
-    m.save(col + '.html')
 
-    return m
+# one map per feature per month, written next to a shared geometry file
+# (same as `python -m eviction_analysis maps --metrics ... --periods ...`)
+map_paths = map_feature_by_zipcode(['filings_2020', 'fmr_2br'], [2020, 2021, '2021-03'])
 
 
 # Ended Here
@@ -253,37 +241,13 @@ df2.filings_2020.describe()
 #%%
 
 
-def evict_b(y):                                 
-    '''
-    INPUT: 
-    y: int, from -1 to 550, the inputs of the int variable `filings_2020`
-    
-    OUTPUT:
-    0 recoded to '<1'
-    1-9 recoded to '1-9'
-    10-29 recoded to '10-29'
-    30-59 recoded to '30-59'
-    60-99 recoded to '60-99'
-    >100 recoded to '>100'
-    '''
-    if y == 0:
-        return '0'
-    if y >0 and y<10:
-        return '1-9'
-    elif y >= 10 and y<30:
-        return '10-29'
-    elif y >= 30 and y<60:
-        return '30-59'
-    elif y>=60 and y<100:
-        return '60-99'
-    elif y>=100:
-        return '>100'
-    else:
-        return np.nan                        # missing is coded as nan 
-
-# apply the function to `filings_2020`
-
-df2['filings_cat'] = df2.filings_2020.apply(evict_b)
+# the bins of the old row-wise `evict_b` categorizer are `binning.FILINGS_BINS`
+# (0, 1-9, 10-29, 30-59, 60-99, >100; negative and missing values stay NaN)
+from eviction_analysis import binning
+
+# bin `filings_2020` in one vectorized pass into an ordered categorical
+
+df2['filings_cat'] = binning.bin_values(df2.filings_2020, binning.FILINGS_BINS)
 
 
 #%%
@@ -0,0 +1,13 @@
+from typing import Any
+
+__all__ = ["read_merged", "write_merged"]
+
+
+def __getattr__(name: str) -> Any:
+    # dataset pulls in pandas and Arrow, so it's only imported on first use to
+    # keep `python -m eviction_analysis --help` and friends fast.
+    if name in __all__:
+        from eviction_analysis import dataset
+
+        return getattr(dataset, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
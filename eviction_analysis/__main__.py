@@ -1,17 +1,825 @@
-import pandas as pd
-import etl_evict
+"""Command line interface: `python -m eviction_analysis [command] ...`.
+
+Commands import the modules they run when they're called. pandas, Arrow, and
+the mapping libraries take a second or so to import, which `--help` and
+`cache status` (run by cron and health checks) shouldn't pay for, so only the
+standard library, paths, mirror, and profiling are imported up front and
+defaults that live in heavy modules are resolved inside the commands.
+"""
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Any, Optional
+
+from eviction_analysis import mirror, paths, profiling
+
+
+def _check_choices(name: str, values: Optional[list[str]], choices: list[str]) -> None:
+    """Exit with a usage error if values aren't all in choices."""
+    unknown: list[str] = [value for value in values or [] if value not in choices]
+    if unknown:
+        raise SystemExit(
+            f"Unknown {name}: {', '.join(unknown)} (choose from {', '.join(choices)})"
+        )
+
+
+def run_etl(args: argparse.Namespace) -> None:
+    if args.incremental and args.engine != "pandas":
+        raise SystemExit("Incremental merges are only supported by the pandas engine.")
+    if args.by_city and (args.incremental or args.engine != "pandas"):
+        raise SystemExit("Per city merges only support full runs with pandas.")
+    if args.validate and (args.incremental or args.by_city or args.engine == "arrow"):
+        raise SystemExit("Validation only supports full runs with pandas or polars.")
+
+    from eviction_analysis import binning, dataset, etl_evict, incremental
+
+    # "all" merges every city in the Eviction Lab data.
+    cities: Optional[list[str]] = None if "all" in args.cities else args.cities
 
-if __name__ == "__main__":
     print("Loading data sets to merge")
-    eviction: pd.DataFrame = etl_evict.load_eviction()
-    neighborhoods: pd.DataFrame = etl_evict.load_nyc_neighborhoods()
+    # The city filter and projection are pushed into the CSV reader.
+    columns: list[str] = etl_evict.EVICTION_COLUMNS
+    if args.incremental:
+        columns = columns + ["last_updated"]
+    if args.engine == "arrow":
+        from eviction_analysis import etl_arrow
+
+        # Batches are only read once the merge is consumed by a writer.
+        eviction = etl_arrow.load_eviction(
+            args.eviction, cities=cities, columns=columns
+        )
+    else:
+        eviction = etl_evict.load_eviction(
+            args.eviction, cities=cities, columns=columns, engine=args.engine
+        )
+    sources: etl_evict.Sources = etl_evict.load_sources(
+        fmr_paths=args.fmr,
+        fmr_years=args.fmr_years,
+        zip_tract_path=args.crosswalk,
+        neighborhoods_path=args.neighborhoods,
+        executor=None if args.executor == "none" else args.executor,
+        max_workers=args.workers,
+        # The Arrow engine joins against small tables built from pandas sources.
+        engine="pandas" if args.engine == "arrow" else args.engine,
+    )
+
+    # Binned columns such as filings_cat are derived after the merge.
+    derived: Optional[dict[str, tuple[str, binning.Binning]]] = (
+        binning.DERIVED if args.bins else None
+    )
+    compression: Optional[str] = args.compression or dataset.COMPRESSION
+    write_kwargs: dict[str, Any] = {
+        "compression": None if compression == "none" else compression,
+        "row_group_size": args.row_group_size or dataset.ROW_GROUP_SIZE,
+    }
+
+    if args.by_city:
+        from eviction_analysis import batch
+
+        output: Path = args.output or paths.MERGED_CITIES
+        print(f"Running per city merges into {output}")
+        written: dict[str, int] = batch.merge_cities(
+            eviction,
+            sources,
+            cities,
+            output,
+            executor=None if args.executor == "none" else args.executor,
+            max_workers=args.workers,
+            derived=derived,
+            write_kwargs=write_kwargs,
+        )
+        for city, n_rows in written.items():
+            print(f"{city}: {n_rows} rows")
+        if args.cube is not None or args.snapshot is not None:
+            _write_summaries(
+                args, dataset.read_merged(output, partition_cols=batch.PARTITIONS)
+            )
+        return
+
+    args.output = args.output or paths.MERGED_DATASET
+    if args.incremental:
+        print(f"Running incremental merge into {args.output}")
+        incremental.merge_incremental(
+            eviction,
+            args.output,
+            write_kwargs=write_kwargs,
+            cities=cities,
+            sources=sources,
+            derived=derived,
+        )
+        if args.cube is not None or args.snapshot is not None:
+            # Both are rebuilt from the whole output rather than the delta.
+            _write_summaries(args, dataset.read_merged(args.output))
+        return
+
+    if args.engine == "arrow":
+        print("Running streaming Arrow merge routine")
+        merged = etl_arrow.merge_evic_fmr(
+            eviction, cities=cities, sources=sources, derived=derived
+        )
+        if args.layout in ("file", "both"):
+            print(f"Streaming merged batches into a Parquet file at {args.merged}")
+            etl_arrow.write_parquet(merged, args.merged)
+            # The merge is spent, so the data set is streamed from the file.
+            merged = etl_arrow.read_batches(args.merged)
+        if args.layout in ("dataset", "both"):
+            print(f"Streaming merged batches into a data set in {args.output}")
+            dataset.write_merged(merged, args.output, **write_kwargs)
+        if args.cube is not None or args.snapshot is not None:
+            # The cube is built with pandas, so the output is read back.
+            _write_summaries(
+                args,
+                etl_arrow.to_pandas(etl_arrow.read_batches(args.merged))
+                if args.layout != "dataset"
+                else dataset.read_merged(args.output),
+            )
+        return
+
+    validator: Optional[Any] = None
+    if args.validate:
+        from eviction_analysis import validate
+
+        # Dtypes drift against the previous report at the same path.
+        validator = validate.Validator(
+            args.validate_fraction,
+            args.validate_budget,
+            baseline=validate.load_baseline(args.validate),
+        )
 
     print("Running merge routine")
-    eviction: pd.DataFrame = etl_evict.merge_evic_fmr(
-        eviction, neighborhoods=neighborhoods
+    eviction = etl_evict.merge_evic_fmr(
+        eviction,
+        cities=cities,
+        sources=sources,
+        engine=args.engine,
+        derived=derived,
+        validator=validator,
+    )
+    if args.engine == "polars":
+        # Both writers below take pandas; Arrow backs the conversion.
+        eviction = eviction.to_pandas()
+
+    if args.layout in ("file", "both"):
+        print(f"Saving DataFrame as a Parquet file to {args.merged}")
+        args.merged.parent.mkdir(parents=True, exist_ok=True)
+        with profiling.stage("write_parquet", len(eviction)):
+            eviction.to_parquet(args.merged, engine="pyarrow")
+    if args.layout in ("dataset", "both"):
+        print(f"Saving DataFrame as a partitioned data set in {args.output}")
+        dataset.write_merged(eviction, args.output, **write_kwargs)
+    _write_summaries(args, eviction)
+    if validator is not None:
+        _report_quality(validator, args.validate)
+
+
+def _write_summaries(args: argparse.Namespace, merged: Any) -> None:
+    """Write the Arrow snapshot and the aggregate cube of merged if requested."""
+    from eviction_analysis import cube, snapshot
+
+    if args.snapshot is not None:
+        print(f"Saving an Arrow snapshot for notebooks to {args.snapshot}")
+        snapshot.write_snapshot(merged, args.snapshot)
+    if args.cube is not None:
+        print(f"Building the aggregate cube in {args.cube}")
+        cube.write_cube(cube.build_cube(merged), args.cube)
+
+
+def _report_quality(validator: Any, path: Path) -> None:
+    """Write a validator's report and exit with status 1 if a check failed."""
+    report: dict[str, Any] = validator.write(path)
+    print(f"Data quality {report['status']} ({report['seconds']}s) -> {path}")
+    for check in validator.failed:
+        print(f"{check.status.upper():8}{check.stage}/{check.name}: {check.value}")
+    if validator.failed:
+        raise SystemExit(1)
+
+
+def run_validate(args: argparse.Namespace) -> None:
+    import pandas as pd
+
+    from eviction_analysis import validate
+
+    merged: pd.DataFrame = pd.read_parquet(args.merged)
+    validator = validate.Validator(
+        args.fraction,
+        args.budget,
+        baseline=validate.load_baseline(args.baseline or args.report),
+    )
+    # The sources aren't at hand, so only the merged side of each join is
+    # checked.
+    validator.check_fmr_join(None, merged)
+    if "borough" in merged.columns:
+        validator.check_neighborhoods(merged)
+    validator.check_output(merged)
+    _report_quality(validator, args.report)
+
+
+def run_cache(args: argparse.Namespace) -> None:
+    from eviction_analysis import cache
+
+    sources: list[str] = args.sources or [str(path) for path in paths.FMR_PATHS]
+
+    if args.action == "warm":
+        from eviction_analysis import crosswalk, geometry
+
+        for source in sources:
+            print(f"{source} -> {cache.ensure(source)}")
+        # The crosswalk isn't bundled, so only index it if it's been downloaded.
+        if not args.sources and paths.ZIP_TRACT.exists():
+            crosswalk.load_index(paths.ZIP_TRACT)
+            index: Path = cache.cache_path(paths.ZIP_TRACT, kind=crosswalk.INDEX_KIND)
+            print(f"{paths.ZIP_TRACT} -> {index}")
+        if not args.sources and paths.NYC_ZCTA.exists():
+            for zoom, path in geometry.ensure(paths.NYC_ZCTA).items():
+                print(f"{paths.NYC_ZCTA} (zoom {zoom}) -> {path}")
+        # Likewise, the tract boundaries are only overlaid if they're local.
+        if not args.sources and paths.NY_TRACTS.exists() and paths.NYC_ZCTA.exists():
+            from eviction_analysis import spatial
+
+            spatial.load_weights(paths.NY_TRACTS, paths.NYC_ZCTA)
+            weights: Path = cache.cache_path(paths.NY_TRACTS, kind=spatial.WEIGHTS_KIND)
+            print(f"{paths.NY_TRACTS} + {paths.NYC_ZCTA.name} -> {weights}")
+    elif args.action == "clear":
+        # Only clear everything if the user didn't ask for specific workbooks.
+        for path in cache.invalidate(args.sources or None):
+            print(f"Removed {path}")
+        if not args.sources:
+            from eviction_analysis import memo
+
+            # Memoized loader results are keyed on their sources' mtimes, so
+            # they only need clearing to reclaim space.
+            memo.invalidate()
+            print(f"Removed {memo.MEMO_DIR}")
+    else:
+        stale: bool = False
+        for entry in cache.status(sources):
+            state: str = "fresh" if entry["fresh"] else "stale"
+            state = state if entry["cached"] else "missing"
+            stale |= not entry["fresh"]
+            print(f"{state:8}{entry['source']} -> {entry['cache']}")
+        # Health checks only look at the exit status.
+        if stale and args.check:
+            raise SystemExit(1)
+
+
+def run_bench(args: argparse.Namespace) -> None:
+    from eviction_analysis import bench
+
+    _check_choices("stages", args.stages, list(bench.STAGES))
+    baseline: Path = args.baseline or bench.BASELINE
+    datas: list[bench.BenchData] = [
+        bench.make_synthetic(scale) for scale in args.scales or bench.SCALES
+    ]
+    if args.raw:
+        datas.insert(0, bench.bundled_data())
+
+    results: list[dict[str, Any]] = bench.run(datas, args.stages, args.repeat)
+    print(bench.format_results(results))
+
+    if args.save_baseline:
+        bench.save_baseline(results, baseline)
+        print(f"Saved baseline to {baseline}")
+        return
+
+    regressions: list[str] = bench.compare(
+        results,
+        bench.load_baseline(baseline),
+        args.tolerance if args.tolerance is not None else bench.TIME_TOLERANCE,
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        raise SystemExit(1)
+
+
+def run_mirror(args: argparse.Namespace) -> None:
+    if args.action == "fetch":
+        stored: dict[str, Path] = mirror.fetch_all(
+            args.files or None, refresh=args.refresh, max_workers=args.workers
+        )
+        for filename, path in stored.items():
+            print(f"{filename} -> {path}")
+    elif args.action == "verify":
+        bad: list[str] = mirror.verify()
+        for filename in bad:
+            print(f"corrupt {filename}")
+        if bad:
+            raise SystemExit(1)
+    else:
+        manifest: dict[str, dict[str, Any]] = mirror.read_manifest()
+        for filename, source in mirror.sources().items():
+            entry: dict[str, Any] = manifest.get(filename, {})
+            state: str = "stored" if entry else "missing"
+            if not entry and paths.DATA_DIR.joinpath(filename).exists():
+                state = "local"
+            print(f"{state:8}{filename} <- {entry.get('url', source.url)}")
+
+
+def run_query(args: argparse.Namespace) -> None:
+    from eviction_analysis import cube
+
+    _check_choices("metrics", args.metrics, cube.METRICS)
+    where: dict[str, Any] = {}
+    for condition in args.where:
+        col, _, values = condition.partition("=")
+        # Years and GEOIDs are stored as integers.
+        where[col] = [
+            int(value) if col in ("year", "geoid") else value
+            for value in values.split(",")
+        ]
+
+    result = cube.Cube.load(args.cube).query(args.by, where, args.metrics)
+    print(result.to_csv(index=False) if args.csv else result.to_string(index=False))
+
+
+def run_maps(args: argparse.Namespace) -> None:
+    from eviction_analysis import cube, geometry, maps
+
+    _check_choices("metrics", args.metrics, cube.METRICS)
+    specs: list[maps.MapSpec] = [
+        maps.MapSpec(metric, period, args.statistic)
+        for metric in args.metrics
+        for period in args.periods
+    ]
+    rendered: dict[str, Path] = maps.render_maps(
+        specs,
+        args.output,
+        cube=cube.Cube.load(args.cube),
+        zoom=args.zoom if args.zoom is not None else geometry.DEFAULT_ZOOM,
+        max_workers=args.workers,
+    )
+    for name, path in rendered.items():
+        print(f"{name} -> {path}")
+
+
+def run_serve(args: argparse.Namespace) -> None:
+    from eviction_analysis import serve
+
+    print(f"Serving {args.data} on http://{args.host}:{args.port} (Ctrl-C to stop)")
+    serve.serve(
+        args.data,
+        args.host,
+        args.port,
+        concurrency=args.concurrency or serve.CONCURRENCY,
+        max_pending=args.max_pending,
+        cache_entries=args.cache_entries,
+    )
+
+
+def run_loadtest(args: argparse.Namespace) -> None:
+    from eviction_analysis import serve
+
+    result: dict[str, Any] = serve.load_test(
+        args.url, args.targets or None, args.requests, args.concurrency
+    )
+    for name, value in result.items():
+        print(f"{name:22}{value}")
+    if result["failures"]:
+        raise SystemExit(1)
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="eviction_analysis",
+        description="Merge Eviction Lab and HUD Fair Market Rent data.",
+    )
+    parser.add_argument(
+        "--timings",
+        metavar="{log,PATH}",
+        help="Report per-stage timings to the log or append them to a JSON lines file.",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        metavar="DIR",
+        help="Dump a cProfile and tracemalloc report per stage to DIR.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Never download; files missing locally must be in the mirror.",
+    )
+    commands = parser.add_subparsers(title="commands")
+
+    etl = commands.add_parser("etl", help="Run the merge pipeline (default).")
+    etl.add_argument(
+        "--cities",
+        nargs="+",
+        default=["New York, NY"],
+        metavar="CITY",
+        help='Cities to merge as "City, ST" or "all" (default: "New York, NY").',
+    )
+    etl.add_argument(
+        "--eviction",
+        type=Path,
+        default=paths.EVICTION_REL,
+        help="Eviction Lab monthly CSV.",
+    )
+    etl.add_argument(
+        "--fmr",
+        type=Path,
+        nargs="+",
+        default=paths.FMR_PATHS,
+        metavar="PATH",
+        help="SAFMR workbooks, one per year in --fmr-years.",
+    )
+    etl.add_argument(
+        "--fmr-years",
+        type=int,
+        nargs="+",
+        default=paths.FMR_YEARS,
+        metavar="YEAR",
+        help="Fiscal year of each workbook in --fmr.",
+    )
+    etl.add_argument(
+        "--crosswalk",
+        type=Path,
+        default=paths.ZIP_TRACT,
+        help="HUD USPS zip code to tract crosswalk.",
+    )
+    etl.add_argument(
+        "--neighborhoods",
+        type=Path,
+        default=paths.NYC_BOROUGH,
+        help="NYC zip code boroughs and neighborhoods CSV.",
     )
+    etl.add_argument(
+        "--no-neighborhoods",
+        dest="neighborhoods",
+        action="store_const",
+        const=None,
+        help="Don't merge neighborhoods (borough is left out of the output).",
+    )
+    etl.add_argument(
+        "--executor",
+        choices=["thread", "process", "none"],
+        default="thread",
+        help="Pool used to load the source data sets (and merge cities with "
+        "--by-city) concurrently.",
+    )
+    etl.add_argument(
+        "--workers",
+        type=int,
+        help="Number of loader workers (default: one per source).",
+    )
+    etl.add_argument(
+        "--engine",
+        choices=["pandas", "polars", "arrow"],
+        default="pandas",
+        help="Library used for the ETL. Polars needs the polars extra. Arrow "
+        "streams batches from the CSV to Parquet without pandas.",
+    )
+    etl.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only merge new or updated rows into the partitioned output.",
+    )
+    etl.add_argument(
+        "--by-city",
+        action="store_true",
+        help="Merge each city in its own worker (see --executor) and write it to "
+        "its own partition of --output.",
+    )
+    etl.add_argument(
+        "--output",
+        type=Path,
+        help="Partitioned output directory (default: assets/data/evict_merged, "
+        "or assets/data/evict_cities with --by-city).",
+    )
+    etl.add_argument(
+        "--merged",
+        type=Path,
+        default=paths.MERGED,
+        help="Single Parquet file output.",
+    )
+    etl.add_argument(
+        "--layout",
+        choices=["dataset", "file", "both"],
+        default="both",
+        help="Write the partitioned data set, the single Parquet file, or both.",
+    )
+    etl.add_argument(
+        "--compression",
+        choices=["zstd", "snappy", "gzip", "lz4", "none"],
+        help="Parquet codec of the partitioned data set (default: zstd).",
+    )
+    etl.add_argument(
+        "--row-group-size",
+        type=int,
+        help="Maximum rows per row group of the partitioned data set.",
+    )
+    etl.add_argument(
+        "--no-bins",
+        dest="bins",
+        action="store_false",
+        help="Don't add binned columns such as filings_cat.",
+    )
+    etl.add_argument(
+        "--cube",
+        type=Path,
+        default=paths.MERGED_CUBE,
+        help="Directory of the aggregate cube for dashboard queries.",
+    )
+    etl.add_argument(
+        "--no-cube",
+        dest="cube",
+        action="store_const",
+        const=None,
+        help="Don't build the aggregate cube.",
+    )
+    etl.add_argument(
+        "--snapshot",
+        type=Path,
+        default=paths.SNAPSHOT,
+        help="Arrow IPC snapshot of the merged data for notebooks.",
+    )
+    etl.add_argument(
+        "--no-snapshot",
+        dest="snapshot",
+        action="store_const",
+        const=None,
+        help="Don't write the Arrow snapshot.",
+    )
+    etl.add_argument(
+        "--validate",
+        type=Path,
+        nargs="?",
+        const=paths.QUALITY_REPORT,
+        metavar="REPORT",
+        help="Check each join and write a data quality report (default: "
+        "assets/data/evict_quality.json). Exits with status 1 if a check fails.",
+    )
+    etl.add_argument(
+        "--validate-fraction",
+        type=float,
+        default=1.0,
+        help="Share of GEOIDs to check (default: 1).",
+    )
+    etl.add_argument(
+        "--validate-budget",
+        type=float,
+        metavar="SECONDS",
+        help="Time the checks may take before the rest are skipped.",
+    )
+    etl.set_defaults(func=run_etl)
 
-    print("Saving DataFrame as a Parquet file")
-    eviction.to_parquet(
-        etl_evict.DATA_DIR.parent.joinpath("evict_merged.parquet"), engine="pyarrow"
+    fmr_cache = commands.add_parser(
+        "cache", help="Manage the columnar cache of the SAFMR workbooks."
+    )
+    fmr_cache.add_argument(
+        "action",
+        choices=["warm", "clear", "status"],
+        help="Convert stale workbooks, delete cached files, or report freshness.",
+    )
+    fmr_cache.add_argument(
+        "sources",
+        nargs="*",
+        help="Workbooks to act on. Defaults to the bundled SAFMR workbooks.",
+    )
+    fmr_cache.add_argument(
+        "--check",
+        action="store_true",
+        help="Exit with status 1 if status finds a missing or stale file.",
+    )
+    fmr_cache.set_defaults(func=run_cache)
+
+    downloads = commands.add_parser(
+        "mirror", help="Download the online data sets into the local mirror."
+    )
+    downloads.add_argument(
+        "action",
+        choices=["fetch", "status", "verify"],
+        help="Download missing files, list the mirror, or check its hashes.",
+    )
+    downloads.add_argument(
+        "files",
+        nargs="*",
+        help="File names to fetch. Defaults to every known data set.",
+    )
+    downloads.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ask the servers whether stored files changed.",
+    )
+    downloads.add_argument(
+        "--workers", type=int, default=4, help="Concurrent downloads."
+    )
+    downloads.set_defaults(func=run_mirror)
+
+    queries = commands.add_parser(
+        "query", help="Aggregate filings and FMRs from the aggregate cube."
+    )
+    queries.add_argument(
+        "--by",
+        nargs="*",
+        default=[],
+        help="Columns to group by, e.g. borough year (default: one total row).",
+    )
+    queries.add_argument(
+        "--where",
+        nargs="*",
+        default=[],
+        metavar="COL=VALUE[,VALUE...]",
+        help="Values to keep, e.g. borough=Bronx,Queens year=2021.",
+    )
+    queries.add_argument(
+        "--metrics",
+        nargs="*",
+        help="Metrics to report, e.g. filings_2020 fmr_2br (default: all).",
+    )
+    queries.add_argument(
+        "--cube",
+        type=Path,
+        default=paths.MERGED_CUBE,
+        help="Cube directory written by the ETL.",
+    )
+    queries.add_argument("--csv", action="store_true", help="Print CSV.")
+    queries.set_defaults(func=run_query)
+
+    renders = commands.add_parser(
+        "maps", help="Render a choropleth per metric and period from the cube."
+    )
+    renders.add_argument(
+        "--metrics",
+        nargs="+",
+        default=["filings_2020"],
+        help="Metrics to map.",
+    )
+    renders.add_argument(
+        "--periods",
+        nargs="+",
+        required=True,
+        help="Years (2021) or months (2021-03) to map.",
     )
+    renders.add_argument(
+        "--statistic",
+        choices=["sum", "mean", "min", "max"],
+        default="mean",
+        help="Statistic of each metric per zip code over the period.",
+    )
+    renders.add_argument(
+        "--output",
+        type=Path,
+        default=paths.MAPS_DIR,
+        help="Directory of the maps and their shared geometry.",
+    )
+    renders.add_argument(
+        "--zoom",
+        type=int,
+        help="Zoom level of the cached geometry to use (default: 11).",
+    )
+    renders.add_argument(
+        "--workers",
+        type=int,
+        help="Rendering processes (default: one per CPU, 0 renders in process).",
+    )
+    renders.add_argument(
+        "--cube",
+        type=Path,
+        default=paths.MERGED_CUBE,
+        help="Cube directory written by the ETL.",
+    )
+    renders.set_defaults(func=run_maps)
+
+    quality = commands.add_parser(
+        "validate", help="Check the merged output and write a data quality report."
+    )
+    quality.add_argument(
+        "--merged", type=Path, default=paths.MERGED, help="Merged Parquet file."
+    )
+    quality.add_argument(
+        "--report",
+        type=Path,
+        default=paths.QUALITY_REPORT,
+        help="Report to write, whose previous dtypes are the baseline.",
+    )
+    quality.add_argument(
+        "--baseline", type=Path, help="Earlier report to compare dtypes against."
+    )
+    quality.add_argument(
+        "--fraction", type=float, default=1.0, help="Share of GEOIDs to check."
+    )
+    quality.add_argument(
+        "--budget",
+        type=float,
+        metavar="SECONDS",
+        help="Time the checks may take before the rest are skipped.",
+    )
+    quality.set_defaults(func=run_validate)
+
+    server = commands.add_parser(
+        "serve", help="Serve filter and aggregate queries on the merged data."
+    )
+    server.add_argument(
+        "--data",
+        type=Path,
+        default=paths.MERGED,
+        help="Merged Parquet file, Arrow snapshot, or partitioned data set "
+        "directory.",
+    )
+    server.add_argument("--host", default="127.0.0.1", help="Interface to bind.")
+    server.add_argument("--port", type=int, default=8765, help="Port to bind.")
+    server.add_argument(
+        "--concurrency",
+        type=int,
+        help="Queries that run at once (default: one per CPU).",
+    )
+    server.add_argument(
+        "--max-pending",
+        type=int,
+        default=64,
+        help="Queries that may wait for a slot before requests get 503.",
+    )
+    server.add_argument(
+        "--cache-entries",
+        type=int,
+        default=1024,
+        help="Responses to cache (0 disables the cache).",
+    )
+    server.set_defaults(func=run_serve)
+
+    loadtest = commands.add_parser(
+        "loadtest", help="Send concurrent queries to a running server."
+    )
+    loadtest.add_argument(
+        "--url", default="http://127.0.0.1:8765", help="Base URL of the server."
+    )
+    loadtest.add_argument(
+        "--requests", type=int, default=1000, help="Total requests to send."
+    )
+    loadtest.add_argument(
+        "--concurrency", type=int, default=8, help="Concurrent connections."
+    )
+    loadtest.add_argument(
+        "targets",
+        nargs="*",
+        help="Paths to request in turn, e.g. '/query?by=borough' "
+        "(default: a mix of dashboard queries).",
+    )
+    loadtest.set_defaults(func=run_loadtest)
+
+    benchmarks = commands.add_parser(
+        "bench", help="Benchmark the ETL stages and check for regressions."
+    )
+    benchmarks.add_argument(
+        "--scales",
+        type=int,
+        nargs="*",
+        help="Scales of the synthetic data sets to generate and benchmark "
+        "(default: 1 10 100).",
+    )
+    benchmarks.add_argument(
+        "--no-raw",
+        dest="raw",
+        action="store_false",
+        help="Skip the bundled raw files.",
+    )
+    benchmarks.add_argument(
+        "--stages",
+        nargs="*",
+        help="Stages to run (default: all).",
+    )
+    benchmarks.add_argument(
+        "--repeat", type=int, default=3, help="Timed runs per stage."
+    )
+    benchmarks.add_argument(
+        "--baseline",
+        type=Path,
+        help="Baseline to compare against or save to "
+        "(default: assets/bench/baseline.json).",
+    )
+    benchmarks.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Save the results as the baseline instead of comparing.",
+    )
+    benchmarks.add_argument(
+        "--tolerance",
+        type=float,
+        help="Allowed fractional slowdown before a stage is a regression "
+        "(default: 0.25).",
+    )
+    benchmarks.set_defaults(func=run_bench)
+
+    argv = sys.argv[1:] if argv is None else argv
+    args: argparse.Namespace = parser.parse_args(argv)
+    if not hasattr(args, "func"):
+        # Running without a command runs the ETL with its defaults.
+        args = parser.parse_args(argv + ["etl"])
+    return args
+
+
+if __name__ == "__main__":
+    args: argparse.Namespace = parse_args()
+    if args.offline:
+        os.environ[mirror.OFFLINE_ENV] = "1"
+    if args.timings == "log":
+        logging.basicConfig(level=logging.INFO)
+        profiling.add_hook(profiling.log_hook)
+    elif args.timings:
+        profiling.add_hook(profiling.JsonLinesHook(args.timings))
+    if args.profile:
+        profiling.enable_profiling(args.profile)
+    args.func(args)
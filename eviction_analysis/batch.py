@@ -0,0 +1,164 @@
+"""Batch ETL over every Eviction Lab city.
+
+Running `merge_evic_fmr` once per city reloads the SAFMR workbooks and the
+crosswalk for every city, while a single multi-city call keeps one big frame
+in memory and can only write one output. The batch loads every source once,
+splits the crosswalk index by (city, state) in one pass, merges each city in
+a worker pool, and writes each city to its own top level partition of a Hive
+partitioned data set (`city=Chicago%2C%20IL/year=2021/part-0.parquet`).
+
+A city's partition is written to a staging directory and swapped in as a whole
+with directory renames when it's merged again, so readers never see a mix of
+old and new files, and a nightly run over all sites can be restarted or
+limited to a few cities without touching the others.
+"""
+import logging
+from os import PathLike
+from pathlib import Path
+from typing import Any, Literal, Optional
+
+import pandas as pd
+
+from eviction_analysis import binning, dataset, etl_evict, profiling
+from eviction_analysis.crosswalk import CrosswalkIndex, parse_place
+from eviction_analysis.jobs import Jobs, run_jobs
+from eviction_analysis.paths import MERGED_CITIES
+
+# Partition columns of the batch output in directory order
+PARTITIONS: list[str] = ["city"] + dataset.PARTITIONS
+
+
+def split_sources(
+    sources: etl_evict.Sources, cities: list[str]
+) -> list[etl_evict.Sources]:
+    """Restrict the crosswalk and FMRs to each city.
+
+    Parameters
+    ----------
+    sources: etl_evict.Sources
+        Data sets from `etl_evict.load_sources`.
+    cities: list[str]
+        Cities as "City, ST."
+
+    Returns
+    -------
+    list[etl_evict.Sources]
+        Sources per city in the order of cities. Neighborhoods are shared.
+    """
+    places: list[tuple[str, str]] = [parse_place(city) for city in cities]
+    indexes: list[CrosswalkIndex] = sources.crosswalk.split(
+        [city for city, _ in places], [state for _, state in places]
+    )
+    return [
+        etl_evict.Sources(
+            fmrs=[
+                fmr.loc[fmr.zipcode.isin(index.zipcodes()), :] for fmr in sources.fmrs
+            ],
+            crosswalk=index,
+            neighborhoods=sources.neighborhoods,
+        )
+        for index in indexes
+    ]
+
+
+def merge_city(
+    evictions: pd.DataFrame,
+    city: str,
+    sources: etl_evict.Sources,
+    output: str | PathLike[str] = MERGED_CITIES,
+    derived: Optional[dict[str, tuple[str, binning.Binning]]] = None,
+    write_kwargs: Optional[dict[str, Any]] = None,
+) -> int:
+    """Merge one city and replace its partition of output.
+
+    The city's directory is swapped in whole by `dataset.replace_partitions`.
+    A city without any merged rows has its partition deleted instead.
+
+    Returns
+    -------
+    int
+        Rows written.
+    """
+    merged: pd.DataFrame = etl_evict.merge_evic_fmr(
+        evictions, cities=city, sources=sources, derived=derived
+    )
+    if merged.empty:
+        logging.warning(f"No merged rows for {city}")
+        dataset.drop_partition(output, PARTITIONS[0], city)
+        return 0
+
+    dataset.replace_partitions(merged, output, PARTITIONS, **(write_kwargs or {}))
+    return len(merged)
+
+
+@profiling.instrument()
+def merge_cities(
+    evictions: pd.DataFrame,
+    sources: etl_evict.Sources,
+    cities: Optional[list[str]] = None,
+    output: str | PathLike[str] = MERGED_CITIES,
+    executor: Optional[Literal["thread", "process"]] = "process",
+    max_workers: Optional[int] = None,
+    derived: Optional[dict[str, tuple[str, binning.Binning]]] = None,
+    write_kwargs: Optional[dict[str, Any]] = None,
+) -> dict[str, int]:
+    """Merge and write every city with sources loaded once.
+
+    Parameters
+    ----------
+    evictions: pandas.DataFrame
+        Eviction Lab data from `etl_evict.load_eviction`.
+    sources: etl_evict.Sources
+        Data sets from `etl_evict.load_sources`, shared by every city.
+    cities: Optional[list[str]]
+        Cities to merge as "City, ST." Every city in evictions is merged if
+        None.
+    output: str | PathLike[str]
+        Output directory partitioned by PARTITIONS.
+    executor: Optional[Literal["thread", "process"]]
+        Merge cities in a process pool, a thread pool, or sequentially if
+        None. The merge mostly holds the GIL, so processes scale better.
+    max_workers: Optional[int]
+        Number of workers. Defaults to one per CPU.
+    derived: Optional[dict[str, tuple[str, binning.Binning]]]
+        Binned columns to add, as in `etl_evict.merge_evic_fmr`.
+    write_kwargs: Optional[dict[str, Any]]
+        Passed to `dataset.write_merged`, e.g. compression.
+
+    Returns
+    -------
+    dict[str, int]
+        Rows written per city.
+
+    Raises
+    ------
+    RuntimeError
+        A city failed to merge. The message names the city and the original
+        exception is chained.
+    """
+    output = Path(output)
+    names: pd.Series = evictions.city.astype(str)
+    if cities is None:
+        cities = sorted(names.unique())
+
+    # Each worker only receives its own rows and sources.
+    rows: dict[str, pd.DataFrame] = {
+        city: group for city, group in evictions.groupby(names.to_numpy(), sort=False)
+    }
+    jobs: Jobs = {
+        city: (
+            merge_city,
+            (
+                rows.get(city, evictions.iloc[:0]),
+                city,
+                city_sources,
+                output,
+                derived,
+                write_kwargs,
+            ),
+        )
+        for city, city_sources in zip(cities, split_sources(sources, cities))
+    }
+    logging.info(f"Merging {len(jobs)} cities into {output}")
+
+    return run_jobs(jobs, executor, max_workers, "merge")
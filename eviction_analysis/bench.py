@@ -0,0 +1,549 @@
+"""Benchmarks of the ETL stages against bundled and synthetic data.
+
+Each stage (loading, merging, writing) runs in a fresh process so that its
+peak RSS isn't inflated by whatever ran before it. Inputs are prepared in the
+same process before the clock starts, so wall time only covers the stage
+itself while peak RSS includes the inputs, like it does in the real pipeline.
+
+Synthetic data mimics the layout of the Eviction Lab CSV, the SAFMR workbooks,
+and the HUD crosswalk. Scale 1 is roughly the size of the New York slice and
+every other scale multiplies the number of zip codes, tracts, and cities.
+Results can be saved as a baseline and later runs are flagged if they're
+slower or bigger than the baseline by more than a tolerance.
+"""
+import json
+import logging
+import platform
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from os import PathLike
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from eviction_analysis import (
+    cache,
+    dataset,
+    etl_arrow,
+    etl_evict,
+    profiling,
+    schemas,
+)
+
+## Relative paths
+SYNTHETIC_DIR: Path = etl_evict.DATA_DIR.parent.joinpath("synthetic")
+BASELINE: Path = etl_evict.PKG_DIR.joinpath("assets", "bench", "baseline.json")
+
+SCALES: list[int] = [1, 10, 100]
+# Synthetic zip codes, tracts per zip code, and cities at scale 1
+BASE_ZIPS: int = 200
+TRACTS_PER_ZIP: int = 4
+BASE_CITIES: int = 4
+MONTHS: pd.DatetimeIndex = pd.date_range("2020-01-01", "2021-12-01", freq="MS")
+# Bumped whenever make_synthetic's output changes so that stale data sets are
+# generated again.
+SYNTHETIC_VERSION: int = 2
+
+# Runs slower or bigger than the baseline by more than these fractions are
+# regressions.
+TIME_TOLERANCE: float = 0.25
+RSS_TOLERANCE: float = 0.10
+
+
+class BenchData(NamedTuple):
+    """Input files of a benchmark run."""
+
+    name: str
+    eviction: Path
+    fmr_paths: list[Path]
+    fmr_years: list[int]
+    zip_tract: Path
+    neighborhoods: Path
+
+
+def bundled_data() -> BenchData:
+    """The raw files used by the pipeline."""
+    return BenchData(
+        "raw",
+        etl_evict.EVICTION_REL,
+        etl_evict.FMR_PATHS,
+        etl_evict.FMR_YEARS,
+        etl_evict.ZIP_TRACT,
+        etl_evict.NYC_BOROUGH,
+    )
+
+
+def _generator_fingerprint(seed: int) -> dict[str, Any]:
+    """What make_synthetic's output depends on besides the scale."""
+    return {
+        "version": SYNTHETIC_VERSION,
+        "seed": seed,
+        "fmr_headers": {
+            str(year): [column.variants[0] for column in layout.columns]
+            for year, layout in schemas.FMR_SCHEMAS.items()
+        },
+    }
+
+
+def _read_marker(path: Path) -> Optional[dict[str, Any]]:
+    """Fingerprint stored in a completion marker, if it's readable."""
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def make_synthetic(
+    scale: int, out_dir: Path = SYNTHETIC_DIR, seed: int = 0
+) -> BenchData:
+    """Generate (or reuse) synthetic inputs at scale.
+
+    Parameters
+    ----------
+    scale: int
+        Multiplier of the number of zip codes, tracts, and cities.
+    out_dir: Path
+        Parent directory. Each scale is written to its own subdirectory and
+        reused if it's already complete and was generated by this version
+        with the same seed.
+    seed: int
+        Seed of the random number generator.
+
+    Returns
+    -------
+    BenchData
+        Paths of the generated files.
+    """
+    out: Path = out_dir.joinpath(f"{scale}x")
+    data: BenchData = BenchData(
+        f"synthetic-{scale}x",
+        out.joinpath("evictions.csv"),
+        [out.joinpath(f"fy{year}_safmrs.xlsx") for year in etl_evict.FMR_YEARS],
+        etl_evict.FMR_YEARS,
+        out.joinpath("zip_tract.xlsx"),
+        out.joinpath("neighborhoods.csv"),
+    )
+    # Written last, so it marks a complete set of files. It also records
+    # what generated them, since files from an older generator or for other
+    # SAFMR layouts fail to load.
+    done: Path = out.joinpath(".complete")
+    generator: dict[str, Any] = _generator_fingerprint(seed)
+    if done.exists() and _read_marker(done) == generator:
+        return data
+
+    logging.info(f"Generating {data.name} benchmark data in {out}")
+    out.mkdir(parents=True, exist_ok=True)
+    rng: np.random.Generator = np.random.default_rng(seed)
+
+    n_zips: int = BASE_ZIPS * scale
+    # New York, NY is always first because it's what the pipeline filters on.
+    cities: list[str] = ["New York, NY"] + [
+        f"City {i}, S{i % 10}" for i in range(1, BASE_CITIES * scale)
+    ]
+    zipcodes: np.ndarray = 10_000 + np.arange(n_zips) * 7
+    zip_city: np.ndarray = rng.integers(0, len(cities), n_zips)
+    # A quarter of every scale is in New York so the merge grows with it.
+    zip_city[: n_zips // 4] = 0
+    # Tracts are 11 digit GEOIDs; a few of them straddle two zip codes.
+    tracts: np.ndarray = 36_000_000_000 + np.arange(n_zips * TRACTS_PER_ZIP)
+    tract_zip: np.ndarray = np.repeat(np.arange(n_zips), TRACTS_PER_ZIP)
+    shared: np.ndarray = rng.choice(len(tracts), len(tracts) // 10, replace=False)
+
+    city_state: pd.DataFrame = (
+        pd.Series(cities).str.upper().str.split(", ", expand=True)
+    )
+    zip_tract: pd.DataFrame = pd.DataFrame(
+        {
+            "ZIP": np.concatenate(
+                [zipcodes[tract_zip], zipcodes[tract_zip[shared] - 1]]
+            ),
+            "TRACT": np.concatenate([tracts, tracts[shared]]),
+            "USPS_ZIP_PREF_CITY": city_state[0].to_numpy()[
+                zip_city[np.concatenate([tract_zip, tract_zip[shared] - 1])]
+            ],
+            "USPS_ZIP_PREF_STATE": city_state[1].to_numpy()[
+                zip_city[np.concatenate([tract_zip, tract_zip[shared] - 1])]
+            ],
+            "RES_RATIO": rng.random(len(tracts) + len(shared)).round(4),
+        }
+    )
+    zip_tract.to_excel(data.zip_tract, index=False)
+
+    # SAFMR headers in each year's registered layout (FY2022's for years
+    # without one) so that layout detection is part of the benchmark.
+    for path, year in zip(data.fmr_paths, data.fmr_years):
+        rent: np.ndarray = rng.integers(900, 4_000, n_zips)
+        layout: schemas.SourceSchema = schemas.FMR_SCHEMAS.get(
+            year, schemas.FMR_SCHEMAS[max(schemas.FMR_SCHEMAS)]
+        )
+        headers: dict[str, str] = {
+            column.name: column.variants[0] for column in layout.columns
+        }
+        pd.DataFrame(
+            {
+                headers["zipcode"]: zipcodes,
+                "HUD Area Code": "METRO00000M00000",
+                headers["fmr_2br"]: rent,
+                headers["fmr_2br_90"]: (rent * 0.9).round(),
+                headers["fmr_2br_110"]: (rent * 1.1).round(),
+            }
+        ).to_excel(path, index=False)
+
+    ny: np.ndarray = zipcodes[zip_city == 0]
+    pd.DataFrame(
+        {
+            "zip": ny,
+            "borough": rng.choice(
+                ["Bronx", "Brooklyn", "Manhattan", "Queens", "Staten Island"],
+                len(ny),
+            ),
+            "post_office": "New York, NY",
+            "neighborhood": [f"Neighborhood {i % 40}" for i in range(len(ny))],
+            "population": rng.integers(1_000, 100_000, len(ny)),
+            "density": rng.integers(1_000, 100_000, len(ny)),
+        }
+    ).to_csv(data.neighborhoods, index=False)
+
+    # One row per GEOID per month. Zip codes and tracts are both GEOIDs and
+    # some zip codes are sealed.
+    geoids: np.ndarray = np.concatenate([zipcodes, tracts])
+    geoid_city: np.ndarray = np.concatenate([zip_city, zip_city[tract_zip]])
+    kinds: np.ndarray = np.repeat(["Zip Code", "Census Tract"], [n_zips, len(tracts)])
+    n_geoids: int = len(geoids)
+    n_rows: int = n_geoids * len(MONTHS)
+
+    labels: np.ndarray = geoids.astype(str).astype(object)
+    labels[rng.random(n_geoids) < 0.02] = "sealed"
+    pd.DataFrame(
+        {
+            "city": np.asarray(cities, dtype=object)[np.tile(geoid_city, len(MONTHS))],
+            "type": np.tile(kinds, len(MONTHS)),
+            "GEOID": np.tile(labels, len(MONTHS)),
+            "racial_majority": rng.choice(
+                ["White", "Black", "Latinx", "Asian", "Other"], n_geoids
+            )[np.tile(np.arange(n_geoids), len(MONTHS))],
+            # Months are written like Eviction Lab's, e.g. "01/2020."
+            "month": np.repeat(MONTHS.strftime(etl_evict.MONTH_FORMAT), n_geoids),
+            "filings_2020": rng.integers(0, 200, n_rows),
+            "filings_avg": rng.random(n_rows).round(2) * 100,
+            "last_updated": "2022-06-01",
+        }
+    ).to_csv(data.eviction, index=False)
+
+    done.write_text(json.dumps(generator, indent=2))
+    return data
+
+
+## Stages
+# Each stage has a setup that prepares its inputs (untimed) and a run that's
+# timed. Setups return the arguments of the run.
+
+
+def _setup_eviction(data: BenchData) -> tuple:
+    return (data.eviction,)
+
+
+def _run_eviction(path: Path) -> int:
+    evictions: pd.DataFrame = etl_evict.load_eviction(
+        path, cities="New York, NY", columns=etl_evict.EVICTION_COLUMNS
+    )
+    return len(evictions)
+
+
+def _setup_fmr(data: BenchData) -> tuple:
+    # Warm the cache so only the read is timed.
+    for path in data.fmr_paths:
+        cache.ensure(path)
+    return (data.fmr_paths, data.fmr_years, True)
+
+
+def _setup_fmr_excel(data: BenchData) -> tuple:
+    return (data.fmr_paths, data.fmr_years, False)
+
+
+def _run_fmr(paths: list[Path], years: list[int], use_cache: bool) -> int:
+    return sum(
+        len(etl_evict.load_fmr(path, year, cache=use_cache))
+        for path, year in zip(paths, years)
+    )
+
+
+def _setup_sources(data: BenchData) -> tuple:
+    _setup_fmr(data)
+    return (data,)
+
+
+def _run_sources(data: BenchData) -> int:
+    sources: etl_evict.Sources = etl_evict.load_sources(
+        data.fmr_paths, data.fmr_years, data.zip_tract, data.neighborhoods
+    )
+    return sum(len(fmr) for fmr in sources.fmrs) + len(sources.crosswalk)
+
+
+def _setup_merge(data: BenchData) -> tuple:
+    return (
+        etl_evict.load_eviction(
+            data.eviction, cities="New York, NY", columns=etl_evict.EVICTION_COLUMNS
+        ),
+        etl_evict.load_sources(
+            data.fmr_paths, data.fmr_years, data.zip_tract, data.neighborhoods
+        ),
+    )
+
+
+def _run_merge(evictions: pd.DataFrame, sources: etl_evict.Sources) -> int:
+    return len(etl_evict.merge_evic_fmr(evictions, sources=sources))
+
+
+def _setup_merge_all(data: BenchData) -> tuple:
+    return (
+        etl_evict.load_eviction(data.eviction, columns=etl_evict.EVICTION_COLUMNS),
+        etl_evict.load_sources(
+            data.fmr_paths, data.fmr_years, data.zip_tract, data.neighborhoods
+        ),
+    )
+
+
+def _run_merge_all(evictions: pd.DataFrame, sources: etl_evict.Sources) -> int:
+    # Every city, like a national run.
+    return len(etl_evict.merge_evic_fmr(evictions, None, sources=sources))
+
+
+def _setup_write(data: BenchData) -> tuple:
+    evictions, sources = _setup_merge(data)
+    merged: pd.DataFrame = etl_evict.merge_evic_fmr(evictions, sources=sources)
+    out: Path = SYNTHETIC_DIR.joinpath("output", data.name)
+    out.mkdir(parents=True, exist_ok=True)
+    return (merged, out)
+
+
+def _run_write_file(merged: pd.DataFrame, out: Path) -> int:
+    merged.to_parquet(out.joinpath("evict_merged.parquet"), engine="pyarrow")
+    return len(merged)
+
+
+def _run_write_dataset(merged: pd.DataFrame, out: Path) -> int:
+    dataset.write_merged(merged, out.joinpath("evict_merged"))
+    return len(merged)
+
+
+def _setup_arrow(data: BenchData) -> tuple:
+    sources: etl_evict.Sources = etl_evict.load_sources(
+        data.fmr_paths, data.fmr_years, data.zip_tract, data.neighborhoods
+    )
+    out: Path = SYNTHETIC_DIR.joinpath("output", data.name)
+    out.mkdir(parents=True, exist_ok=True)
+    return (data.eviction, sources, out)
+
+
+def _run_arrow(path: Path, sources: etl_evict.Sources, out: Path) -> int:
+    # CSV to Parquet end to end, comparable to load_eviction + merge_evic_fmr
+    # + write_parquet.
+    batches = etl_arrow.load_eviction(
+        path, cities="New York, NY", columns=etl_evict.EVICTION_COLUMNS
+    )
+    return etl_arrow.write_parquet(
+        etl_arrow.merge_evic_fmr(batches, sources=sources),
+        out.joinpath("evict_merged_arrow.parquet"),
+    )
+
+
+STAGES: dict[str, tuple[Callable[[BenchData], tuple], Callable[..., int]]] = {
+    "load_eviction": (_setup_eviction, _run_eviction),
+    "load_fmr_excel": (_setup_fmr_excel, _run_fmr),
+    "load_fmr": (_setup_fmr, _run_fmr),
+    "load_sources": (_setup_sources, _run_sources),
+    "merge_evic_fmr": (_setup_merge, _run_merge),
+    "merge_all_cities": (_setup_merge_all, _run_merge_all),
+    "write_parquet": (_setup_write, _run_write_file),
+    "write_dataset": (_setup_write, _run_write_dataset),
+    "arrow_pipeline": (_setup_arrow, _run_arrow),
+}
+
+
+def _required(data: BenchData, stage: str) -> list[Path]:
+    """Input files of stage."""
+    fmrs: list[Path] = list(data.fmr_paths)
+    if stage == "load_eviction":
+        return [data.eviction]
+    if stage.startswith("load_fmr"):
+        return fmrs
+    if stage == "load_sources":
+        return fmrs + [data.zip_tract, data.neighborhoods]
+    return fmrs + [data.eviction, data.zip_tract, data.neighborhoods]
+
+
+def _traced_peak(run: Callable[..., int], args: tuple) -> int:
+    """Peak bytes allocated through Python and numpy during one more run.
+
+    Peak RSS only grows, so it can't tell a stage's peak from its setup's.
+    tracemalloc counts the stage alone, though not Arrow's own allocations.
+    """
+    tracemalloc.start()
+    try:
+        run(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _measure(data: BenchData, stage: str, repeat: int) -> dict[str, Any]:
+    """Run stage in this process. Meant to be run in a fresh worker."""
+    setup, run = STAGES[stage]
+    args: tuple = setup(data)
+    setup_rss: int = profiling.peak_rss()
+
+    times: list[float] = []
+    rows: int = 0
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        rows = run(*args)
+        times.append(time.perf_counter() - start)
+    peak_rss: int = profiling.peak_rss()
+
+    return {
+        "data": data.name,
+        "stage": stage,
+        "rows": rows,
+        "seconds": min(times),
+        "mean_seconds": sum(times) / len(times),
+        "setup_rss_mb": setup_rss / 2**20,
+        "peak_rss_mb": peak_rss / 2**20,
+        "traced_peak_mb": _traced_peak(run, args) / 2**20,
+    }
+
+
+def run(
+    datas: list[BenchData],
+    stages: Optional[list[str]] = None,
+    repeat: int = 3,
+) -> list[dict[str, Any]]:
+    """Benchmark stages against each data set.
+
+    Parameters
+    ----------
+    datas: list[BenchData]
+        Inputs from `bundled_data` or `make_synthetic`.
+    stages: Optional[list[str]]
+        Names from STAGES. Every stage is run if None.
+    repeat: int
+        Timed runs per stage. The fastest is reported as seconds.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        One result per data set and stage with the rows produced, seconds,
+        mean_seconds, setup_rss_mb (peak before timing), peak_rss_mb, and
+        traced_peak_mb (tracemalloc peak of the stage alone).
+        Stages whose inputs are missing are skipped.
+    """
+    results: list[dict[str, Any]] = []
+    for data in datas:
+        for stage in stages or list(STAGES):
+            missing: list[Path] = [
+                path for path in _required(data, stage) if not Path(path).exists()
+            ]
+            if missing:
+                logging.warning(f"Skipping {stage} on {data.name}; missing {missing}")
+                continue
+
+            logging.info(f"Benchmarking {stage} on {data.name}")
+            # Spawned so every stage starts from a clean interpreter.
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=get_context("spawn")
+            ) as pool:
+                results.append(pool.submit(_measure, data, stage, repeat).result())
+
+    return results
+
+
+def _key(result: dict[str, Any]) -> str:
+    return f"{result['data']}/{result['stage']}"
+
+
+def save_baseline(
+    results: list[dict[str, Any]], path: str | PathLike[str] = BASELINE
+) -> None:
+    """Save results as the baseline, keeping entries that weren't rerun."""
+    path = Path(path)
+    baseline: dict[str, Any] = load_baseline(path)
+    baseline.update({_key(result): result for result in results})
+    baseline["_machine"] = {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+    }
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True))
+
+
+def load_baseline(path: str | PathLike[str] = BASELINE) -> dict[str, Any]:
+    """Saved baseline keyed by "data/stage", or empty if there isn't one."""
+    path = Path(path)
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def compare(
+    results: list[dict[str, Any]],
+    baseline: dict[str, Any],
+    time_tolerance: float = TIME_TOLERANCE,
+    rss_tolerance: float = RSS_TOLERANCE,
+) -> list[str]:
+    """Regressions of results against baseline.
+
+    Parameters
+    ----------
+    results: list[dict[str, Any]]
+        Output of `run`.
+    baseline: dict[str, Any]
+        Output of `load_baseline`. Results without a baseline are ignored.
+    time_tolerance: float
+        Allowed fractional increase of seconds.
+    rss_tolerance: float
+        Allowed fractional increase of peak_rss_mb.
+
+    Returns
+    -------
+    list[str]
+        One message per regression.
+    """
+    regressions: list[str] = []
+    for result in results:
+        previous: Optional[dict[str, Any]] = baseline.get(_key(result))
+        if previous is None:
+            continue
+
+        for metric, tolerance in [
+            ("seconds", time_tolerance),
+            ("peak_rss_mb", rss_tolerance),
+        ]:
+            ratio: float = result[metric] / max(previous[metric], 1e-9)
+            if ratio > 1 + tolerance:
+                regressions.append(
+                    f"{_key(result)}: {metric} {previous[metric]:.3f} -> "
+                    f"{result[metric]:.3f} ({ratio - 1:+.0%})"
+                )
+
+    return regressions
+
+
+def format_results(results: list[dict[str, Any]]) -> str:
+    """Results as a plain text table."""
+    header: str = (
+        f"{'data':18}{'stage':16}{'rows':>10}{'seconds':>10}{'peak MiB':>10}"
+        f"{'traced MiB':>12}"
+    )
+    lines: list[str] = [header, "-" * len(header)]
+    for result in results:
+        # Baselines saved before traced peaks were recorded don't have them.
+        traced: float = result.get("traced_peak_mb", float("nan"))
+        lines.append(
+            f"{result['data']:18}{result['stage']:16}{result['rows']:>10}"
+            f"{result['seconds']:>10.3f}{result['peak_rss_mb']:>10.1f}"
+            f"{traced:>12.1f}"
+        )
+    return "\n".join(lines)
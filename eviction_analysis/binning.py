@@ -0,0 +1,162 @@
+"""Vectorized binning of numeric columns into ordered categories.
+
+The mapping notebook binned filings with `df.filings_2020.apply(evict_b)`, a
+Python if/elif chain per row. Bins are instead described by their edges and
+labels, and a whole column is binned with one binary search
+(`numpy.searchsorted`) into the codes of an ordered categorical.
+
+Bins are closed on the left, like `evict_b`, and the last bin is open ended
+unless it's given an upper edge. Values below the first edge, at or past the
+upper edge, and missing values aren't binned (NaN).
+"""
+import logging
+from typing import Any, Literal, NamedTuple, Optional
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from eviction_analysis import profiling
+
+
+class Binning(NamedTuple):
+    """Edges and labels of ordered bins.
+
+    Bin i covers [edges[i], edges[i + 1]) and the last bin covers
+    [edges[-1], upper), or (edges[i], edges[i + 1]] and so on if closed is
+    "right."
+    """
+
+    edges: list[float]
+    labels: list[str]
+    closed: Literal["left", "right"] = "left"
+    upper: float = np.inf
+
+
+# evict_b from the mapping notebook: 0, 1-9, 10-29, 30-59, 60-99, and >100.
+# The first bin only holds zero because the next edge is the smallest float
+# above it, so fractional filings under 1 land in "1-9" just like in evict_b.
+FILINGS_BINS: Binning = Binning(
+    edges=[0.0, float(np.nextafter(0.0, 1.0)), 10.0, 30.0, 60.0, 100.0],
+    labels=["0", "1-9", "10-29", "30-59", "60-99", ">100"],
+)
+# Derived columns added by the ETL: output column -> (input column, bins)
+DERIVED: dict[str, tuple[str, Binning]] = {
+    "filings_cat": ("filings_2020", FILINGS_BINS),
+}
+
+
+def bin_codes(values: Any, binning: Binning) -> npt.NDArray[np.int8]:
+    """Bin index of each value or -1 if it isn't binned.
+
+    Parameters
+    ----------
+    values: Any
+        Numbers as an array, Series, or anything numpy can convert.
+        Nullable pandas arrays are fine.
+    binning: Binning
+        Bins to sort values into.
+
+    Returns
+    -------
+    npt.NDArray[np.int8]
+        Codes that line up with binning.labels.
+    """
+    if len(binning.edges) != len(binning.labels):
+        raise ValueError(
+            f"Bins need one label per edge; got {len(binning.edges)} edges and "
+            f"{len(binning.labels)} labels."
+        )
+
+    numbers: npt.NDArray[np.float64] = (
+        pd.to_numeric(pd.Series(values, copy=False))
+        .to_numpy(np.float64, na_value=np.nan)
+        .reshape(-1)
+    )
+    edges: npt.NDArray[np.float64] = np.asarray(binning.edges, dtype=np.float64)
+
+    # Left closed bins: the last edge <= value. Right closed: the last edge < value.
+    side: Literal["left", "right"] = "right" if binning.closed == "left" else "left"
+    codes: npt.NDArray[np.intp] = np.searchsorted(edges, numbers, side=side) - 1
+
+    outside: npt.NDArray[np.bool_] = np.isnan(numbers)
+    # An infinite upper edge keeps infinity in the last bin, as in evict_b.
+    if np.isfinite(binning.upper) and binning.closed == "left":
+        outside |= numbers >= binning.upper
+    elif np.isfinite(binning.upper):
+        outside |= numbers > binning.upper
+    codes[outside] = -1
+
+    return codes.astype(np.int8)
+
+
+def bin_values(values: Any, binning: Binning) -> pd.Categorical:
+    """Bin values into an ordered categorical.
+
+    Parameters
+    ----------
+    values: Any
+        Numbers as an array, Series, or anything numpy can convert.
+    binning: Binning
+        Bins to sort values into.
+
+    Returns
+    -------
+    pandas.Categorical
+        Ordered categorical of binning.labels. Values that aren't binned are
+        NaN.
+    """
+    return pd.Categorical.from_codes(
+        bin_codes(values, binning), categories=binning.labels, ordered=True
+    )
+
+
+@profiling.instrument()
+def add_bins(df: Any, derived: Optional[dict[str, tuple[str, Binning]]] = None) -> Any:
+    """Add binned columns to a pandas or Polars DataFrame.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame | polars.DataFrame
+        Data with the columns to bin.
+    derived: Optional[dict[str, tuple[str, Binning]]]
+        Output column -> (input column, bins). Defaults to DERIVED. Input
+        columns that df doesn't have are skipped.
+
+    Returns
+    -------
+    pandas.DataFrame | polars.DataFrame
+        df with the binned columns as ordered categoricals (Enums in Polars).
+    """
+    derived = derived if derived is not None else DERIVED
+    derived = {
+        name: (col, binning)
+        for name, (col, binning) in derived.items()
+        if col in df.columns
+    }
+    logging.info(f"Binning {list(derived)}")
+
+    if isinstance(df, pd.DataFrame):
+        return df.assign(
+            **{
+                name: bin_values(df[col].to_numpy(), binning)
+                for name, (col, binning) in derived.items()
+            }
+        )
+
+    # Only the Polars engine gets here.
+    import polars as pl
+
+    return df.with_columns(
+        [
+            # Code -1 picks the trailing None.
+            pl.Series(
+                name,
+                np.asarray(binning.labels + [None], dtype=object)[
+                    bin_codes(df[col].to_numpy(), binning)
+                ],
+                dtype=pl.Enum(binning.labels),
+            )
+            for name, (col, binning) in derived.items()
+        ]
+    )
@@ -0,0 +1,304 @@
+"""Columnar cache for the HUD Small Area Fair Market Rent workbooks.
+
+Parsing the SAFMR Excel files through openpyxl is by far the slowest part of
+the pipeline, and the parse is thrown away after `load_fmr` keeps four
+columns. The workbooks are converted once into Parquet files that record the
+source's path, mtime, size, and SHA-256 in their schema metadata. A cached file
+is rebuilt only when its source changes.
+"""
+import hashlib
+import json
+import logging
+import os
+from os import PathLike
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from eviction_analysis import profiling
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+## Relative paths
+CACHE_DIR: Path = (
+    Path(__file__).parents[1].resolve().joinpath("assets", "data", "cache")
+)
+
+# Key used to store the source's fingerprint in the Parquet schema metadata.
+METADATA_KEY: bytes = b"eviction_analysis.source"
+
+
+def _file_digest(path: str | PathLike[str]) -> str:
+    """SHA-256 hex digest of a file read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def fingerprint(source: str | PathLike[str], content: bool = True) -> dict[str, Any]:
+    """Identify a source file by path, modification time, size, and content.
+
+    Parameters
+    ----------
+    source: str | PathLike[str]
+        File to fingerprint.
+    content: bool
+        Hash the file's content as well. Defaults to True.
+
+    Returns
+    -------
+    dict[str, Any]
+        The resolved path, mtime in nanoseconds, size in bytes, and (if
+        requested) the SHA-256 of the file.
+    """
+    path: Path = Path(source).resolve()
+    stat: os.stat_result = path.stat()
+    result: dict[str, Any] = {
+        "path": str(path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+    }
+    if content:
+        result["sha256"] = _file_digest(path)
+
+    return result
+
+
+def cache_path(
+    source: str | PathLike[str], cache_dir: Path = CACHE_DIR, kind: str = ""
+) -> Path:
+    """Path of the cached Parquet file for source.
+
+    The file name is keyed on the source's resolved path so that workbooks
+    with the same name in different directories don't clobber each other.
+    kind distinguishes other artifacts derived from the same source, such as
+    the crosswalk index.
+    """
+    path: Path = Path(source).resolve()
+    key: str = hashlib.sha1(str(path).encode()).hexdigest()[:12]
+    return cache_dir.joinpath(f"{path.stem}-{key}{kind}.parquet")
+
+
+def cached_fingerprint(
+    source: str | PathLike[str], cache_dir: Path = CACHE_DIR, kind: str = ""
+) -> Optional[dict[str, Any]]:
+    """Fingerprint stored in source's cached file or None if it isn't cached."""
+    path: Path = cache_path(source, cache_dir, kind)
+    if not path.exists():
+        return None
+
+    metadata: Optional[dict[bytes, bytes]] = pq.read_schema(path).metadata
+    if not metadata or METADATA_KEY not in metadata:
+        return None
+
+    return json.loads(metadata[METADATA_KEY])
+
+
+def write_cached(table: pa.Table, path: Path, source_fp: dict[str, Any]) -> None:
+    """Atomically write table to path with the source fingerprint attached."""
+    metadata: dict[bytes, bytes] = dict(table.schema.metadata or {})
+    metadata[METADATA_KEY] = json.dumps(source_fp).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp: Path = path.with_suffix(f".{os.getpid()}.tmp")
+    pq.write_table(table, temp)
+    os.replace(temp, path)
+
+
+@profiling.instrument()
+def convert_excel(source: str | PathLike[str], cache_dir: Path = CACHE_DIR) -> Path:
+    """Convert an Excel workbook into a typed Parquet file in cache_dir.
+
+    Parameters
+    ----------
+    source: str | PathLike[str]
+        Excel workbook to convert. Only the first sheet is converted.
+    cache_dir: Path
+        Directory that holds the cache.
+
+    Returns
+    -------
+    Path
+        Path to the converted file.
+    """
+    # pandas is only needed to parse workbooks, so `cache status` skips it.
+    import pandas as pd
+
+    logging.info(f"Converting {source} into the columnar cache.")
+    source_fp: dict[str, Any] = fingerprint(source)
+
+    df: pd.DataFrame = pd.read_excel(source)
+    # Excel headers may be numbers (years!) and columns may mix types, neither
+    # of which Arrow likes.
+    df.columns = df.columns.astype(str)
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].astype("string")
+
+    path: Path = cache_path(source, cache_dir)
+    write_cached(pa.Table.from_pandas(df, preserve_index=False), path, source_fp)
+    return path
+
+
+def check(
+    source: str | PathLike[str], cache_dir: Path = CACHE_DIR, kind: str = ""
+) -> tuple[bool, Optional[dict[str, Any]]]:
+    """Check whether source's cached file is up to date without touching it.
+
+    A matching mtime and size is trusted without hashing. Otherwise, the
+    content hash decides.
+
+    Returns
+    -------
+    tuple[bool, Optional[dict[str, Any]]]
+        Whether the cached file is fresh and, if only the mtime changed (e.g. a
+        fresh checkout), the source's current fingerprint so a writer can
+        refresh the stale one. The fingerprint is None otherwise.
+    """
+    cached: Optional[dict[str, Any]] = cached_fingerprint(source, cache_dir, kind)
+    if cached is None:
+        return False, None
+
+    current: dict[str, Any] = fingerprint(source, content=False)
+    if current["mtime_ns"] == cached["mtime_ns"] and current["size"] == cached["size"]:
+        return True, None
+
+    current["sha256"] = _file_digest(source)
+    if current["sha256"] != cached.get("sha256"):
+        return False, None
+
+    return True, current
+
+
+def is_fresh(
+    source: str | PathLike[str], cache_dir: Path = CACHE_DIR, kind: str = ""
+) -> bool:
+    """Check whether source's cached file is up to date. Never writes."""
+    return check(source, cache_dir, kind)[0]
+
+
+def revalidate(
+    source: str | PathLike[str], cache_dir: Path = CACHE_DIR, kind: str = ""
+) -> bool:
+    """Check whether source's cached file is up to date and refresh it.
+
+    If only the source's mtime changed, the cached fingerprint is rewritten so
+    the next check is cheap again. Only callers that (re)build the cached file should use this; read-only
+    commands like `cache status` use `is_fresh`.
+    """
+    fresh, current = check(source, cache_dir, kind)
+    if current is not None:
+        logging.debug(
+            f"Only the mtime of {source} changed; refreshing its fingerprint."
+        )
+        path: Path = cache_path(source, cache_dir, kind)
+        write_cached(pq.read_table(path), path, current)
+
+    return fresh
+
+
+def ensure(source: str | PathLike[str], cache_dir: Path = CACHE_DIR) -> Path:
+    """Return the cached file for source, (re)building it if it's stale."""
+    if not revalidate(source, cache_dir):
+        return convert_excel(source, cache_dir)
+
+    return cache_path(source, cache_dir)
+
+
+def header(source: str | PathLike[str], cache_dir: Path = CACHE_DIR) -> list[str]:
+    """Header row of a cached workbook, converting it first if needed.
+
+    Only the Parquet footer is read.
+    """
+    return pq.read_schema(ensure(source, cache_dir)).names
+
+
+def read_columns(
+    source: str | PathLike[str], columns: list[str], cache_dir: Path = CACHE_DIR
+) -> "pd.DataFrame":
+    """Read columns of a cached workbook.
+
+    Parameters
+    ----------
+    source: str | PathLike[str]
+        Excel workbook. It's converted first if it's not cached yet.
+    columns: list[str]
+        Headers of the columns to read, e.g. from `schemas.detect`.
+    cache_dir: Path
+        Directory that holds the cache.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Requested columns in the order of columns.
+    """
+    path: Path = ensure(source, cache_dir)
+    logging.debug(f"Cached columns selected from {path}: {columns}")
+
+    return pq.read_table(path, columns=columns).to_pandas()
+
+
+def invalidate(
+    sources: Optional[list[str | PathLike[str]]] = None, cache_dir: Path = CACHE_DIR
+) -> list[Path]:
+    """Delete cached files.
+
+    Parameters
+    ----------
+    sources: Optional[list[str | PathLike[str]]]
+        Workbooks whose cached files (including derived artifacts) should be
+        removed. Every cached file is removed if None.
+    cache_dir: Path
+        Directory that holds the cache.
+
+    Returns
+    -------
+    list[Path]
+        Files that were deleted.
+    """
+    # Derived artifacts (kinds) share the stem of the source's cached file.
+    paths: list[Path] = (
+        [
+            path
+            for source in sources
+            for path in sorted(
+                cache_dir.glob(f"{cache_path(source, cache_dir).stem}*.parquet")
+            )
+        ]
+        if sources is not None
+        else sorted(cache_dir.glob("*.parquet"))
+    )
+
+    removed: list[Path] = []
+    for path in paths:
+        if path.exists():
+            logging.info(f"Removing cached file {path}")
+            path.unlink()
+            removed.append(path)
+
+    return removed
+
+
+def status(
+    sources: list[str | PathLike[str]], cache_dir: Path = CACHE_DIR
+) -> list[dict[str, Any]]:
+    """Report whether each source is cached and fresh."""
+    report: list[dict[str, Any]] = []
+    for source in sources:
+        path: Path = cache_path(source, cache_dir)
+        report.append(
+            {
+                "source": str(source),
+                "cache": str(path),
+                "cached": path.exists(),
+                "fresh": Path(source).exists() and is_fresh(source, cache_dir),
+            }
+        )
+
+    return report
@@ -0,0 +1,414 @@
+"""Sorted GEOID lookup built from the HUD zip code to census tract crosswalk.
+
+Eviction Lab GEOIDs are a mix of zip codes and census tracts while the FMRs
+are only issued per zip code. The crosswalk used to be merged into every FMR
+frame and melted so that both kinds of GEOID were in one column, which blew up
+the row count before the main merge. The index instead maps every GEOID (zip
+code or tract) to its zip codes with a binary search over sorted integer keys.
+"""
+import logging
+from os import PathLike
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from eviction_analysis import cache, memo, mirror, profiling
+
+# Artifact name of the persisted index in the cache.
+INDEX_KIND: str = ".index"
+
+
+def parse_place(city: str) -> tuple[str, str]:
+    """Split an Eviction Lab city ("New York, NY") into the crosswalk's lower
+    cased city and state ("new york", "ny")."""
+    name, _, state = city.lower().rpartition(", ")
+    return name, state
+
+
+def expand(
+    keys: npt.NDArray[np.int64], queries: npt.NDArray[np.int64]
+) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.intp]]:
+    """Find every match of each query in sorted keys.
+
+    This is an inner join of queries against a sorted, possibly duplicated,
+    key column without building a hash table.
+
+    Parameters
+    ----------
+    keys: npt.NDArray[np.int64]
+        Sorted keys.
+    queries: npt.NDArray[np.int64]
+        Keys to look up in any order.
+
+    Returns
+    -------
+    tuple[npt.NDArray[np.intp], npt.NDArray[np.intp]]
+        Position of the query and position of the matching key for each
+        match. Queries are in ascending order and keys keep their sorted order
+        within a query.
+    """
+    lower: npt.NDArray[np.intp] = np.searchsorted(keys, queries, side="left")
+    upper: npt.NDArray[np.intp] = np.searchsorted(keys, queries, side="right")
+    counts: npt.NDArray[np.intp] = upper - lower
+
+    query_pos: npt.NDArray[np.intp] = np.repeat(np.arange(len(queries)), counts)
+    # Offset of each match within its query's run of matches
+    starts: npt.NDArray[np.intp] = np.cumsum(counts) - counts
+    offsets: npt.NDArray[np.intp] = np.arange(len(query_pos)) - np.repeat(
+        starts, counts
+    )
+    key_pos: npt.NDArray[np.intp] = np.repeat(lower, counts) + offsets
+
+    return query_pos, key_pos
+
+
+class CrosswalkIndex:
+    """GEOID to zip code, city, and state lookup.
+
+    Every zip code maps to itself and every tract maps to each zip code it
+    overlaps. Keys are sorted so that lookups are binary searches.
+
+    Parameters
+    ----------
+    geoid: npt.NDArray[np.int64]
+        Sorted zip codes and tracts.
+    zipcode: npt.NDArray[np.int64]
+        Zip code for each GEOID.
+    city: pandas.Categorical
+        Lower cased USPS city for each GEOID.
+    state: pandas.Categorical
+        Lower cased USPS state for each GEOID.
+    """
+
+    def __init__(
+        self,
+        geoid: npt.NDArray[np.int64],
+        zipcode: npt.NDArray[np.int64],
+        city: pd.Categorical,
+        state: pd.Categorical,
+    ) -> None:
+        self.geoid = geoid
+        self.zipcode = zipcode
+        self.city = city
+        self.state = state
+
+    def __len__(self) -> int:
+        return len(self.geoid)
+
+    @classmethod
+    def from_zip_tract(cls, zip_tract: pd.DataFrame) -> "CrosswalkIndex":
+        """Build the index from the output of `etl_evict.load_zip_city`."""
+        zip_tract = zip_tract.dropna(subset=["zipcode"])
+        tracts: pd.DataFrame = zip_tract.dropna(subset=["tract"])
+
+        geoid: npt.NDArray[np.int64] = np.concatenate(
+            [
+                zip_tract.zipcode.to_numpy(np.int64),
+                tracts.tract.to_numpy(np.int64),
+            ]
+        )
+        zipcode: npt.NDArray[np.int64] = np.concatenate(
+            [
+                zip_tract.zipcode.to_numpy(np.int64),
+                tracts.zipcode.to_numpy(np.int64),
+            ]
+        )
+        city: pd.Categorical = pd.Categorical(
+            np.concatenate([zip_tract.city.to_numpy(), tracts.city.to_numpy()])
+        )
+        state: pd.Categorical = pd.Categorical(
+            np.concatenate([zip_tract.state.to_numpy(), tracts.state.to_numpy()])
+        )
+
+        # Zip codes repeat once per tract in the crosswalk, so duplicated
+        # entries are dropped before sorting.
+        frame: pd.DataFrame = pd.DataFrame(
+            {"geoid": geoid, "zipcode": zipcode, "city": city, "state": state}
+        )
+        frame = frame.drop_duplicates().sort_values(
+            ["geoid", "zipcode"], kind="stable", ignore_index=True
+        )
+        return cls(
+            frame.geoid.to_numpy(),
+            frame.zipcode.to_numpy(),
+            frame.city.array,
+            frame.state.array,
+        )
+
+    @classmethod
+    def read(cls, path: str | PathLike[str]) -> "CrosswalkIndex":
+        """Read a persisted index."""
+        frame: pd.DataFrame = pq.read_table(path).to_pandas()
+        return cls(
+            frame.geoid.to_numpy(),
+            frame.zipcode.to_numpy(),
+            frame.city.array,
+            frame.state.array,
+        )
+
+    def to_arrow(self) -> pa.Table:
+        """Index as an Arrow table with dictionary encoded cities and states."""
+        return pa.table(
+            {
+                "geoid": self.geoid,
+                "zipcode": self.zipcode,
+                "city": pa.DictionaryArray.from_pandas(self.city),
+                "state": pa.DictionaryArray.from_pandas(self.state),
+            }
+        )
+
+    def _place_codes(
+        self, cities: list[str], states: list[str]
+    ) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int64]]:
+        """Pack (city, state) pairs into integers.
+
+        Returns the code of each entry's pair and the code of each requested
+        pair, or -1 for requested pairs the index has never seen.
+        """
+        n_states: int = len(self.state.categories) + 1
+        # Missing cities or states (code -1) shift to 0 so codes stay unique.
+        entries: npt.NDArray[np.int64] = (self.city.codes.astype(np.int64) + 1) * (
+            n_states
+        ) + (self.state.codes.astype(np.int64) + 1)
+
+        city_codes: npt.NDArray[np.intp] = self.city.categories.get_indexer(cities)
+        state_codes: npt.NDArray[np.intp] = self.state.categories.get_indexer(states)
+        requested: npt.NDArray[np.int64] = np.where(
+            (city_codes >= 0) & (state_codes >= 0),
+            (city_codes.astype(np.int64) + 1) * n_states + state_codes + 1,
+            -1,
+        )
+        return entries, requested
+
+    def _take(self, positions: npt.NDArray[np.intp]) -> "CrosswalkIndex":
+        """Index of the entries at sorted positions."""
+        return CrosswalkIndex(
+            self.geoid[positions],
+            self.zipcode[positions],
+            self.city[positions],
+            self.state[positions],
+        )
+
+    def filter(self, cities: list[str], states: list[str]) -> "CrosswalkIndex":
+        """Keep entries whose (city, state) pair is one of zip(cities, states).
+
+        Cities and states are matched as pairs, so asking for Portland, OR and
+        Springfield, MA doesn't also keep Portland, ME or Springfield, OR.
+
+        Parameters
+        ----------
+        cities: list[str]
+            Lower cased city names.
+        states: list[str]
+            Lower cased state abbreviation of each city.
+
+        Returns
+        -------
+        CrosswalkIndex
+            Filtered index which is still sorted.
+        """
+        entries, requested = self._place_codes(cities, states)
+        return self._take(np.flatnonzero(np.isin(entries, requested[requested >= 0])))
+
+    def split(self, cities: list[str], states: list[str]) -> list["CrosswalkIndex"]:
+        """Filter the index to each (city, state) pair in one pass.
+
+        Equivalent to `[self.filter([city], [state]) for ...]` but the
+        entries are only grouped once, which matters for batches of many
+        cities.
+
+        Returns
+        -------
+        list[CrosswalkIndex]
+            Sorted index per pair in the order requested. Pairs that aren't
+            in the crosswalk get an empty index.
+        """
+        entries, requested = self._place_codes(cities, states)
+        # A stable sort keeps each pair's entries in GEOID order.
+        order: npt.NDArray[np.intp] = np.argsort(entries, kind="stable")
+        grouped: npt.NDArray[np.int64] = entries[order]
+        lower: npt.NDArray[np.intp] = np.searchsorted(grouped, requested, side="left")
+        upper: npt.NDArray[np.intp] = np.searchsorted(grouped, requested, side="right")
+
+        return [
+            self._take(order[start:stop] if code >= 0 else order[:0])
+            for code, start, stop in zip(requested, lower, upper)
+        ]
+
+    def zipcodes(self) -> npt.NDArray[np.int64]:
+        """Unique zip codes in the index."""
+        return np.unique(self.zipcode)
+
+    def lookup(
+        self, geoids: npt.NDArray[np.int64], fallback: bool = True
+    ) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.int64]]:
+        """Map GEOIDs to zip codes.
+
+        Parameters
+        ----------
+        geoids: npt.NDArray[np.int64]
+            GEOIDs to look up. Negative values are treated as missing.
+        fallback: bool
+            GEOIDs missing from the index are used as zip codes as-is. This
+            matches zip codes that have FMRs but aren't in the crosswalk.
+
+        Returns
+        -------
+        tuple[npt.NDArray[np.intp], npt.NDArray[np.int64]]
+            Position of each GEOID and one of its zip codes per match, ordered
+            by position.
+        """
+        query_pos, key_pos = expand(self.geoid, geoids)
+        zipcode: npt.NDArray[np.int64] = self.zipcode[key_pos]
+
+        if fallback:
+            missing: npt.NDArray[np.bool_] = np.ones(len(geoids), dtype=np.bool_)
+            missing[query_pos] = False
+            missing &= geoids >= 0
+            missing_pos: npt.NDArray[np.intp] = np.flatnonzero(missing)
+
+            query_pos = np.concatenate([query_pos, missing_pos])
+            zipcode = np.concatenate([zipcode, geoids[missing_pos]])
+            order: npt.NDArray[np.intp] = np.argsort(query_pos, kind="stable")
+            query_pos, zipcode = query_pos[order], zipcode[order]
+
+        return query_pos, zipcode
+
+
+@profiling.instrument()
+@memo.memoize()
+def load_index(
+    path: str | PathLike[str], cache_dir: Path = cache.CACHE_DIR
+) -> CrosswalkIndex:
+    """Load the crosswalk index for the crosswalk at path.
+
+    The index is persisted next to the SAFMR cache and rebuilt only when the
+    crosswalk changes, so the crosswalk workbook is only parsed once.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Path to the HUD zip code to census tract crosswalk.
+    cache_dir: Path
+        Directory that holds the cache.
+
+    Returns
+    -------
+    CrosswalkIndex
+        Index over every entry of the crosswalk.
+    """
+    path = mirror.locate(path)
+    index_path: Path = cache.cache_path(path, cache_dir, INDEX_KIND)
+    if cache.revalidate(path, cache_dir, INDEX_KIND):
+        logging.info(f"Loading crosswalk index from {index_path}")
+        return CrosswalkIndex.read(index_path)
+
+    # Imported here because etl_evict depends on this module.
+    from eviction_analysis.etl_evict import load_zip_city
+
+    source_fp: dict = cache.fingerprint(path)
+    index: CrosswalkIndex = CrosswalkIndex.from_zip_tract(load_zip_city(path))
+    logging.info(f"Saving crosswalk index with {len(index)} keys to {index_path}")
+    cache.write_cached(index.to_arrow(), index_path, source_fp)
+
+    return index
+
+
+@profiling.instrument()
+def attach(
+    evictions: pd.DataFrame,
+    fmrs: pd.DataFrame,
+    index: CrosswalkIndex,
+    values: Optional[list[str]] = None,
+    columns: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """Left join FMRs onto Eviction Lab rows through the crosswalk.
+
+    Each eviction row is matched to every FMR of the same year for any zip
+    code its GEOID maps to. Duplicate FMR values for the same row, which the
+    crosswalk produces when a zip code spans many tracts, are collapsed.
+
+    The join is computed on row positions, so the only copies are the final
+    gathers of the eviction and FMR columns.
+
+    Parameters
+    ----------
+    evictions: pandas.DataFrame
+        Eviction Lab data with "geoid" and "month." The index is ignored.
+    fmrs: pandas.DataFrame
+        Concatenated FMRs with "zipcode" and "fmr_year."
+    index: CrosswalkIndex
+        Crosswalk index, filtered to the cities of interest if needed.
+    values: Optional[list[str]]
+        FMR columns to attach. Defaults to every column except the keys.
+    columns: Optional[list[str]]
+        Eviction Lab columns to keep. Defaults to every column.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Eviction Lab rows with FMR columns and a fresh RangeIndex. Rows
+        without any FMR are kept with missing values like a left join.
+    """
+    if values is None:
+        values = [col for col in fmrs.columns if col not in ("zipcode", "fmr_year")]
+    if columns is None:
+        columns = list(evictions.columns)
+
+    n_rows: int = len(evictions)
+    geoids: npt.NDArray[np.int64] = evictions.geoid.astype("Int64").to_numpy(
+        np.int64, na_value=-1
+    )
+    years: npt.NDArray[np.int64] = evictions.month.dt.year.to_numpy(np.int64)
+
+    # GEOID -> zip code
+    row_pos, zipcode = index.lookup(geoids)
+
+    # (zip code, year) -> FMR. Years fit in four digits so the pair packs
+    # into one sortable integer.
+    fmr_zip: npt.NDArray[np.int64] = fmrs.zipcode.astype("Int64").to_numpy(
+        np.int64, na_value=-1
+    )
+    fmr_keys: npt.NDArray[np.int64] = fmr_zip * 10_000 + fmrs.fmr_year.to_numpy(
+        np.int64
+    )
+    valid: npt.NDArray[np.intp] = np.flatnonzero(fmr_zip >= 0)
+    fmr_order: npt.NDArray[np.intp] = valid[np.argsort(fmr_keys[valid], kind="stable")]
+    match_pos, fmr_pos = expand(fmr_keys[fmr_order], zipcode * 10_000 + years[row_pos])
+    row_pos, fmr_pos = row_pos[match_pos], fmr_order[fmr_pos]
+
+    # Identical FMR values for the same row are collapsed by packing the row
+    # and an id of the distinct values into one key. The first match is kept.
+    value_ids: npt.NDArray[np.int64] = (
+        fmrs.groupby(values, dropna=False, sort=False).ngroup().to_numpy(np.int64)
+    )
+    n_ids: int = int(value_ids.max()) + 1 if len(value_ids) else 1
+    _, first = np.unique(row_pos * n_ids + value_ids[fmr_pos], return_index=True)
+    keep: npt.NDArray[np.intp] = np.sort(first)
+    row_pos, fmr_pos = row_pos[keep], fmr_pos[keep]
+
+    # Rows without a match are kept once with missing FMRs (position -1).
+    unmatched: npt.NDArray[np.intp] = np.setdiff1d(np.arange(n_rows), row_pos)
+    rows: npt.NDArray[np.intp] = np.concatenate([row_pos, unmatched])
+    fmr_take: npt.NDArray[np.intp] = np.concatenate(
+        [fmr_pos, np.full(len(unmatched), -1, dtype=np.intp)]
+    )
+    order: npt.NDArray[np.intp] = np.argsort(rows, kind="stable")
+    rows, fmr_take = rows[order], fmr_take[order]
+
+    result: pd.DataFrame = evictions.iloc[rows, evictions.columns.get_indexer(columns)]
+    result.index = pd.RangeIndex(len(rows))
+    attached: pd.DataFrame = pd.DataFrame(
+        {
+            col: pd.api.extensions.take(fmrs[col].to_numpy(), fmr_take, allow_fill=True)
+            for col in values
+        },
+        index=result.index,
+    )
+
+    return pd.concat([result, attached], axis="columns")
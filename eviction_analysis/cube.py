@@ -0,0 +1,276 @@
+"""Precomputed aggregates of the merged data for dashboard queries.
+
+Maps and summaries used to group the row level merged frame for every plot
+(`groupby("zipcode").aggregate(np.mean)` and friends). The cube instead
+aggregates filings and FMRs once per GEOID × month × borough × racial
+majority at ETL time and rolls them up to coarser levels (GEOID × year,
+borough × month, borough × year, and year). New York's GEOIDs are all zip
+codes, so the finest level is per zip code there. A query is answered from the
+smallest level that has every column it groups or filters on, so it never
+touches row level data.
+
+Every level stores sums, non-null counts, minimums, and maximums, which roll
+up exactly, and means are derived from them when a query is answered.
+
+Filings are counted once per Eviction Lab observation. A row can fan out to
+several FMRs in the merge (a tract spanning zip codes), so the filings of the
+extra rows are left out while all of their FMRs are kept.
+"""
+import logging
+import os
+import shutil
+from os import PathLike
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from eviction_analysis import profiling
+from eviction_analysis.etl_evict import EVICTION_COLUMNS, MERGED_CUBE
+
+# Grain of the cube
+DIMENSIONS: list[str] = ["geoid", "month", "borough", "racial_majority"]
+FILINGS: list[str] = ["filings_2020", "filings_avg"]
+FMRS: list[str] = ["fmr_2br", "fmr_2br_90", "fmr_2br_110"]
+METRICS: list[str] = FILINGS + FMRS
+# Levels from finest to coarsest. Queries use the coarsest level that covers
+# them, so rollups should only ever drop columns.
+LEVELS: dict[str, list[str]] = {
+    "zip_month": DIMENSIONS,
+    "zip_year": ["geoid", "year", "borough", "racial_majority"],
+    "borough_month": ["borough", "month"],
+    "borough_year": ["borough", "year"],
+    "year": ["year"],
+}
+# How each stored statistic rolls up
+STATISTICS: dict[str, str] = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+
+
+def _measures(metrics: list[str] = METRICS) -> dict[str, str]:
+    """Stored measure columns and how they roll up."""
+    measures: dict[str, str] = {"rows": "sum"}
+    for metric in metrics:
+        for statistic, func in STATISTICS.items():
+            measures[f"{metric}_{statistic}"] = func
+    return measures
+
+
+def _group(
+    df: pd.DataFrame, keys: list[str], aggregations: dict[str, Any]
+) -> pd.DataFrame:
+    """Group df by keys, keeping null keys as groups.
+
+    pandas drops null categories even with dropna=False, so categorical keys
+    are grouped by their codes and turned back into categoricals.
+    """
+    categories: dict[str, pd.Index] = {
+        col: df[col].cat.categories
+        for col in keys
+        if isinstance(df[col].dtype, pd.CategoricalDtype)
+    }
+    coded: pd.DataFrame = df.assign(**{col: df[col].cat.codes for col in categories})
+    grouped: pd.DataFrame = (
+        coded.groupby(keys, dropna=False, sort=True).agg(**aggregations).reset_index()
+    )
+    for col, values in categories.items():
+        grouped[col] = pd.Categorical.from_codes(grouped[col], values)
+    return grouped.set_index(keys)
+
+
+def _rollup(df: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    """Aggregate a level to keys."""
+    return _group(
+        df,
+        keys,
+        {col: (col, func) for col, func in _measures().items() if col in df.columns},
+    )
+
+
+@profiling.instrument()
+def build_cube(merged: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Aggregate the merged data at every level in LEVELS.
+
+    Parameters
+    ----------
+    merged: pandas.DataFrame
+        Output of `etl_evict.merge_evic_fmr` or `dataset.read_merged`.
+        borough is missing if neighborhoods weren't merged, in which case it's
+        null throughout the cube.
+
+    Returns
+    -------
+    dict[str, pandas.DataFrame]
+        Each level indexed by its columns in sorted order.
+    """
+    logging.info(f"Building the aggregate cube from {len(merged)} rows")
+
+    # Fanned out copies of an observation have the same Eviction Lab columns.
+    observation: pd.Series = ~merged.duplicated(
+        subset=[col for col in EVICTION_COLUMNS if col in merged.columns]
+    )
+    borough: pd.Series = (
+        merged.borough
+        if "borough" in merged.columns
+        else pd.Series(pd.Categorical([None] * len(merged)), index=merged.index)
+    )
+
+    columns: dict[str, Any] = {
+        "geoid": merged.geoid.astype("Int64"),
+        "month": merged.month,
+        "borough": borough,
+        "racial_majority": merged.racial_majority,
+        "rows": observation.astype(np.int32),
+    }
+    for metric in FILINGS:
+        columns[metric] = merged[metric].where(observation)
+    for metric in FMRS:
+        columns[metric] = merged[metric]
+    frame: pd.DataFrame = pd.DataFrame(columns)
+
+    aggregations: dict[str, tuple[str, str]] = {"rows": ("rows", "sum")}
+    for metric in METRICS:
+        for statistic in STATISTICS:
+            aggregations[f"{metric}_{statistic}"] = (metric, statistic)
+    base: pd.DataFrame = _group(frame, DIMENSIONS, aggregations)
+
+    levels: dict[str, pd.DataFrame] = {"zip_month": base}
+    flat: pd.DataFrame = base.reset_index()
+    flat["year"] = flat.month.dt.year.astype(np.int16)
+    for name, keys in LEVELS.items():
+        if name != "zip_month":
+            levels[name] = _rollup(flat, keys)
+
+    return levels
+
+
+def write_cube(
+    levels: dict[str, pd.DataFrame], path: str | PathLike[str] = MERGED_CUBE
+) -> None:
+    """Write each level as `{path}/{level}.parquet`.
+
+    The directory is staged next to path and swapped in so that readers never
+    see a mix of old and new levels.
+    """
+    path = Path(path)
+    logging.info(f"Writing aggregate cube to {path}")
+
+    staging: Path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    for name, level in levels.items():
+        level.reset_index().to_parquet(
+            staging.joinpath(f"{name}.parquet"), engine="pyarrow", index=False
+        )
+
+    previous: Path = path.with_name(f".{path.name}.{os.getpid()}.old")
+    if path.exists():
+        os.replace(path, previous)
+    os.replace(staging, path)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+class Cube:
+    """Query API over the levels from `build_cube`.
+
+    Parameters
+    ----------
+    levels: dict[str, pandas.DataFrame]
+        Levels keyed by name as in LEVELS. Columns may be in the index or not.
+    """
+
+    def __init__(self, levels: dict[str, pd.DataFrame]) -> None:
+        self.levels: dict[str, pd.DataFrame] = {
+            name: level.reset_index() if level.index.names[0] is not None else level
+            for name, level in levels.items()
+        }
+        # Coarsest first so that the first covering level is the smallest.
+        self._order: list[str] = sorted(
+            self.levels, key=lambda name: len(self.levels[name])
+        )
+
+    @classmethod
+    def load(cls, path: str | PathLike[str] = MERGED_CUBE) -> "Cube":
+        """Read a cube written by `write_cube`."""
+        path = Path(path)
+        return cls(
+            {
+                name: pd.read_parquet(path.joinpath(f"{name}.parquet"))
+                for name in LEVELS
+                if path.joinpath(f"{name}.parquet").exists()
+            }
+        )
+
+    def level_for(self, columns: list[str]) -> str:
+        """Name of the smallest level with every column in columns.
+
+        Raises
+        ------
+        KeyError
+            No level has all of columns.
+        """
+        for name in self._order:
+            if set(columns) <= set(self.levels[name].columns):
+                return name
+        raise KeyError(f"No level of the cube has all of {columns}")
+
+    def query(
+        self,
+        by: list[str],
+        where: Optional[dict[str, Any]] = None,
+        metrics: Optional[list[str]] = None,
+    ) -> pd.DataFrame:
+        """Aggregate metrics by columns, optionally for a slice of the cube.
+
+        Parameters
+        ----------
+        by: list[str]
+            Columns to group by, e.g. ["borough", "year"] or ["geoid"].
+            Everything is rolled into one row if empty.
+        where: Optional[dict[str, Any]]
+            Values to keep per column, each a scalar or a list, e.g.
+            `{"year": 2021, "borough": ["Bronx", "Queens"]}`.
+        metrics: Optional[list[str]]
+            Metrics to return. Defaults to METRICS.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per group with rows (Eviction Lab observations) and the
+            sum, mean, min, and max of each metric.
+        """
+        where = where or {}
+        metrics = metrics or METRICS
+        name: str = self.level_for(by + list(where))
+        level: pd.DataFrame = self.levels[name]
+
+        mask: np.ndarray = np.ones(len(level), dtype=bool)
+        for col, values in where.items():
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            if col == "month":
+                values = pd.to_datetime(list(values))
+            mask &= level[col].isin(values).to_numpy(dtype=bool)
+        level = level.loc[mask, :] if not mask.all() else level
+
+        measures: list[str] = ["rows"] + [
+            f"{metric}_{statistic}" for metric in metrics for statistic in STATISTICS
+        ]
+        frame: pd.DataFrame = level.loc[:, by + measures]
+        if by and set(by) == set(LEVELS.get(name, [])):
+            # Rows are already unique per group.
+            result: pd.DataFrame = frame.set_index(by)
+        elif by:
+            result = _rollup(frame, by)
+        else:
+            # Everything rolls into a single constant group.
+            result = _rollup(frame.assign(all=0), ["all"])
+
+        for metric in metrics:
+            count: pd.Series = result[f"{metric}_count"]
+            result[f"{metric}_mean"] = result[f"{metric}_sum"] / count.where(count > 0)
+        ordered: list[str] = ["rows"] + [
+            f"{metric}_{statistic}"
+            for metric in metrics
+            for statistic in ["sum", "mean", "min", "max"]
+        ]
+        return result.loc[:, ordered].reset_index(drop=not by)
@@ -0,0 +1,296 @@
+"""Hive partitioned Parquet output of the merged data set.
+
+The merged data is written as a directory of Parquet files partitioned by year
+and borough (`year=2021/borough=Bronx/part-0.parquet`). Readers that filter on
+the partition columns only open the files they need, and row group statistics
+let Arrow skip row groups within those files.
+"""
+import itertools
+import logging
+import os
+import shutil
+import threading
+from os import PathLike
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from eviction_analysis import profiling
+from eviction_analysis.etl_evict import MERGED_DATASET
+
+# Partition columns in directory order
+PARTITIONS: list[str] = ["year", "borough"]
+PARTITION_TYPES: dict[str, pa.DataType] = {"year": pa.int32(), "borough": pa.string()}
+# Defaults for the Parquet files
+COMPRESSION: str = "zstd"
+ROW_GROUP_SIZE: int = 1 << 16
+BASENAME: str = "part-{i}.parquet"
+
+# DNF filters as used by pyarrow.parquet.read_table such as
+# [("year", "=", 2021), ("borough", "in", ["Bronx", "Queens"])]
+Filters = list[tuple[str, str, Any]] | list[list[tuple[str, str, Any]]]
+
+
+def partitioning(partition_cols: list[str] = PARTITIONS) -> ds.Partitioning:
+    """Hive partitioning over partition_cols."""
+    schema: pa.Schema = pa.schema(
+        [(col, PARTITION_TYPES.get(col, pa.string())) for col in partition_cols]
+    )
+    return ds.partitioning(schema, flavor="hive")
+
+
+def _to_table(table: pa.Table, partition_cols: list[str]) -> pa.Table:
+    """Derive/cast the partition columns of table."""
+    if "year" in partition_cols and "year" not in table.column_names:
+        table = table.append_column(
+            "year", pc.year(table.column("month")).cast(PARTITION_TYPES["year"])
+        )
+
+    # Partition values are encoded in paths, so they're cast to plain types.
+    for col in partition_cols:
+        position: int = table.schema.get_field_index(col)
+        table = table.set_column(
+            position,
+            col,
+            table.column(col).cast(PARTITION_TYPES.get(col, pa.string())),
+        )
+
+    return table
+
+
+def _stream_batches(
+    tables: Iterator[pa.Table], partition_cols: list[str]
+) -> Iterator[pa.RecordBatch]:
+    """Batches of each table with derived/cast partition columns."""
+    for table in tables:
+        yield from _to_table(table, partition_cols).to_batches()
+
+
+@profiling.instrument()
+def write_merged(
+    df: pd.DataFrame | pa.Table | Iterable[pa.Table | pa.RecordBatch],
+    path: str | PathLike[str] = MERGED_DATASET,
+    partition_cols: list[str] = PARTITIONS,
+    compression: Optional[str] = COMPRESSION,
+    compression_level: Optional[int] = None,
+    row_group_size: int = ROW_GROUP_SIZE,
+    overwrite: bool = True,
+) -> None:
+    """Write merged data as a Hive partitioned Parquet data set.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame | pyarrow.Table | Iterable[pyarrow.Table | pyarrow.RecordBatch]
+        Output of `etl_evict.merge_evic_fmr` or a stream of tables from
+        `etl_arrow.merge_evic_fmr`, which is written without collecting it.
+        year is derived from month if it's missing.
+    path: str | PathLike[str]
+        Output directory.
+    partition_cols: list[str]
+        Columns to partition on in directory order.
+    compression: Optional[str]
+        Parquet codec such as "zstd", "snappy", or None.
+    compression_level: Optional[int]
+        Codec specific compression level.
+    row_group_size: int
+        Maximum rows per row group. Smaller groups skip more precisely at the
+        cost of more metadata.
+    overwrite: bool
+        Delete everything in path first if True. Otherwise, only the
+        partitions present in df are replaced.
+    """
+    path = Path(path)
+    if isinstance(df, pd.DataFrame):
+        df = pa.Table.from_pandas(df, preserve_index=False)
+
+    # Streams are written as they're merged, so the first table decides the
+    # partitions and the schema.
+    tables: Iterator[pa.Table] = (
+        iter([df])
+        if isinstance(df, pa.Table)
+        else (
+            pa.Table.from_batches([item]) if isinstance(item, pa.RecordBatch) else item
+            for item in df
+        )
+    )
+    first: Optional[pa.Table] = next(tables, None)
+    if first is None:
+        raise ValueError(f"No merged rows to write to {path}")
+
+    # Borough is only available if neighborhoods were merged.
+    partition_cols = [
+        col for col in partition_cols if col in first.column_names or col == "year"
+    ]
+    logging.info(f"Writing merged data set partitioned by {partition_cols} to {path}")
+
+    if overwrite:
+        shutil.rmtree(path, ignore_errors=True)
+
+    file_options = ds.ParquetFileFormat().make_write_options(
+        compression=compression,
+        compression_level=compression_level,
+        write_statistics=True,
+    )
+    ds.write_dataset(
+        _stream_batches(itertools.chain([first], tables), partition_cols),
+        path,
+        schema=_to_table(first.slice(0, 0), partition_cols).schema,
+        format="parquet",
+        partitioning=partitioning(partition_cols),
+        basename_template=BASENAME,
+        file_options=file_options,
+        max_rows_per_group=row_group_size,
+        # Many small groups are worse than a few rows over the target.
+        min_rows_per_group=min(row_group_size, 1 << 12),
+        existing_data_behavior="delete_matching",
+        # The threaded writer can release pandas buffers after the interpreter
+        # starts shutting down, which aborts the process.
+        use_threads=False,
+    )
+
+
+def _staging_dir(path: Path) -> Path:
+    """Private directory next to path for this process and thread."""
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def _retired_dir(target: Path) -> Path:
+    """Hidden name target is moved to before it's deleted."""
+    return target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.old")
+
+
+def _swap_in(staged: Optional[Path], target: Path) -> None:
+    """Replace the directory target with staged, or delete it if staged is None.
+
+    Directories can't be renamed over non-empty ones, so target is renamed
+    aside first. Each step is a single rename.
+    """
+    retired: Path = _retired_dir(target)
+    try:
+        os.replace(target, retired)
+    except FileNotFoundError:
+        pass
+    if staged is not None:
+        os.replace(staged, target)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def drop_partition(path: str | PathLike[str], col: str, value: Any) -> None:
+    """Atomically delete the top level partition col=value if it exists.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Output directory.
+    col: str
+        Top level partition column, e.g. "city."
+    value: Any
+        Partition value. Encoded the same way as Arrow encodes Hive paths.
+    """
+    target: Path = Path(path).joinpath(f"{col}={quote(str(value), safe='')}")
+    if target.exists():
+        # Readers see the whole partition or none of it.
+        _swap_in(None, target)
+        logging.info(f"Deleted partition {target}")
+
+
+def replace_partitions(
+    df: pd.DataFrame,
+    path: str | PathLike[str] = MERGED_DATASET,
+    partition_cols: list[str] = PARTITIONS,
+    **write_kwargs: Any,
+) -> None:
+    """Replace every top level partition present in df, one directory at a time.
+
+    df is written to a staging directory first. Each complete top level
+    partition (e.g. `year=2021`) is then swapped in with directory renames:
+    the old directory is moved aside, the staged one takes its place, and the
+    old one is deleted. Readers see the old partition, briefly no partition,
+    or the new one, but never a mix of their files. Leftovers of a crash are
+    hidden directories that readers skip.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        Complete contents of each top level partition (e.g. each year) to
+        replace.
+    path: str | PathLike[str]
+        Output directory.
+    partition_cols: list[str]
+        Columns to partition on in directory order.
+    write_kwargs: Any
+        Passed to `write_merged`. Nothing is replaced if df is empty.
+    """
+    path = Path(path)
+    # Threads of the batch ETL replace partitions of the same directory.
+    staging: Path = _staging_dir(path)
+    write_merged(df, staging, partition_cols, overwrite=True, **write_kwargs)
+
+    try:
+        # Empty frames have no partitions, so nothing is staged.
+        if not staging.exists():
+            return
+        path.mkdir(parents=True, exist_ok=True)
+        for top in sorted(staging.iterdir()):
+            _swap_in(top, path.joinpath(top.name))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def dataset(
+    path: str | PathLike[str] = MERGED_DATASET, partition_cols: list[str] = PARTITIONS
+) -> ds.Dataset:
+    """Open the partitioned data set without reading any data."""
+    return ds.dataset(path, format="parquet", partitioning=partitioning(partition_cols))
+
+
+@profiling.instrument()
+def read_merged(
+    path: str | PathLike[str] = MERGED_DATASET,
+    filters: Optional[Filters | ds.Expression] = None,
+    columns: Optional[list[str]] = None,
+    partition_cols: list[str] = PARTITIONS,
+) -> pd.DataFrame:
+    """Read the partitioned merged data set.
+
+    Filters on partition columns prune whole directories and filters on other
+    columns are checked against row group statistics before any data is read.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Output directory from `write_merged`.
+    filters: Optional[Filters | pyarrow.dataset.Expression]
+        DNF filters like pandas.read_parquet, e.g.
+        `[("borough", "=", "Bronx"), ("month", "=", pd.Timestamp("2021-03-01"))]`,
+        or an Arrow expression.
+    columns: Optional[list[str]]
+        Columns to read. Every column is read if None.
+    partition_cols: list[str]
+        Partition columns used when the data set was written.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Matching rows.
+    """
+    table: pa.Table = pq.read_table(
+        path,
+        columns=columns,
+        filters=filters,
+        partitioning=partitioning(partition_cols),
+    )
+    df: pd.DataFrame = table.to_pandas()
+
+    # Partition values come back as plain strings.
+    for col in partition_cols:
+        if col in df.columns and pd.api.types.is_string_dtype(df[col]):
+            df[col] = df[col].astype("category")
+
+    return df
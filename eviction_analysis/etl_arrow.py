@@ -0,0 +1,357 @@
+"""Arrow native streaming implementation of the ETL in `etl_evict`.
+
+The pandas engine can parse the Eviction Lab CSV with Arrow, but the data is
+then converted into pandas blocks, merged under the GIL, and converted back to
+Arrow by `to_parquet`. This engine keeps the Eviction Lab data in Arrow record
+batches from the CSV reader to the Parquet writer. Batches are filtered with
+`pyarrow.compute`, hash joined against small lookup tables of FMRs and
+neighborhoods on Arrow's thread pool, and written as they arrive, so memory
+is bounded by a batch rather than the whole file.
+
+Only the sources (the FMRs, crosswalk index, and neighborhoods), which are tiny
+next to the Eviction Lab data, are prepared with pandas. The merged data is
+converted to pandas only by `to_pandas`.
+
+Unlike the other engines, rows aren't deduplicated across batches. The
+Eviction Lab files have one row per GEOID and month, so this only matters for
+malformed input.
+"""
+import logging
+import os
+from os import PathLike
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from eviction_analysis import binning, mirror, profiling
+from eviction_analysis.crosswalk import CrosswalkIndex, parse_place
+from eviction_analysis.etl_evict import (
+    EVICTION_REL,
+    MERGED,
+    Sources,
+    _arrow_batches,
+    load_sources,
+)
+
+# Private columns used to join and to restore the input order
+YEAR_KEY: str = "fmr_year"
+ROW_KEY: str = "__row"
+# Rows per batch when streaming merged Parquet files back
+BATCH_ROWS: int = 1 << 16
+
+
+def load_eviction(
+    path: str | PathLike[str] = EVICTION_REL,
+    date_col: str = "month",
+    cities: Optional[list[str] | str] = None,
+    columns: Optional[list[str]] = None,
+) -> Iterator[pa.RecordBatch]:
+    """Stream the Eviction Lab data set as Arrow record batches.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Path to Eviction Lab data as a local CSV.
+    date_col: str
+        Variable to parse as a date. Defaults to "month."
+    cities: Optional[list[str] | str]
+        Cities to keep as "City, ST." Every city is kept if None.
+    columns: Optional[list[str]]
+        Lower cased columns to keep. Every column is kept if None.
+
+    Yields
+    ------
+    pyarrow.RecordBatch
+        Non-empty batches of about `etl_evict.ARROW_BLOCK_SIZE` bytes of CSV
+        with lower cased column names.
+    """
+    path = mirror.locate(path)
+    logging.info(f"Streaming Eviction Lab data set from {path} with Arrow")
+
+    if isinstance(cities, str):
+        cities = [cities]
+    if columns is not None:
+        columns = [col.lower() for col in columns]
+    if cities and columns is not None and "city" not in columns:
+        columns.append("city")
+
+    for batch in _arrow_batches(path, date_col, cities, columns):
+        # Renaming only swaps the schema; the buffers are shared.
+        yield pa.RecordBatch.from_arrays(
+            batch.columns, names=[name.lower() for name in batch.schema.names]
+        )
+
+
+def fmr_lookup(sources: Sources, cities: Optional[list[str]] = None) -> pa.Table:
+    """Distinct FMRs per GEOID and year as a table to hash join on.
+
+    This is the crosswalk lookup of `crosswalk.attach` done once for every
+    GEOID instead of once per row. GEOIDs that aren't in the crosswalk are
+    tried as zip codes, as `CrosswalkIndex.lookup` falls back.
+
+    Parameters
+    ----------
+    sources: Sources
+        Data sets from `etl_evict.load_sources`.
+    cities: Optional[list[str]]
+        Cities as "City, ST" to restrict the crosswalk and FMRs to.
+
+    Returns
+    -------
+    pyarrow.Table
+        geoid, fmr_year, and the FMR columns.
+    """
+    index: CrosswalkIndex = sources.crosswalk
+    fmrs: pd.DataFrame = pd.concat(sources.fmrs, ignore_index=True)
+    if cities:
+        places: list[tuple[str, str]] = [parse_place(city) for city in cities]
+        index = index.filter(
+            [city for city, _ in places], [state for _, state in places]
+        )
+        fmrs = fmrs.loc[fmrs.zipcode.isin(index.zipcodes()), :]
+
+    fmr_zip: npt.NDArray[np.int64] = fmrs.zipcode.astype("Int64").to_numpy(
+        np.int64, na_value=-1
+    )
+    fallback: npt.NDArray[np.int64] = np.setdiff1d(fmr_zip[fmr_zip >= 0], index.geoid)
+    pairs: pd.DataFrame = pd.DataFrame(
+        {
+            "geoid": np.concatenate([index.geoid, fallback]),
+            "zipcode": np.concatenate([index.zipcode, fallback]),
+        }
+    )
+
+    lookup: pd.DataFrame = (
+        pairs.merge(fmrs.assign(zipcode=fmr_zip), on="zipcode")
+        .drop(columns="zipcode")
+        .drop_duplicates(ignore_index=True)
+    )
+    # The join keys have to match the types of the Eviction Lab batches.
+    lookup[YEAR_KEY] = lookup[YEAR_KEY].astype(np.int64)
+    return pa.Table.from_pandas(lookup, preserve_index=False)
+
+
+def neighborhood_table(neighborhood: pd.DataFrame) -> pa.Table:
+    """Neighborhoods keyed on geoid for a hash join."""
+    table: pa.Table = pa.Table.from_pandas(
+        neighborhood.rename(columns={"zipcode": "geoid"}), preserve_index=False
+    )
+    # Arrow's hash join doesn't take dictionary payloads, so categories are
+    # decoded. The table has one row per zip code, so this is cheap.
+    for position, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(
+                position, field.name, table.column(position).cast(field.type.value_type)
+            )
+
+    return table.set_column(
+        table.schema.get_field_index("geoid"),
+        "geoid",
+        table.column("geoid").cast(pa.int64()),
+    )
+
+
+def _bin_column(column: pa.ChunkedArray, bins: binning.Binning) -> pa.DictionaryArray:
+    """Bin column into an ordered dictionary array like `binning.bin_values`."""
+    codes: npt.NDArray[np.int8] = binning.bin_codes(
+        column.to_numpy(zero_copy_only=False), bins
+    )
+    return pa.DictionaryArray.from_arrays(
+        pa.array(codes, mask=codes < 0),
+        pa.array(bins.labels),
+        ordered=True,
+    )
+
+
+def merge_batch(
+    batch: pa.RecordBatch,
+    lookup: pa.Table,
+    neighborhoods: Optional[list[pa.Table]] = None,
+    keep_last_updated: bool = False,
+    derived: Optional[dict[str, tuple[str, binning.Binning]]] = None,
+) -> pa.Table:
+    """Merge FMRs and (optionally) neighborhoods into one batch.
+
+    Parameters
+    ----------
+    batch: pyarrow.RecordBatch
+        Eviction Lab data from `load_eviction`.
+    lookup: pyarrow.Table
+        FMRs from `fmr_lookup`.
+    neighborhoods: Optional[list[pyarrow.Table]]
+        Neighborhoods from `neighborhood_table`.
+    keep_last_updated: bool
+        Keep Eviction Lab's last_updated column.
+    derived: Optional[dict[str, tuple[str, binning.Binning]]]
+        Binned columns to add as output column -> (input column, bins).
+
+    Returns
+    -------
+    pyarrow.Table
+        Merged rows in the order of batch.
+    """
+    table: pa.Table = pa.Table.from_batches([batch])
+    if not keep_last_updated and "last_updated" in table.column_names:
+        table = table.drop(["last_updated"])
+
+    table = table.append_column(ROW_KEY, pa.array(np.arange(table.num_rows)))
+    table = table.append_column(
+        YEAR_KEY, pc.year(table.column("month")).cast(pa.int64())
+    )
+    merged: pa.Table = table.join(lookup, keys=["geoid", YEAR_KEY])
+    for neighborhood in neighborhoods or []:
+        merged = merged.join(neighborhood, keys="geoid")
+
+    # Hash joins emit rows in any order.
+    merged = merged.sort_by(ROW_KEY).drop([ROW_KEY, YEAR_KEY])
+
+    for name, (col, bins) in (derived or {}).items():
+        if col in merged.column_names:
+            merged = merged.append_column(name, _bin_column(merged.column(col), bins))
+
+    return merged
+
+
+def merge_evic_fmr(
+    evictions: Iterable[pa.RecordBatch],
+    cities: Optional[list[str] | str] = "New York, NY",
+    neighborhoods: Optional[pd.DataFrame | list[pd.DataFrame]] = None,
+    sources: Optional[Sources] = None,
+    keep_last_updated: bool = False,
+    derived: Optional[dict[str, tuple[str, binning.Binning]]] = None,
+) -> Iterator[pa.Table]:
+    """Merge FMRs and (optionally) neighborhoods into streamed Eviction Lab data.
+
+    Parameters
+    ----------
+    evictions: Iterable[pyarrow.RecordBatch]
+        Eviction Lab batches from `load_eviction`.
+    cities: Optional[list[str] | str]
+        Cities to keep as "City, ST." Every city is kept if None.
+    neighborhoods: Optional[pd.DataFrame | list[pd.DataFrame]]
+        Neighborhoods data to merge on zip code. Defaults to the neighborhoods
+        in sources, if any.
+    sources: Optional[Sources]
+        Preloaded data sets from `etl_evict.load_sources`. Loaded here
+        (without neighborhoods) if None.
+    keep_last_updated: bool
+        Keep Eviction Lab's last_updated column.
+    derived: Optional[dict[str, tuple[str, binning.Binning]]]
+        Binned columns to add as output column -> (input column, bins), e.g.
+        `binning.DERIVED`. Nothing is added if None.
+
+    Yields
+    ------
+    pyarrow.Table
+        Merged data per non-empty input batch.
+    """
+    logging.info("Merging data sets into the Eviction Labs batches with Arrow")
+
+    if isinstance(cities, str):
+        cities = [cities]
+    if sources is None:
+        sources = load_sources(neighborhoods_path=None)
+    if neighborhoods is None:
+        neighborhoods = sources.neighborhoods
+    if isinstance(neighborhoods, pd.DataFrame):
+        neighborhoods = [neighborhoods]
+
+    lookup: pa.Table = fmr_lookup(sources, cities)
+    tables: list[pa.Table] = [
+        neighborhood_table(neighborhood) for neighborhood in neighborhoods or []
+    ]
+    value_set: Optional[pa.Array] = pa.array(cities) if cities else None
+
+    for batch in evictions:
+        # Streamed loads are already filtered, but batches from elsewhere may
+        # not be.
+        if value_set is not None:
+            batch = batch.filter(pc.is_in(batch.column("city"), value_set=value_set))
+        if batch.num_rows:
+            yield merge_batch(batch, lookup, tables, keep_last_updated, derived)
+
+
+@profiling.instrument()
+def write_parquet(
+    tables: Iterable[pa.Table],
+    path: str | PathLike[str] = MERGED,
+    compression: Optional[str] = "snappy",
+    row_group_size: Optional[int] = None,
+) -> int:
+    """Stream merged tables into a single Parquet file.
+
+    The file is written next to path and moved over it once complete, so
+    readers never see a partial file.
+
+    Parameters
+    ----------
+    tables: Iterable[pyarrow.Table]
+        Merged data from `merge_evic_fmr`. Every table must share a schema.
+    path: str | PathLike[str]
+        Output file.
+    compression: Optional[str]
+        Parquet codec. Defaults to snappy like `DataFrame.to_parquet`.
+    row_group_size: Optional[int]
+        Maximum rows per row group. Defaults to one group per table.
+
+    Returns
+    -------
+    int
+        Number of rows written.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp: Path = path.with_suffix(f".{os.getpid()}.tmp")
+    logging.info(f"Streaming merged data into {path}")
+
+    n_rows: int = 0
+    writer: Optional[pq.ParquetWriter] = None
+    replaced: bool = False
+    try:
+        for table in tables:
+            if writer is None:
+                writer = pq.ParquetWriter(temp, table.schema, compression=compression)
+            writer.write_table(table, row_group_size=row_group_size)
+            n_rows += table.num_rows
+
+        if writer is None:
+            raise ValueError(f"No merged rows to write to {path}")
+        writer.close()
+        os.replace(temp, path)
+        replaced = True
+    finally:
+        if writer is not None:
+            writer.close()
+        # Don't leave a partial file behind if the stream failed.
+        if not replaced:
+            temp.unlink(missing_ok=True)
+
+    return n_rows
+
+
+def read_batches(
+    path: str | PathLike[str] = MERGED, batch_size: int = BATCH_ROWS
+) -> Iterator[pa.RecordBatch]:
+    """Stream a merged Parquet file back as record batches."""
+    yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+
+
+def to_pandas(tables: Iterable[pa.Table | pa.RecordBatch]) -> pd.DataFrame:
+    """Collect merged data into a DataFrame with the pandas engine's dtypes."""
+    # Gathering the chunks doesn't copy, so the conversion is the only copy.
+    table: pa.Table = pa.concat_tables(
+        [
+            pa.Table.from_batches([item]) if isinstance(item, pa.RecordBatch) else item
+            for item in tables
+        ]
+    )
+    df: pd.DataFrame = table.to_pandas(strings_to_categorical=True)
+    if "geoid" in df.columns:
+        df.geoid = df.geoid.astype("category")
+    return df
@@ -4,30 +4,232 @@ import numpy.typing as npt
 import logging
 from pathlib import Path
 from os import PathLike
-from typing import Optional, Literal
+from typing import Any, Iterator, NamedTuple, Optional, Literal
 from pandas._typing import DtypeArg
-
-## Online paths
-# Eviction lab data: https://evictionlab.org/
-EVICTION_FULL: str = "https://eviction-lab-data-downloads.s3.amazonaws.com/ets/all_sites_weekly_2020_2021.csv"
-EVICTION_NY: str = "https://evictionlab.org/uploads/newyork_weekly_2020_2021.csv"
-# Fair market rate data: https://www.huduser.gov/portal/datasets/fmr.html
-SMALL_FMR_22: str = (
-    "https://www.huduser.gov/portal/datasets/fmr/fmr2022/fy2022_safmrs_revised.xlsx"
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from eviction_analysis import binning, memo, mirror, profiling, schemas, validate
+from eviction_analysis.cache import header as cached_header
+from eviction_analysis.cache import read_columns as read_cached_columns
+from eviction_analysis.crosswalk import (
+    CrosswalkIndex,
+    attach,
+    load_index,
+    parse_place,
+)
+from eviction_analysis.jobs import Jobs, run_jobs
+from eviction_analysis.paths import (
+    DATA_DIR,
+    EVICT_FMR_CSV,
+    EVICTION_FULL,
+    EVICTION_MONTHLY,
+    EVICTION_NY,
+    EVICTION_REL,
+    FMR_PATHS,
+    FMR_YEARS,
+    MERGED,
+    MERGED_CUBE,
+    MERGED_DATASET,
+    NYC_BOROUGH,
+    NYC_ZCTA,
+    NYC_ZIP_GEOJSON,
+    PKG_DIR,
+    SMALL_FMR_22,
+    ZIP_TRACT,
+    ZIP_TRACT_URL,
 )
 
-## Relative paths
-PKG_DIR: Path = Path(__file__).parents[1].resolve()
-DATA_DIR: Path = PKG_DIR.joinpath("assets", "data", "raw")
-ZIP_TRACT: Path = DATA_DIR.joinpath("ZIP_TRACT_122021.xlsx")
-EVICTION_REL: Path = DATA_DIR.joinpath("evictions_allcities_monthly_2020_2021.csv")
-NYC_BOROUGH: Path = DATA_DIR.joinpath("nyc_zip_borough_neighborhoods_pop.csv")
+# Columns of the Eviction Lab data kept by merge_evic_fmr
+EVICTION_COLUMNS: list[str] = [
+    "city",
+    "type",
+    "geoid",
+    "racial_majority",
+    "month",
+    "filings_2020",
+    "filings_avg",
+]
+# Rows per chunk when streaming Eviction Lab data with pandas and bytes per
+# block with Arrow
+CHUNKSIZE: int = 1_000_000
+ARROW_BLOCK_SIZE: int = 1 << 24
+# Formats of the Eviction Lab date columns, tried in order. Months are
+# written as "01/2020" which Arrow's default ISO 8601 parser rejects.
+MONTH_FORMAT: str = "%m/%Y"
+ARROW_TIMESTAMP_PARSERS: list[str] = [MONTH_FORMAT, pa_csv.ISO8601]
+
+
+def _eviction_read_args(
+    date_col: str, columns: Optional[list[str]]
+) -> tuple[DtypeArg, list[str]]:
+    """dtype and date columns of the Eviction Lab CSV."""
+    dtype: DtypeArg = {
+        "city": "category",
+        "racial_majority": "category",
+        "type": "category",
+        "GEOID": "Int64",
+    }
+    # Date columns
+    parse_dates: list[str] = [
+        col
+        for col in ["last_updated", date_col]
+        if columns is None or col.lower() in columns
+    ]
+    return dtype, parse_dates
+
+
+def _arrow_batches(
+    path: str | PathLike[str],
+    date_col: str,
+    cities: Optional[list[str]],
+    columns: Optional[list[str]],
+) -> Iterator[pa.RecordBatch]:
+    """Stream filtered, projected record batches from an Eviction Lab CSV."""
+    # The header's case varies between releases, so peek at it before
+    # projecting. Only the first block is read.
+    with pa_csv.open_csv(path) as reader:
+        header: list[str] = reader.schema.names
+
+    include: list[str] = [
+        col for col in header if columns is None or col.lower() in columns
+    ]
+    dates: list[str] = [
+        col for col in include if col.lower() in {"last_updated", date_col}
+    ]
+    column_types: dict[str, pa.DataType] = {col: pa.timestamp("ns") for col in dates}
+    column_types.update({col: pa.int64() for col in include if col == "GEOID"})
+
+    convert_options = pa_csv.ConvertOptions(
+        include_columns=include,
+        column_types=column_types,
+        timestamp_parsers=ARROW_TIMESTAMP_PARSERS,
+        # GEOID's missing zip codes are tagged as "sealed" but they should be NaNs.
+        null_values=["", "sealed"],
+        strings_can_be_null=True,
+    )
+    read_options = pa_csv.ReadOptions(block_size=ARROW_BLOCK_SIZE)
+    value_set: Optional[pa.Array] = pa.array(cities) if cities else None
+
+    with pa_csv.open_csv(
+        path, read_options=read_options, convert_options=convert_options
+    ) as reader:
+        for batch in reader:
+            if value_set is not None:
+                batch = batch.filter(
+                    pc.is_in(batch.column("city"), value_set=value_set)
+                )
+            if batch.num_rows:
+                yield batch
+
+
+def _parse_dates(df: pd.DataFrame, parse_dates: list[str]) -> pd.DataFrame:
+    """Parse date columns written as "01/2020" or ISO 8601 in place."""
+    for col in parse_dates:
+        if col not in df.columns or pd.api.types.is_datetime64_any_dtype(df[col]):
+            continue
+
+        values: pd.Series = df[col]
+        dates: pd.Series = pd.to_datetime(values, format=MONTH_FORMAT, errors="coerce")
+        # last_updated is ISO 8601, as are the dates of older releases.
+        rest: pd.Series = dates.isna() & values.notna()
+        if rest.any():
+            dates = dates.where(~rest, pd.to_datetime(values.where(rest)))
+        df[col] = dates.astype("datetime64[ns]")
+
+    return df
+
+
+def _clean_eviction(df: pd.DataFrame, dtype: DtypeArg) -> pd.DataFrame:
+    """Apply dtypes lost by Arrow or chunk concatenation and lower case names."""
+    for col, col_type in dtype.items():
+        if col in df.columns and df[col].dtype != col_type:
+            df[col] = df[col].astype(col_type)
+
+    df.columns = df.columns.str.lower()
+    return df
+
+
+def iter_eviction(
+    path: str | PathLike[str] = EVICTION_REL,
+    date_col: str = "month",
+    pyarrow: bool = False,
+    cities: Optional[list[str] | str] = None,
+    columns: Optional[list[str]] = None,
+    chunksize: int = CHUNKSIZE,
+) -> Iterator[pd.DataFrame]:
+    """Stream an Eviction Lab data set in filtered chunks.
+
+    The city filter and column projection are pushed down into the reader so
+    that only matching rows are ever held in memory.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Path to Eviction Lab data as a CSV. Must be a local file if pyarrow
+        is True.
+    date_col: str
+        Variable to parse as a date. Defaults to "month."
+    pyarrow: bool
+        Stream Arrow record batches if True or pandas chunks otherwise.
+    cities: Optional[list[str] | str]
+        Cities to keep as "City, ST." Every city is kept if None.
+    columns: Optional[list[str]]
+        Lower cased columns to keep. Every column is kept if None. "city" is
+        always read when filtering on cities.
+    chunksize: int
+        Rows per chunk for pandas. Arrow reads blocks of ARROW_BLOCK_SIZE bytes
+        instead.
+
+    Yields
+    ------
+    pandas.DataFrame
+        Non-empty chunks of matching rows.
+    """
+    path = mirror.locate(path)
+    logging.info(f"Streaming Eviction Lab data set from: {path}")
+
+    if isinstance(cities, str):
+        cities = [cities]
+    if columns is not None:
+        columns = [col.lower() for col in columns]
+    if cities and columns is not None and "city" not in columns:
+        columns.append("city")
+
+    dtype, parse_dates = _eviction_read_args(date_col, columns)
 
+    if pyarrow:
+        for batch in _arrow_batches(path, date_col, cities, columns):
+            yield _clean_eviction(batch.to_pandas(), dtype)
+        return
+
+    chunks: Iterator[pd.DataFrame] = pd.read_csv(
+        path,
+        dtype=dtype,
+        usecols=(lambda col: col.lower() in columns) if columns is not None else None,
+        na_values={"GEOID": "sealed"},
+        chunksize=chunksize,
+    )
+    for chunk in chunks:
+        if cities:
+            chunk = chunk.loc[chunk.city.isin(cities), :]
+        if len(chunk):
+            # Dates are parsed per chunk with an explicit format because
+            # pandas can't infer "01/2020."
+            yield _parse_dates(_clean_eviction(chunk, dtype), parse_dates)
 
+
+@profiling.instrument()
+@memo.memoize()
 def load_eviction(
     path: str | PathLike[str] = EVICTION_REL,
     date_col: str = "month",
     pyarrow: bool = False,
+    cities: Optional[list[str] | str] = None,
+    columns: Optional[list[str]] = None,
+    chunksize: Optional[int] = None,
+    engine: Literal["pandas", "polars"] = "pandas",
 ) -> pd.DataFrame:
     """Load and clean Eviction Lab data set.
 
@@ -38,47 +240,93 @@ def load_eviction(
     date_col: str
         Variable to parse as a date. Defaults to "month."
     pyarrow: bool
-        Use Apache Arrow if True. Defaults to False because PyArrow support is
-        experimental and thus is missing many features.
+        Stream the CSV with Apache Arrow's reader if True.
+    cities: Optional[list[str] | str]
+        Cities to keep as "City, ST." The file is streamed and filtered while
+        reading if set so that memory is proportional to the output.
+    columns: Optional[list[str]]
+        Lower cased columns to keep. Enables streaming like cities.
+    chunksize: Optional[int]
+        Rows per chunk. Enables streaming even without a filter; defaults to
+        CHUNKSIZE when streaming.
+    engine: Literal["pandas", "polars"]
+        Return a Polars LazyFrame from `etl_polars` instead. pyarrow and
+        chunksize don't apply to Polars.
 
     Returns
     -------
     pandas.DataFrame
         Loaded data.
     """
+    path = mirror.locate(path)
+
+    if engine == "polars":
+        from eviction_analysis import etl_polars
+
+        return etl_polars.load_eviction(path, date_col, cities, columns)
+
+    if isinstance(cities, str):
+        cities = [cities]
+    if columns is not None:
+        columns = [col.lower() for col in columns]
+    if cities and columns is not None and "city" not in columns:
+        columns.append("city")
+
+    # Arrow always streams because pandas' pyarrow engine can't take per
+    # column na_values or date formats.
+    if pyarrow or cities or columns is not None or chunksize is not None:
+        stream_args: dict[str, Any] = {
+            "path": path,
+            "date_col": date_col,
+            "cities": cities,
+            "columns": columns,
+        }
+        dtype, _ = _eviction_read_args(date_col, columns)
+
+        if pyarrow:
+            # Concatenating Arrow batches and converting once is cheaper than
+            # converting and concatenating DataFrames.
+            batches: list[pa.RecordBatch] = list(_arrow_batches(**stream_args))
+            if not batches:
+                raise ValueError(f"No rows in {path} matched cities: {cities}")
+
+            table: pa.Table = pa.Table.from_batches(batches)
+            return _clean_eviction(table.to_pandas(), dtype)
+
+        chunks: list[pd.DataFrame] = list(
+            iter_eviction(**stream_args, chunksize=chunksize or CHUNKSIZE)
+        )
+        if not chunks:
+            raise ValueError(f"No rows in {path} matched cities: {cities}")
+
+        # Categories differ between chunks, so the concat falls back to object
+        # columns which are converted back by _clean_eviction.
+        return _clean_eviction(pd.concat(chunks, ignore_index=True), dtype)
+
     logging.info(f"Loading Eviction Lab data set from: {path}")
 
     ## read_csv arguments
-    dtype: DtypeArg = {
-        "city": "category",
-        "racial_majority": "category",
-        "type": "category",
-        "GEOID": "Int64",
-    }
-    # I'm biased. I like Arrow.
-    # infer_datetime_format is only enabled if Arrow is disabled because PyArrow doesn't support it yet.
-    # Likewise, low_memory is enabled with PyArrow and disabled otherwise.
-    engine: Optional[Literal["pyarrow"]] = "pyarrow" if pyarrow else None
+    dtype, parse_dates = _eviction_read_args(date_col, columns)
     # GEOID's missing zip codes are tagged as "sealed" but they should be NaNs.
     na_values: dict[str, str] = {"GEOID": "sealed"}
-    # Date columns
-    parse_dates: list[str] = ["last_updated", date_col]
 
     df: pd.DataFrame = pd.read_csv(
-        path,
-        dtype=dtype,
-        engine=engine,
-        na_values=na_values,
-        parse_dates=parse_dates,
-        infer_datetime_format=not pyarrow,
-        low_memory=pyarrow,
+        path, dtype=dtype, na_values=na_values, low_memory=False
     )
     df.columns = df.columns.str.lower()
 
-    return df
+    # pandas can't infer "01/2020," so dates are parsed with its format.
+    return _parse_dates(df, parse_dates)
 
 
-def load_fmr(path: str | PathLike[str], year: int) -> pd.DataFrame:
+@profiling.instrument()
+@memo.memoize()
+def load_fmr(
+    path: str | PathLike[str],
+    year: int,
+    cache: bool = True,
+    engine: Literal["pandas", "polars"] = "pandas",
+) -> pd.DataFrame:
     """Load and clean Fair Market Rate data set.
 
     Parameters
@@ -87,42 +335,68 @@ def load_fmr(path: str | PathLike[str], year: int) -> pd.DataFrame:
         Path to FMR data as an Excel file.
     year: int
         Year for path (FMR are issued per year).
+    cache: bool
+        Read the workbook from the columnar cache, converting it first if it's
+        stale or missing. Defaults to True because parsing Excel is slow.
+    engine: Literal["pandas", "polars"]
+        Return a Polars LazyFrame from `etl_polars` instead.
 
     Returns
     -------
     pandas.DataFrame
         Loaded data.
     """
-    logging.info(f"Loading {year} Fair Market Rate data from {path}.")
+    path = mirror.locate(path)
 
-    # I want to use RegEx to match the terrible column names, so I can't use
-    # names and usecols.
-    df: pd.DataFrame = pd.read_excel(path)
+    if engine == "polars":
+        from eviction_analysis import etl_polars
 
-    # Rename the horrible Excel columns
-    names: list[str] = ["zipcode", "fmr_2br", "fmr_2br_90", "fmr_2br_110"]
-    usecols: npt.NDArray[np.bool_] = df.columns.str.match(
-        r"(\d{0,4}\s{0,1}SAFMR\d{0,4}\n2BR)|(ZIP)|(zcta)|((SAFMR|safmr)\s{0,1}\d{2,4}\s2br)"
-    )
+        return etl_polars.load_fmr(path, year, cache)
+
+    logging.info(f"Loading {year} Fair Market Rate data from {path}.")
 
-    # The columns sometimes don't match up because data distributed as
-    # Excel files tend to suck.
-    logging.debug(f"FMR usecols: {usecols}")
-    logging.debug(f"FMR actual cols: {df.columns}")
-    df = df.loc[:, usecols]
-    df.columns = names
+    # The layout is detected from the header row alone, so only the columns
+    # that are kept are ever read. Unknown layouts fail here.
+    header: list[str] = (
+        cached_header(path) if cache else schemas.read_excel_header(path)
+    )
+    schema, mapping = schemas.detect(header, year, source=path)
+    logging.debug(f"FMR columns: {mapping}")
+
+    if cache:
+        df: pd.DataFrame = read_cached_columns(path, list(mapping))
+    else:
+        with profiling.stage("read_excel") as record:
+            df = pd.read_excel(
+                path,
+                usecols=list(mapping),
+                dtype={col: schema.dtypes[name] for col, name in mapping.items()},
+            )
+            record["rows_out"] = len(df)
 
-    # Convert zipcode to Int64 because some of the tracts are null
-    df.zipcode = df.zipcode.astype("Int64")
+    # Columns come back in workbook order, so they're renamed by header.
+    df = df.rename(columns=mapping)[schema.names].astype(schema.dtypes)
 
     # Add in year because we're using multiple FMR data sets
-    df["fmr_year"] = year
+    df["fmr_year"] = np.int16(year)
 
     return df
 
 
-def load_zip_city(path: str | PathLike[str] = ZIP_TRACT) -> pd.DataFrame:
+@profiling.instrument()
+@memo.memoize()
+def load_zip_city(
+    path: str | PathLike[str] = ZIP_TRACT,
+    engine: Literal["pandas", "polars"] = "pandas",
+) -> pd.DataFrame:
     """Write later."""
+    path = mirror.locate(path)
+
+    if engine == "polars":
+        from eviction_analysis import etl_polars
+
+        return etl_polars.load_zip_city(path)
+
     logging.info(f"Loading zip code to census tract data from {path}")
 
     # Rename zip because it's a keyword and therefore annoying to use.
@@ -137,8 +411,12 @@ def load_zip_city(path: str | PathLike[str] = ZIP_TRACT) -> pd.DataFrame:
     return zip_tract
 
 
+@profiling.instrument()
+@memo.memoize()
 def load_nyc_neighborhoods(
-    path: str | PathLike[str] = NYC_BOROUGH, pyarrow: bool = True
+    path: str | PathLike[str] = NYC_BOROUGH,
+    pyarrow: bool = True,
+    engine: Literal["pandas", "polars"] = "pandas",
 ) -> pd.DataFrame:
     """Load New York City neighborhoods data.
 
@@ -149,12 +427,21 @@ def load_nyc_neighborhoods(
     pyarrow: bool
         Use Apache Arrow. Defaults to True because PyArrow supports every
         feature used by this function
+    engine: Literal["pandas", "polars"]
+        Return a Polars LazyFrame from `etl_polars` instead.
 
     Returns
     -------
     pd.DataFrame
         Loaded betaNYC neighborhoods data.
     """
+    path = mirror.locate(path)
+
+    if engine == "polars":
+        from eviction_analysis import etl_polars
+
+        return etl_polars.load_nyc_neighborhoods(path)
+
     logging.info(f"Loading New York City neighborhoods data from {path}")
 
     dtype: DtypeArg = {
@@ -172,12 +459,191 @@ def load_nyc_neighborhoods(
     return nyc
 
 
+class Sources(NamedTuple):
+    """Data sets merged into the Eviction Lab data."""
+
+    # One DataFrame per FMR year in the order the years were requested.
+    fmrs: list[pd.DataFrame]
+    crosswalk: CrosswalkIndex
+    neighborhoods: Optional[pd.DataFrame] = None
+
+
+@profiling.instrument()
+def load_sources(
+    fmr_paths: list[str | PathLike[str]] = FMR_PATHS,
+    fmr_years: list[int] = FMR_YEARS,
+    zip_tract_path: str | PathLike[str] = ZIP_TRACT,
+    neighborhoods_path: Optional[str | PathLike[str]] = NYC_BOROUGH,
+    executor: Optional[Literal["thread", "process"]] = "thread",
+    max_workers: Optional[int] = None,
+    engine: Literal["pandas", "polars"] = "pandas",
+) -> Sources:
+    """Load the FMR, crosswalk, and neighborhoods data sets concurrently.
+
+    Parameters
+    ----------
+    fmr_paths: list[str | PathLike[str]]
+        Paths to the FMR Excel files.
+    fmr_years: list[int]
+        Year of each FMR file.
+    zip_tract_path: str | PathLike[str]
+        Path to the HUD zip code to census tract crosswalk. Its index is
+        loaded from the cache if it's fresh.
+    neighborhoods_path: Optional[str | PathLike[str]]
+        Path to the betaNYC neighborhoods data. Skipped if None.
+    executor: Optional[Literal["thread", "process"]]
+        Run the loaders in a thread pool or process pool, or sequentially if
+        None. Threads are cheap and suffice once the FMR cache is warm; a
+        process pool is faster for cold caches because parsing Excel holds
+        the GIL.
+    max_workers: Optional[int]
+        Number of workers. Defaults to one per data set.
+    engine: Literal["pandas", "polars"]
+        Scan the data sets with `etl_polars` instead. Scans are lazy, so the
+        executor isn't used.
+
+    Returns
+    -------
+    Sources
+        Loaded data sets in a deterministic order regardless of which finished
+        first.
+
+    Raises
+    ------
+    RuntimeError
+        A loader failed. The message names the data set and the original
+        exception is chained.
+    """
+    if len(fmr_paths) != len(fmr_years):
+        raise ValueError("Every FMR path needs a matching year.")
+
+    if engine == "polars":
+        from eviction_analysis import etl_polars
+
+        return etl_polars.load_sources(
+            fmr_paths, fmr_years, zip_tract_path, neighborhoods_path
+        )
+
+    jobs: Jobs = {
+        f"{year} Fair Market Rate data ({path})": (load_fmr, (path, year))
+        for path, year in zip(fmr_paths, fmr_years)
+    }
+    jobs[f"zip code to census tract data ({zip_tract_path})"] = (
+        load_index,
+        (zip_tract_path,),
+    )
+    if neighborhoods_path is not None:
+        jobs[f"New York City neighborhoods data ({neighborhoods_path})"] = (
+            load_nyc_neighborhoods,
+            (neighborhoods_path,),
+        )
+
+    if executor is not None:
+        logging.info(f"Loading {len(jobs)} data sets with a {executor} pool")
+    results: list[pd.DataFrame] = list(
+        run_jobs(jobs, executor, max_workers or len(jobs), "load").values()
+    )
+
+    n_fmrs: int = len(fmr_paths)
+    return Sources(
+        fmrs=results[:n_fmrs],
+        crosswalk=results[n_fmrs],
+        neighborhoods=results[n_fmrs + 1] if neighborhoods_path is not None else None,
+    )
+
+
+def _attach_neighborhood(
+    evictions: pd.DataFrame, neighborhood: pd.DataFrame
+) -> pd.DataFrame:
+    """Left join neighborhood on zip code without keeping its zipcode column."""
+    # Rows without a zip code can't match. They're dropped rather than keyed on
+    # -1, which is what missing GEOIDs are looked up as below.
+    if neighborhood.zipcode.hasnans:
+        neighborhood = neighborhood.loc[neighborhood.zipcode.notna(), :]
+    keys: pd.Index = pd.Index(neighborhood.zipcode.astype("Int64").to_numpy(np.int64))
+    if not keys.is_unique:
+        # Duplicated zip codes fan out, which only a real merge does, and may
+        # repeat rows.
+        return (
+            evictions.merge(
+                neighborhood, left_on="geoid", right_on="zipcode", how="left"
+            )
+            .drop(columns="zipcode")
+            .drop_duplicates(ignore_index=True)
+        )
+
+    # Each row gathers its neighborhood by position, and missing zip codes get
+    # -1 which takes fill with missing values.
+    positions: npt.NDArray[np.intp] = keys.get_indexer(
+        evictions.geoid.astype("Int64").to_numpy(np.int64, na_value=-1)
+    )
+    for col in neighborhood.columns.drop("zipcode"):
+        evictions[col] = pd.api.extensions.take(
+            neighborhood[col].values, positions, allow_fill=True
+        )
+
+    return evictions
+
+
+@profiling.instrument()
 def merge_evic_fmr(
     evictions: pd.DataFrame,
     cities: Optional[list[str] | str] = "New York, NY",
     neighborhoods: Optional[pd.DataFrame | list[pd.DataFrame]] = None,
+    sources: Optional[Sources] = None,
+    executor: Optional[Literal["thread", "process"]] = "thread",
+    max_workers: Optional[int] = None,
+    keep_last_updated: bool = False,
+    engine: Literal["pandas", "polars"] = "pandas",
+    derived: Optional[dict[str, tuple[str, binning.Binning]]] = None,
+    validator: Optional[validate.Validator] = None,
 ) -> pd.DataFrame:
-    """Write later."""
+    """Merge FMRs and (optionally) neighborhoods into the Eviction Lab data.
+
+    Parameters
+    ----------
+    evictions: pandas.DataFrame
+        Eviction Lab data from `load_eviction`.
+    cities: Optional[list[str] | str]
+        Cities to keep as "City, ST." Every city is kept if None.
+    neighborhoods: Optional[pd.DataFrame | list[pd.DataFrame]]
+        Neighborhoods data to merge on zip code. Defaults to the neighborhoods
+        in sources, if any.
+    sources: Optional[Sources]
+        Preloaded data sets from `load_sources`. The FMRs and crosswalk are
+        loaded here (without neighborhoods) if None.
+    executor: Optional[Literal["thread", "process"]]
+        Pool used to load sources if they weren't provided.
+    max_workers: Optional[int]
+        Number of workers used to load sources if they weren't provided.
+    keep_last_updated: bool
+        Keep Eviction Lab's last_updated column, which incremental merges
+        compare against. Dropped by default.
+    engine: Literal["pandas", "polars"]
+        Merge LazyFrames with `etl_polars` instead, returning a Polars
+        DataFrame. The executor and max_workers don't apply.
+    derived: Optional[dict[str, tuple[str, binning.Binning]]]
+        Binned columns to add as output column -> (input column, bins), e.g.
+        `binning.DERIVED`. Nothing is added if None.
+    validator: Optional[validate.Validator]
+        Runs data quality checks after each join. Only the output is checked
+        with polars.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Merged data.
+    """
+    if engine == "polars":
+        from eviction_analysis import etl_polars
+
+        merged = etl_polars.merge_evic_fmr(
+            evictions, cities, neighborhoods, sources, keep_last_updated
+        )
+        if validator is not None:
+            validator.check_output(merged.to_pandas())
+        return binning.add_bins(merged, derived) if derived else merged
+
     logging.info("Merging data sets into the Eviction Labs DataFrame")
 
     # Sanitize inputs
@@ -186,15 +652,29 @@ def merge_evic_fmr(
         logging.info("Enabled: filtering on cities")
         cities = [cities]
 
+    # Zip and census tract data to filter FMRs and to aid merging FMRs into
+    # the Eviction Labs data set as well as the FMRs themselves.
+    if sources is None:
+        sources = load_sources(
+            neighborhoods_path=None, executor=executor, max_workers=max_workers
+        )
+
+    if neighborhoods is None:
+        neighborhoods = sources.neighborhoods
+
     # Likewise for neighborhoods
     if isinstance(neighborhoods, pd.DataFrame):
         logging.info("Enabled: merging neighborhoods into Eviction Labs")
         neighborhoods = [neighborhoods]
 
-    # Filter on cities if requested
+    # Filter on cities if requested. Streamed loads are already filtered, so
+    # the copy is skipped if every row matches.
     if cities:
-        evictions = evictions.loc[evictions.city.isin(cities), :]
-        evictions = evictions.reset_index(drop=True)
+        matches: npt.NDArray[np.bool_] = evictions.city.isin(cities).to_numpy()
+        if not matches.all():
+            evictions = evictions.loc[matches, :]
+    if validator is not None:
+        validator.check_input(evictions)
 
     # Temporary, lower cased city names as well as states to ease merging
     # city_state: pd.DataFrame = evictions.city.str.extract(r"^([\w\s]+),\s(\w+)$").apply(
@@ -203,80 +683,66 @@ def merge_evic_fmr(
     # city_state.columns = ["temp_city", "temp_state"]
     # evictions: pd.DataFrame = pd.concat([evictions, city_state], axis="columns")
 
-    # Temporary year column to aid merging with FMR
-    evictions["temp_year"] = evictions.month.dt.year
-
-    # Zip and census tract data to filter FMRs and to aid merging FMRs into
-    # the Eviction Labs data set.
-    zip_tract: pd.DataFrame = load_zip_city()
+    index: CrosswalkIndex = sources.crosswalk
 
     # Filter on cities again if requested
     if cities:
-        # City, State is separated into features for zip_tract so I have to
-        # replicate the split to filter
-        city_temp: list[list[str]] = [city.lower().split(", ") for city in cities]
-        city_zip: list[str] = [city[0] for city in city_temp]
-        state_zip: list[str] = [city[1] for city in city_temp]
-        zip_tract = zip_tract.loc[
-            zip_tract.city.isin(city_zip) & zip_tract.state.isin(state_zip)
-        ]
+        # City, State is separated into features for the crosswalk so I have to
+        # replicate the split to filter. Pairs are matched together so that
+        # cities don't pick up namesakes in the other states.
+        places: list[tuple[str, str]] = [parse_place(city) for city in cities]
+        index = index.filter(
+            [city for city, _ in places], [state for _, state in places]
+        )
 
     # Fair market rate data
-    fmr_years: list[int] = [2020, 2021, 2022]
-    fmr_paths: list[Path] = [
-        DATA_DIR.joinpath(f"fy{year}_safmrs_revised.xlsx") for year in fmr_years
-    ]
-    fmrs: list[pd.DataFrame] = [
-        load_fmr(fmr_path, year) for fmr_path, year in zip(fmr_paths, fmr_years)
-    ]
+    fmrs: list[pd.DataFrame] = sources.fmrs
 
     # Filter FMRs by zip code if cities were provided
     if cities:
-        fmrs = [fmr.loc[fmr.zipcode.isin(zip_tract.zipcode), :] for fmr in fmrs]
-
-    # Merge FMR data sets with zipcode/tracts and concat all of the DataFrames
-    # Melting the DataFrame is primarily so zip codes and census tract are in
-    # one variable to merge on Eviction Labs.
-    fmrs = [
-        fmr.merge(zip_tract, on="zipcode", how="left").melt(
-            ["fmr_2br", "fmr_2br_90", "fmr_2br_110", "fmr_year", "city", "state"],
-            var_name="tabulation",
-            value_name="code",
-        )
-        for fmr in fmrs
+        fmrs = [fmr.loc[fmr.zipcode.isin(index.zipcodes()), :] for fmr in fmrs]
+
+    # Columns are projected before the join so dropped columns are never
+    # copied. last_updated isn't read if the loader projected columns.
+    columns: list[str] = [
+        col for col in evictions.columns if keep_last_updated or col != "last_updated"
     ]
-    fmrs_merged: pd.DataFrame = pd.concat(fmrs)
-
-    # FMRs are merged on zip code and year to produce a long DataFrame where
-    # the dates match up
-    evictions = evictions.merge(
-        fmrs_merged,
-        left_on=["geoid", "temp_year"],
-        right_on=["code", "fmr_year"],
-        how="left",
+
+    # Every output row is unique once its input row is, because attach
+    # collapses duplicated FMRs per row and neighborhoods are keyed on zip
+    # code. Deduplicating the projected input is much cheaper than hashing
+    # every output column.
+    with profiling.stage("drop_duplicates", len(evictions)) as record:
+        duplicated: npt.NDArray[np.bool_] = evictions.duplicated(
+            subset=columns
+        ).to_numpy()
+        if duplicated.any():
+            evictions = evictions.loc[~duplicated, :]
+        record["rows_out"] = len(evictions)
+
+    # FMRs are looked up by zip code and year through the crosswalk index so
+    # that zip codes and census tracts both match. The result is long where a
+    # tract overlaps zip codes with different FMRs.
+    observed: pd.DataFrame = evictions
+    evictions = attach(
+        evictions, pd.concat(fmrs, ignore_index=True), index, columns=columns
     )
+    if validator is not None:
+        validator.check_fmr_join(observed, evictions, fmrs, index)
 
     # Merge neighborhoods data
     if neighborhoods:
+        rows_before: int = len(evictions)
         for neighborhood in neighborhoods:
-            evictions = evictions.merge(
-                neighborhood, left_on="geoid", right_on="zipcode", how="left"
-            )
+            with profiling.stage("merge_neighborhoods", len(evictions)) as record:
+                evictions = _attach_neighborhood(evictions, neighborhood)
+                record["rows_out"] = len(evictions)
+        if validator is not None:
+            validator.check_neighborhoods(evictions, rows_before)
 
-    # Final DataFrame without temp/useless columns
-    evictions.drop(
-        columns=[
-            "city_y",
-            "code",
-            "fmr_year",
-            "last_updated",
-            "state",
-            "tabulation",
-            "temp_year",
-            "zipcode",
-        ],
-        inplace=True,
-    )
-    evictions.rename(columns={"city_x": "city"}, inplace=True)
     evictions.geoid = evictions.geoid.astype("category")
-    return evictions.drop_duplicates().reset_index(drop=True)
+    if derived:
+        evictions = binning.add_bins(evictions, derived)
+    if validator is not None:
+        validator.check_output(evictions)
+    return evictions
@@ -0,0 +1,306 @@
+"""Polars implementation of the ETL in `etl_evict`.
+
+The loaders return LazyFrames so that the city filter, the joins, and the
+column drops in `merge_evic_fmr` are optimized as a single query plan and run
+on Polars' thread pool. The SAFMR workbooks are scanned from the columnar cache,
+so only the crosswalk index and the final collect touch memory eagerly.
+
+Install the optional dependencies with the `polars` extra.
+"""
+import logging
+from os import PathLike
+from typing import Optional
+
+import polars as pl
+import pyarrow.parquet as pq
+
+from eviction_analysis.cache import ensure as ensure_cached
+from eviction_analysis.crosswalk import CrosswalkIndex, load_index, parse_place
+from eviction_analysis.etl_evict import (
+    EVICTION_REL,
+    FMR_PATHS,
+    FMR_YEARS,
+    MONTH_FORMAT,
+    NYC_BOROUGH,
+    ZIP_TRACT,
+    Sources,
+)
+from eviction_analysis.schemas import detect
+
+
+def _to_datetime(col: str) -> pl.Expr:
+    """Parse an Eviction Lab date column written as "01/2020" or ISO 8601."""
+    dates: pl.Expr = pl.col(col).str
+    return pl.coalesce(
+        dates.to_datetime(MONTH_FORMAT, time_unit="ns", strict=False),
+        dates.to_datetime(time_unit="ns", strict=False),
+    ).alias(col)
+
+
+def load_eviction(
+    path: str | PathLike[str] = EVICTION_REL,
+    date_col: str = "month",
+    cities: Optional[list[str] | str] = None,
+    columns: Optional[list[str]] = None,
+) -> pl.LazyFrame:
+    """Scan and clean Eviction Lab data set.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Path to Eviction Lab data as a CSV.
+    date_col: str
+        Variable to parse as a date. Defaults to "month."
+    cities: Optional[list[str] | str]
+        Cities to keep as "City, ST."
+    columns: Optional[list[str]]
+        Lower cased columns to keep. Every column is kept if None.
+
+    Returns
+    -------
+    polars.LazyFrame
+        Query plan for the cleaned data.
+    """
+    logging.info(f"Scanning Eviction Lab data set from: {path}")
+
+    if isinstance(cities, str):
+        cities = [cities]
+
+    # Dates are read as strings because Polars' CSV reader only infers ISO
+    # 8601 and the months are written as "01/2020."
+    lf: pl.LazyFrame = pl.scan_csv(
+        path,
+        schema_overrides={
+            "GEOID": pl.Int64,
+            "last_updated": pl.String,
+            date_col: pl.String,
+        },
+        # GEOID's missing zip codes are tagged as "sealed" but they should be nulls.
+        null_values={"GEOID": "sealed"},
+    )
+    lf = lf.rename(str.lower, strict=False)
+
+    if cities:
+        lf = lf.filter(pl.col("city").is_in(cities))
+    if columns is not None:
+        lf = lf.select([col.lower() for col in columns])
+
+    names: list[str] = lf.collect_schema().names()
+    return lf.with_columns(
+        [_to_datetime(col) for col in ["last_updated", date_col] if col in names]
+    ).with_columns(pl.col(pl.String).cast(pl.Categorical))
+
+
+def load_fmr(path: str | PathLike[str], year: int, cache: bool = True) -> pl.LazyFrame:
+    """Scan and clean Fair Market Rate data set.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Path to FMR data as an Excel file.
+    year: int
+        Year for path (FMR are issued per year).
+    cache: bool
+        Scan the columnar cache, converting the workbook first if needed.
+        Otherwise, the workbook is parsed eagerly with xlsx2csv.
+
+    Returns
+    -------
+    polars.LazyFrame
+        Query plan for the cleaned data.
+    """
+    logging.info(f"Scanning {year} Fair Market Rate data from {path}.")
+
+    if cache:
+        cached = ensure_cached(path)
+        # Only the Parquet footer is read to detect the layout.
+        schema, mapping = detect(pq.read_schema(cached).names, year, source=path)
+        lf: pl.LazyFrame = pl.scan_parquet(cached).select(list(mapping))
+    else:
+        # xlsx2csv converts the whole sheet, so the layout is detected after.
+        df: pl.DataFrame = pl.read_excel(path, engine="xlsx2csv")
+        schema, mapping = detect(df.columns, year, source=path)
+        lf = df.select(list(mapping)).lazy()
+
+    names: list[str] = schema.names
+    return (
+        lf.rename(mapping, strict=True)
+        .select(names)
+        .with_columns(
+            pl.col("zipcode").cast(pl.Int64),
+            pl.col(names[1:]).cast(pl.Float32),
+            pl.lit(year, dtype=pl.Int32).alias("fmr_year"),
+        )
+    )
+
+
+def load_zip_city(path: str | PathLike[str] = ZIP_TRACT) -> pl.LazyFrame:
+    """Read the zip code to census tract crosswalk.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Path to the HUD crosswalk as an Excel file.
+
+    Returns
+    -------
+    polars.LazyFrame
+        zipcode, tract, and lower cased city and state.
+    """
+    logging.info(f"Loading zip code to census tract data from {path}")
+
+    df: pl.DataFrame = pl.read_excel(path, engine="xlsx2csv")
+    names: list[str] = ["zipcode", "tract", "city", "state"]
+    return (
+        df.select(df.columns[:4])
+        .rename(dict(zip(df.columns[:4], names)))
+        .lazy()
+        .with_columns(
+            pl.col("city").str.to_lowercase(),
+            pl.col("state").str.to_lowercase(),
+        )
+    )
+
+
+def load_nyc_neighborhoods(path: str | PathLike[str] = NYC_BOROUGH) -> pl.LazyFrame:
+    """Scan New York City neighborhoods data.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Path to betaNYC neighborhoods data. Defaults to a locally cached copy.
+
+    Returns
+    -------
+    polars.LazyFrame
+        Query plan for the neighborhoods data.
+    """
+    logging.info(f"Scanning New York City neighborhoods data from {path}")
+
+    return (
+        pl.scan_csv(path, schema_overrides={"zip": pl.Int64})
+        .rename({"zip": "zipcode"})
+        .with_columns(
+            pl.col(["borough", "post_office", "neighborhood"]).cast(pl.Categorical)
+        )
+    )
+
+
+def crosswalk_frame(index: CrosswalkIndex) -> pl.LazyFrame:
+    """Crosswalk index as a LazyFrame of geoid, zipcode, city, and state."""
+    return pl.from_arrow(index.to_arrow()).lazy()
+
+
+def load_sources(
+    fmr_paths: list[str | PathLike[str]] = FMR_PATHS,
+    fmr_years: list[int] = FMR_YEARS,
+    zip_tract_path: str | PathLike[str] = ZIP_TRACT,
+    neighborhoods_path: Optional[str | PathLike[str]] = NYC_BOROUGH,
+) -> Sources:
+    """Scan the FMR and neighborhoods data sets and load the crosswalk index.
+
+    Scans are lazy, so unlike `etl_evict.load_sources` there's nothing to run
+    in a pool; Polars parallelizes the reads when the merge is collected.
+    """
+    return Sources(
+        fmrs=[load_fmr(path, year) for path, year in zip(fmr_paths, fmr_years)],
+        crosswalk=load_index(zip_tract_path),
+        neighborhoods=(
+            load_nyc_neighborhoods(neighborhoods_path)
+            if neighborhoods_path is not None
+            else None
+        ),
+    )
+
+
+def merge_evic_fmr(
+    evictions: pl.LazyFrame,
+    cities: Optional[list[str] | str] = "New York, NY",
+    neighborhoods: Optional[pl.LazyFrame | list[pl.LazyFrame]] = None,
+    sources: Optional[Sources] = None,
+    keep_last_updated: bool = False,
+) -> pl.DataFrame:
+    """Merge FMRs and (optionally) neighborhoods into the Eviction Lab data.
+
+    Parameters
+    ----------
+    evictions: polars.LazyFrame
+        Eviction Lab data from `load_eviction`.
+    cities: Optional[list[str] | str]
+        Cities to keep as "City, ST." Every city is kept if None.
+    neighborhoods: Optional[pl.LazyFrame | list[pl.LazyFrame]]
+        Neighborhoods data to merge on zip code. Defaults to the neighborhoods
+        in sources, if any.
+    sources: Optional[Sources]
+        Scans from `load_sources`. Scanned here (without neighborhoods) if None.
+    keep_last_updated: bool
+        Keep Eviction Lab's last_updated column.
+
+    Returns
+    -------
+    polars.DataFrame
+        Merged data.
+    """
+    logging.info("Merging data sets into the Eviction Labs DataFrame with Polars")
+
+    if isinstance(cities, str):
+        cities = [cities]
+    if sources is None:
+        sources = load_sources(neighborhoods_path=None)
+    if neighborhoods is None:
+        neighborhoods = sources.neighborhoods
+    if isinstance(neighborhoods, pl.LazyFrame):
+        neighborhoods = [neighborhoods]
+
+    crosswalk: pl.LazyFrame = crosswalk_frame(sources.crosswalk)
+    fmrs: pl.LazyFrame = pl.concat(sources.fmrs, how="vertical_relaxed")
+
+    if cities:
+        evictions = evictions.filter(pl.col("city").cast(pl.String).is_in(cities))
+
+        # (city, state) pairs are matched together, as in the pandas engine.
+        crosswalk = crosswalk.join(
+            pl.LazyFrame(
+                [parse_place(city) for city in cities],
+                schema=["city", "state"],
+                orient="row",
+            ),
+            on=[pl.col("city").cast(pl.String), pl.col("state").cast(pl.String)],
+            how="semi",
+        )
+        fmrs = fmrs.join(crosswalk.select("zipcode").unique(), on="zipcode", how="semi")
+
+    evictions = evictions.with_columns(
+        pl.col("month").dt.year().cast(pl.Int32).alias("fmr_year")
+    )
+
+    # Distinct FMRs per (GEOID, year). GEOIDs that aren't in the crosswalk are
+    # tried as zip codes, which is how the pandas engine's index falls back.
+    keys: pl.LazyFrame = evictions.select("geoid", "fmr_year").drop_nulls().unique()
+    fmr_values: list[str] = ["fmr_2br", "fmr_2br_90", "fmr_2br_110"]
+    keyed: pl.LazyFrame = (
+        keys.join(crosswalk.select(["geoid", "zipcode"]), on="geoid", how="left")
+        .with_columns(pl.coalesce("zipcode", "geoid").alias("zipcode"))
+        .join(fmrs, on=["zipcode", "fmr_year"], how="inner")
+        .select(["geoid", "fmr_year"] + fmr_values)
+        .unique(maintain_order=True)
+    )
+
+    merged: pl.LazyFrame = evictions.join(
+        keyed, on=["geoid", "fmr_year"], how="left", maintain_order="left"
+    )
+
+    for neighborhood in neighborhoods or []:
+        merged = merged.join(
+            neighborhood,
+            left_on="geoid",
+            right_on="zipcode",
+            how="left",
+            maintain_order="left",
+        )
+
+    drop: list[str] = (
+        ["fmr_year"] if keep_last_updated else ["fmr_year", "last_updated"]
+    )
+    merged = merged.drop(drop, strict=False)
+    return merged.unique(maintain_order=True).collect()
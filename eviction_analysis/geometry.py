@@ -0,0 +1,283 @@
+"""Simplified geometry of New York City's zip code tabulation areas (ZCTAs).
+
+The maps used to `json.load` the full resolution ZCTA GeoJSON for every plot
+and hand it to plotly or folium as is, which bloats the HTML and slows down
+rendering. The GeoJSON is instead read once, dissolved to one (multi)polygon
+per zip code, and simplified for a few zoom levels. Each level is cached as
+GeoParquet next to the SAFMR cache and rebuilt only when the GeoJSON changes.
+
+Polygons are simplified in Web Mercator with a tolerance of half a pixel at
+their zoom level and stored in WGS 84, which is what plotly and folium expect,
+with coordinates rounded to about a meter. Neighboring ZCTAs are simplified as
+a coverage so that their shared borders stay shared; older Shapely versions
+fall back to simplifying each polygon on its own with its topology preserved
+(and skip the rounding).
+"""
+import json
+import logging
+import os
+from os import PathLike
+from pathlib import Path
+from typing import Any, Optional
+
+import geopandas as gpd
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+
+from eviction_analysis import cache, mirror, profiling
+from eviction_analysis.etl_evict import NYC_ZCTA
+
+# Zoom levels of the cached geometry (web map zooms; NYC fills a screen at ~10)
+ZOOMS: list[int] = [9, 11, 13]
+DEFAULT_ZOOM: int = 11
+# Simplification tolerance in screen pixels
+PIXEL_TOLERANCE: float = 0.5
+# Web Mercator meters per 256 px tile pixel at zoom 0 on the equator
+METERS_PER_PIXEL: float = 156543.03392
+# Coordinates are snapped to a grid of about a meter, which is far below a
+# pixel at any cached zoom and keeps the GeoJSON short.
+PRECISION: float = 1e-5
+WEB_MERCATOR: int = 3857
+WGS84: int = 4326
+
+
+def zcta_kind(zoom: int) -> str:
+    """Artifact name of a zoom level in the cache."""
+    return f".zcta-z{zoom}"
+
+
+def nearest_zoom(zoom: int) -> int:
+    """Cached zoom level closest to zoom."""
+    return min(ZOOMS, key=lambda level: abs(level - zoom))
+
+
+def tolerance(zoom: int) -> float:
+    """Simplification tolerance in Web Mercator meters at zoom."""
+    return METERS_PER_PIXEL / 2**zoom * PIXEL_TOLERANCE
+
+
+def read_zcta(path: str | PathLike[str] = NYC_ZCTA) -> gpd.GeoDataFrame:
+    """Read the full resolution ZCTA GeoJSON.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Path to the NYC ZCTA polygons as GeoJSON.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        zipcode, borough, and geometry with one row per zip code sorted by
+        zip code. Zip codes split into several polygons are dissolved.
+    """
+    path = mirror.locate(path)
+    logging.info(f"Reading ZCTA polygons from {path}")
+
+    with open(path) as file:
+        features: list[dict[str, Any]] = json.load(file)["features"]
+    # GeoJSON is always WGS 84, so there's no CRS member to read.
+    zctas: gpd.GeoDataFrame = gpd.GeoDataFrame.from_features(features, crs=WGS84)
+    zctas = zctas.rename(columns={"postalCode": "zipcode"})
+    zctas["zipcode"] = zctas.zipcode.astype(np.int32)
+
+    zctas = zctas.loc[:, ["zipcode", "borough", "geometry"]].dissolve(
+        by="zipcode", aggfunc="first", sort=True
+    )
+    zctas = zctas.reset_index()
+    zctas["borough"] = zctas.borough.astype("category")
+    return zctas
+
+
+def simplify(zctas: gpd.GeoDataFrame, zoom: int) -> gpd.GeoDataFrame:
+    """Simplify zctas for display at zoom.
+
+    Parameters
+    ----------
+    zctas: geopandas.GeoDataFrame
+        Output of `read_zcta`.
+    zoom: int
+        Web map zoom level.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        zctas with simplified geometry in WGS 84.
+    """
+    projected: gpd.GeoSeries = zctas.geometry.to_crs(WEB_MERCATOR)
+    if hasattr(shapely, "coverage_simplify"):
+        simplified: npt.NDArray[np.object_] = shapely.coverage_simplify(
+            projected.to_numpy(), tolerance(zoom)
+        )
+    else:
+        simplified = projected.simplify(tolerance(zoom), preserve_topology=True)
+
+    unprojected: gpd.GeoSeries = gpd.GeoSeries(
+        simplified, index=zctas.index, crs=WEB_MERCATOR
+    ).to_crs(WGS84)
+    if hasattr(shapely, "set_precision"):
+        unprojected = gpd.GeoSeries(
+            shapely.set_precision(unprojected.to_numpy(), PRECISION),
+            index=zctas.index,
+            crs=WGS84,
+        )
+    return zctas.set_geometry(unprojected)
+
+
+def _geo_table(zctas: gpd.GeoDataFrame, directory: Path) -> pa.Table:
+    """GeoParquet table of zctas, i.e. WKB geometry plus the "geo" metadata."""
+    # geopandas only writes GeoParquet to files in the versions we support.
+    temp: Path = directory.joinpath(f".zcta.{os.getpid()}.parquet")
+    directory.mkdir(parents=True, exist_ok=True)
+    try:
+        zctas.to_parquet(temp, index=False)
+        return pq.read_table(temp)
+    finally:
+        temp.unlink(missing_ok=True)
+
+
+@profiling.instrument()
+def build(
+    path: str | PathLike[str] = NYC_ZCTA, cache_dir: Path = cache.CACHE_DIR
+) -> dict[int, Path]:
+    """Simplify the ZCTA polygons at every zoom in ZOOMS and cache them.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Path to the NYC ZCTA polygons as GeoJSON.
+    cache_dir: Path
+        Directory that holds the cache.
+
+    Returns
+    -------
+    dict[int, Path]
+        Cached GeoParquet file per zoom level.
+    """
+    path = mirror.locate(path)
+    source_fp: dict[str, Any] = cache.fingerprint(path)
+    zctas: gpd.GeoDataFrame = read_zcta(path)
+
+    paths: dict[int, Path] = {}
+    for zoom in ZOOMS:
+        paths[zoom] = cache.cache_path(path, cache_dir, zcta_kind(zoom))
+        logging.info(
+            f"Saving ZCTA polygons simplified for zoom {zoom} to {paths[zoom]}"
+        )
+        cache.write_cached(
+            _geo_table(simplify(zctas, zoom), cache_dir), paths[zoom], source_fp
+        )
+
+    return paths
+
+
+def ensure(
+    path: str | PathLike[str] = NYC_ZCTA, cache_dir: Path = cache.CACHE_DIR
+) -> dict[int, Path]:
+    """Cached GeoParquet file per zoom level, rebuilding them if they're stale."""
+    path = mirror.locate(path)
+    if not all(cache.revalidate(path, cache_dir, zcta_kind(zoom)) for zoom in ZOOMS):
+        return build(path, cache_dir)
+    return {zoom: cache.cache_path(path, cache_dir, zcta_kind(zoom)) for zoom in ZOOMS}
+
+
+def load(
+    zoom: int = DEFAULT_ZOOM,
+    path: str | PathLike[str] = NYC_ZCTA,
+    cache_dir: Path = cache.CACHE_DIR,
+) -> gpd.GeoDataFrame:
+    """Load the ZCTA polygons simplified for zoom from the cache.
+
+    Parameters
+    ----------
+    zoom: int
+        Web map zoom level. The closest cached level is used.
+    path: str | PathLike[str]
+        Path to the NYC ZCTA polygons as GeoJSON.
+    cache_dir: Path
+        Directory that holds the cache.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        zipcode, borough, and geometry sorted by zip code.
+    """
+    return gpd.read_parquet(ensure(path, cache_dir)[nearest_zoom(zoom)])
+
+
+def join(
+    df: pd.DataFrame,
+    on: str = "geoid",
+    zoom: int = DEFAULT_ZOOM,
+    zctas: Optional[gpd.GeoDataFrame] = None,
+) -> gpd.GeoDataFrame:
+    """Left join ZCTA geometry onto df by zip code.
+
+    The cached polygons are sorted by zip code, so the join is a binary search
+    per row and a take rather than a merge.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        Data with zip codes, e.g. the merged data or a level of the cube.
+    on: str
+        Zip code column of df.
+    zoom: int
+        Web map zoom level of the geometry.
+    zctas: Optional[geopandas.GeoDataFrame]
+        Polygons from `load`, to reuse across joins. Loaded if None.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        df with a geometry column. Rows whose zip code isn't a NYC ZCTA (or
+        is missing) have no geometry.
+    """
+    zctas = zctas if zctas is not None else load(zoom)
+    keys: npt.NDArray[np.int64] = zctas.zipcode.to_numpy(np.int64)
+    queries: npt.NDArray[np.float64] = pd.to_numeric(df[on]).to_numpy(
+        np.float64, na_value=np.nan
+    )
+
+    found: npt.NDArray[np.bool_] = ~np.isnan(queries)
+    positions: npt.NDArray[np.intp] = np.full(len(df), -1, dtype=np.intp)
+    lookup: npt.NDArray[np.intp] = np.searchsorted(keys, queries[found])
+    lookup = np.minimum(lookup, len(keys) - 1)
+    positions[found] = np.where(keys[lookup] == queries[found], lookup, -1)
+
+    geometry = zctas.geometry.values.take(positions, allow_fill=True)
+    return gpd.GeoDataFrame(df, geometry=geometry, crs=zctas.crs)
+
+
+def geojson(
+    zoom: int = DEFAULT_ZOOM,
+    zipcodes: Optional[list[int]] = None,
+    zctas: Optional[gpd.GeoDataFrame] = None,
+) -> dict[str, Any]:
+    """ZCTA polygons as a GeoJSON FeatureCollection for plotly or folium.
+
+    Each feature's id is its zip code as a string, so plotly maps it with
+    `locations="zipcode"` and folium with `key_on="feature.id"`.
+
+    Parameters
+    ----------
+    zoom: int
+        Web map zoom level of the geometry.
+    zipcodes: Optional[list[int]]
+        Zip codes to keep. Every ZCTA is kept if None.
+    zctas: Optional[geopandas.GeoDataFrame]
+        Polygons from `load`, to reuse across maps. Loaded if None.
+
+    Returns
+    -------
+    dict[str, Any]
+        GeoJSON FeatureCollection.
+    """
+    zctas = zctas if zctas is not None else load(zoom)
+    if zipcodes is not None:
+        zctas = zctas.loc[zctas.zipcode.isin(zipcodes), :]
+
+    return json.loads(zctas.set_index(zctas.zipcode.astype(str)).to_json())
@@ -0,0 +1,177 @@
+"""Incremental refreshes of the merged Eviction Lab data set.
+
+Eviction Lab republishes its files with a `last_updated` column. Rather than
+rebuilding everything, only rows that are new or were updated since the last
+run are merged. The output is the partitioned data set from
+`eviction_analysis.dataset`, and a refresh only rewrites the years it touches.
+Each file is replaced atomically.
+"""
+import logging
+import os
+import shutil
+from os import PathLike
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from eviction_analysis import dataset, etl_evict, profiling
+
+# A row of Eviction Lab data is identified by these columns.
+KEYS: list[str] = ["city", "type", "geoid", "month"]
+
+
+def read_state(output: str | PathLike[str]) -> Optional[pd.DataFrame]:
+    """Read the keys and last_updated of an existing merged output.
+
+    Parameters
+    ----------
+    output: str | PathLike[str]
+        Partitioned output directory.
+
+    Returns
+    -------
+    Optional[pandas.DataFrame]
+        One row per key with its last_updated, or None if there's no output
+        or it was written without last_updated.
+    """
+    output = Path(output)
+    if not output.is_dir() or not any(output.rglob("*.parquet")):
+        return None
+
+    if "last_updated" not in dataset.dataset(output).schema.names:
+        logging.warning(f"{output} has no last_updated; rebuilding from scratch")
+        return None
+
+    # Only the key columns are read.
+    state: pd.DataFrame = dataset.read_merged(output, columns=KEYS + ["last_updated"])
+    # Rows fan out over FMRs but share their key and last_updated.
+    return state.drop_duplicates(subset=KEYS, ignore_index=True)
+
+
+def _normalize_keys(df: pd.DataFrame) -> pd.DataFrame:
+    """Key columns with consistent dtypes for comparisons across runs."""
+    return pd.DataFrame(
+        {
+            "city": df.city.astype(str),
+            "type": df.type.astype(str),
+            "geoid": df.geoid.astype("Int64"),
+            "month": df.month,
+        }
+    )
+
+
+@profiling.instrument()
+def find_delta(evictions: pd.DataFrame, state: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Rows of evictions that are missing from or newer than state.
+
+    Parameters
+    ----------
+    evictions: pandas.DataFrame
+        Eviction Lab data from `etl_evict.load_eviction` with last_updated.
+    state: Optional[pandas.DataFrame]
+        Output of `read_state`. Every row is new if None.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Subset of evictions that needs to be merged.
+    """
+    if state is None:
+        return evictions
+
+    left: pd.DataFrame = _normalize_keys(evictions)
+    left["last_updated"] = evictions.last_updated.to_numpy()
+    right: pd.DataFrame = _normalize_keys(state)
+    right["last_updated_old"] = state.last_updated.to_numpy()
+
+    # state is unique on KEYS so the left merge keeps evictions' row order.
+    compared: pd.DataFrame = left.merge(right, on=KEYS, how="left")
+    stale: np.ndarray = (
+        compared.last_updated_old.isna()
+        | (compared.last_updated > compared.last_updated_old)
+    ).to_numpy()
+
+    return evictions.loc[stale, :]
+
+
+@profiling.instrument()
+def merge_incremental(
+    evictions: pd.DataFrame,
+    output: str | PathLike[str] = etl_evict.MERGED_DATASET,
+    write_kwargs: Optional[dict[str, Any]] = None,
+    **merge_kwargs: Any,
+) -> pd.DataFrame:
+    """Merge only new or updated Eviction Lab rows into a partitioned output.
+
+    Parameters
+    ----------
+    evictions: pandas.DataFrame
+        Eviction Lab data from `etl_evict.load_eviction`. last_updated must
+        be loaded.
+    output: str | PathLike[str]
+        Partitioned output directory. It's created if it doesn't exist.
+    write_kwargs: Optional[dict[str, Any]]
+        Passed to `dataset.write_merged`, e.g. compression.
+    merge_kwargs: Any
+        Passed to `etl_evict.merge_evic_fmr`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The merged delta. If nothing changed, the (empty) delta is returned
+        unmerged.
+    """
+    if "last_updated" not in evictions.columns:
+        raise ValueError("Incremental merges need last_updated from load_eviction.")
+
+    output = Path(output)
+    write_kwargs = write_kwargs or {}
+    state: Optional[pd.DataFrame] = read_state(output)
+    delta: pd.DataFrame = find_delta(evictions, state)
+    logging.info(f"Incremental merge: {len(delta)} of {len(evictions)} rows changed")
+
+    if delta.empty:
+        return delta
+
+    merged: pd.DataFrame = etl_evict.merge_evic_fmr(
+        delta.reset_index(drop=True), keep_last_updated=True, **merge_kwargs
+    )
+
+    if state is None:
+        # Build the first output next to the target and swap it in so that
+        # readers never see a half written directory.
+        staging: Path = output.with_name(f".{output.name}.{os.getpid()}.tmp")
+        dataset.write_merged(merged, staging, **write_kwargs)
+
+        previous: Path = output.with_name(f".{output.name}.{os.getpid()}.old")
+        if output.exists():
+            os.replace(output, previous)
+        os.replace(staging, output)
+        shutil.rmtree(previous, ignore_errors=True)
+        return merged
+
+    # Every year with changes is rewritten as a whole.
+    years: list[int] = merged.month.dt.year.unique().tolist()
+    existing: pd.DataFrame = dataset.read_merged(
+        output, filters=[("year", "in", years)]
+    ).drop(columns=dataset.PARTITIONS[:1])
+
+    # Drop the stale versions of the updated rows.
+    flagged: pd.DataFrame = _normalize_keys(existing).merge(
+        _normalize_keys(delta).drop_duplicates(), on=KEYS, how="left", indicator=True
+    )
+    existing = existing.loc[(flagged._merge == "left_only").to_numpy(), :]
+
+    combined: pd.DataFrame = pd.concat([existing, merged], ignore_index=True)
+    # Mismatched categories are concatenated as objects.
+    for col in merged.columns[merged.dtypes == "category"]:
+        combined[col] = combined[col].astype("category")
+
+    logging.info(f"Rewriting partitions for {years} with {len(combined)} rows")
+    dataset.replace_partitions(
+        combined.sort_values(KEYS, kind="stable"), output, **write_kwargs
+    )
+
+    return merged
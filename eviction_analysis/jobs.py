@@ -0,0 +1,76 @@
+"""Run independent, named jobs serially or on a thread or process pool.
+
+The loaders, the mirror, the map renderer, and the per city merge all fan out
+the same way: submit every job, gather the results in submission order, and on
+the first failure cancel whatever hasn't started and name the failed job.
+"""
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Callable, Literal, Optional
+
+# Job name to the function and its positional arguments
+Jobs = dict[str, tuple[Callable[..., Any], tuple[Any, ...]]]
+
+
+def run_jobs(
+    jobs: Jobs,
+    executor: Optional[Literal["thread", "process"]] = "thread",
+    max_workers: Optional[int] = None,
+    what: str = "run",
+) -> dict[str, Any]:
+    """Run every job and collect the results.
+
+    Parameters
+    ----------
+    jobs: Jobs
+        Functions and their arguments keyed by a name for error messages.
+    executor: Optional[Literal["thread", "process"]]
+        Pool to run the jobs on. Jobs run one after another in this process
+        if None. Process workers are spawned rather than forked because
+        Arrow's thread pools don't survive a fork, so functions and arguments
+        must be picklable.
+    max_workers: Optional[int]
+        Pool size. Defaults to the executor's own default.
+    what: str
+        Verb for error messages, e.g. "load" in "Failed to load <name>".
+
+    Returns
+    -------
+    dict[str, Any]
+        Result per job in the order of jobs.
+
+    Raises
+    ------
+    RuntimeError
+        A job failed. The message names the job and the original exception
+        is chained. Jobs that haven't started yet are cancelled.
+    """
+    results: dict[str, Any] = {}
+    if executor is None:
+        for name, (func, args) in jobs.items():
+            try:
+                results[name] = func(*args)
+            except Exception as e:
+                raise RuntimeError(f"Failed to {what} {name}") from e
+        return results
+
+    pool: Executor = (
+        ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context("spawn"))
+        if executor == "process"
+        else ThreadPoolExecutor(max_workers=max_workers)
+    )
+    with pool:
+        # Futures are gathered in submission order rather than completion
+        # order so the results line up with the inputs.
+        futures: dict[str, Future] = {
+            name: pool.submit(func, *args) for name, (func, args) in jobs.items()
+        }
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                for pending in futures.values():
+                    pending.cancel()
+                raise RuntimeError(f"Failed to {what} {name}") from e
+
+    return results
@@ -0,0 +1,207 @@
+"""Batch rendering of choropleth maps per metric and period.
+
+We publish a map per metric per month (or year). `map_feature_by_zipcode` in
+the mapping notebook built each one from scratch: it re-read the GeoJSON,
+re-aggregated the merged data, and embedded the full geometry in every HTML
+file. The batch renderer loads the aggregate cube and the cached ZCTA geometry
+once, writes the geometry to a single GeoJSON file in the output directory,
+and renders every map in a process pool. Maps only embed their colors and
+legend and load the shared geometry when they're opened.
+
+Browsers refuse to load the shared GeoJSON from `file://` pages, so serve the
+output directory over HTTP, e.g. `python -m http.server -d assets/maps`.
+"""
+import json
+import logging
+from os import PathLike
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+import branca.colormap as cm
+import folium
+import numpy as np
+import pandas as pd
+
+from eviction_analysis import geometry, profiling
+from eviction_analysis.cube import Cube
+from eviction_analysis.jobs import Jobs, run_jobs
+from eviction_analysis.paths import MAPS_DIR, MERGED_CUBE
+
+# Map defaults taken from the mapping notebook
+CENTER: list[float] = [40.71, -73.94]
+ZOOM_START: int = 10
+COLORMAP: cm.LinearColormap = cm.linear.YlOrRd_09
+LABELS: dict[str, str] = {
+    "filings_2020": "Eviction filings",
+    "filings_avg": "Average filings (pre-pandemic)",
+    "fmr_2br": "Fair market rent, 2 BR",
+    "fmr_2br_90": "Fair market rent, 2 BR (90%)",
+    "fmr_2br_110": "Fair market rent, 2 BR (110%)",
+}
+
+
+class MapSpec(NamedTuple):
+    """A metric to map for a year (2021) or month ("2021-03")."""
+
+    metric: str
+    period: int | str
+    statistic: str = "mean"
+
+    @property
+    def name(self) -> str:
+        return f"{self.metric}-{self.statistic}-{self.period}"
+
+
+def period_filter(period: int | str) -> dict[str, Any]:
+    """Cube filter of a year or a "YYYY-MM" month."""
+    if isinstance(period, int) or str(period).isdigit():
+        return {"year": int(period)}
+    return {"month": pd.Timestamp(f"{period}-01" if len(period) == 7 else period)}
+
+
+def zip_values(cube: Cube, spec: MapSpec) -> dict[str, float]:
+    """The spec's metric per zip code, keyed as in `geometry.geojson`."""
+    column: str = f"{spec.metric}_{spec.statistic}"
+    values: pd.DataFrame = cube.query(
+        ["geoid"], period_filter(spec.period), [spec.metric]
+    )
+    values = values.loc[values.geoid.notna() & values[column].notna(), :]
+    return dict(zip(values.geoid.astype(np.int64).astype(str), values[column]))
+
+
+def render(
+    spec: MapSpec,
+    values: dict[str, float],
+    geojson_path: Path,
+    output: Path,
+    vmin: float,
+    vmax: float,
+) -> Path:
+    """Render one choropleth that loads its geometry from geojson_path.
+
+    Parameters
+    ----------
+    spec: MapSpec
+        Metric and period of the map.
+    values: dict[str, float]
+        Value per zip code.
+    geojson_path: Path
+        Shared GeoJSON. Maps link to it by file name, so it has to be next to
+        output.
+    output: Path
+        HTML file to write.
+    vmin: float
+        Bottom of the color scale.
+    vmax: float
+        Top of the color scale. Maps of a metric share a scale so that
+        periods are comparable.
+
+    Returns
+    -------
+    Path
+        output.
+    """
+    colormap: cm.LinearColormap = COLORMAP.scale(vmin, max(vmax, vmin + 1))
+    colormap.caption = f"{LABELS.get(spec.metric, spec.metric)}, {spec.period}"
+
+    def style(feature: dict[str, Any]) -> dict[str, Any]:
+        value: Optional[float] = values.get(feature["id"])
+        return {
+            "fillColor": colormap(value) if value is not None else "#d9d9d9",
+            "fillOpacity": 0.8 if value is not None else 0.3,
+            "color": "#ffffff",
+            "weight": 0.5,
+        }
+
+    m = folium.Map(location=CENTER, zoom_start=ZOOM_START, tiles="cartodbpositron")
+    layer = folium.GeoJson(
+        str(geojson_path), name=spec.name, style_function=style, embed=False
+    )
+    # folium reads the geometry from the path given but the page should fetch
+    # it relative to itself.
+    layer.embed_link = geojson_path.name
+    layer.add_to(m)
+    colormap.add_to(m)
+
+    m.save(str(output))
+    return output
+
+
+@profiling.instrument()
+def render_maps(
+    specs: list[MapSpec],
+    output_dir: str | PathLike[str] = MAPS_DIR,
+    cube: Optional[Cube] = None,
+    zoom: int = geometry.DEFAULT_ZOOM,
+    max_workers: Optional[int] = None,
+) -> dict[str, Path]:
+    """Render a choropleth per spec.
+
+    Parameters
+    ----------
+    specs: list[MapSpec]
+        Maps to render.
+    output_dir: str | PathLike[str]
+        Directory of the maps and their shared GeoJSON.
+    cube: Optional[Cube]
+        Aggregate cube to read values from. Defaults to the ETL's cube.
+    zoom: int
+        Zoom level of the geometry.
+    max_workers: Optional[int]
+        Rendering processes. Maps are rendered in process if 0.
+
+    Returns
+    -------
+    dict[str, Path]
+        HTML file per spec name.
+
+    Raises
+    ------
+    RuntimeError
+        A map failed to render. The message names the map and the original
+        exception is chained.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cube = cube if cube is not None else Cube.load(MERGED_CUBE)
+
+    geojson_path: Path = output_dir.joinpath(
+        f"zcta-z{geometry.nearest_zoom(zoom)}.geojson"
+    )
+    geojson_path.write_text(json.dumps(geometry.geojson(zoom)))
+
+    values: dict[MapSpec, dict[str, float]] = {
+        spec: zip_values(cube, spec) for spec in specs
+    }
+    # One color scale per metric and statistic
+    scales: dict[tuple[str, str], tuple[float, float]] = {}
+    for spec, spec_values in values.items():
+        key: tuple[str, str] = (spec.metric, spec.statistic)
+        low, high = scales.get(key, (np.inf, -np.inf))
+        scales[key] = (
+            min([low, *spec_values.values()]),
+            max([high, *spec_values.values()]),
+        )
+    for key, (low, high) in scales.items():
+        if not np.isfinite(low):
+            # Nothing to color, e.g. FMRs outside of the FMR years
+            scales[key] = (0.0, 1.0)
+
+    jobs: Jobs = {
+        spec.name: (
+            render,
+            (
+                spec,
+                values[spec],
+                geojson_path,
+                output_dir.joinpath(f"{spec.name}.html"),
+                *scales[(spec.metric, spec.statistic)],
+            ),
+        )
+        for spec in specs
+    }
+    logging.info(f"Rendering {len(jobs)} maps into {output_dir}")
+
+    return run_jobs(
+        jobs, None if max_workers == 0 else "process", max_workers, "render"
+    )
@@ -0,0 +1,298 @@
+"""Memoized loaders for notebooks and other interactive sessions.
+
+Exploration reruns the same cells, and each `load_*` call parses its source
+again. Loaders decorated with `memoize` keep their results in a process wide
+LRU keyed on the function, the source's path, mtime, and size, and the other
+arguments, so rerunning a cell returns in milliseconds. The LRU is bounded by
+the bytes of the cached results rather than their number, and results evicted
+from it (or loaded by an earlier session) can be kept on disk as Arrow IPC
+files that are memory mapped when read.
+
+Every call returns a deep copy of a cached DataFrame so that editing it in
+place can't change what later calls get. Each copy costs a memcpy of the
+frame's buffers and as much memory again as the cached result, which is still
+much cheaper than parsing the source again. Arrow tables are immutable and are shared.
+
+Memoization is off until `enable` is called. The ETL loads each source once,
+so caching there would only keep frames alive after the merge is done with
+them.
+
+    from eviction_analysis import etl_evict, memo
+
+    memo.enable(max_bytes=2 << 30, disk=True)
+    evictions = etl_evict.load_eviction(cities="New York, NY")  # parsed
+    evictions = etl_evict.load_eviction(cities="New York, NY")  # cached
+"""
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from os import PathLike
+from pathlib import Path
+from typing import Any, Callable, Hashable, Optional, TypeVar
+
+import pyarrow as pa
+
+from eviction_analysis import mirror
+from eviction_analysis.cache import CACHE_DIR, fingerprint
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Directory of the on-disk tier
+MEMO_DIR: Path = CACHE_DIR.joinpath("memo")
+# Default bound of the in-memory tier
+MAX_BYTES: int = 1 << 30
+
+
+class _State:
+    """Settings and in-memory tier shared by every memoized loader."""
+
+    def __init__(self) -> None:
+        self.enabled: bool = False
+        self.max_bytes: int = MAX_BYTES
+        self.disk: bool = False
+        self.memo_dir: Path = MEMO_DIR
+        # key -> (result, bytes) from least to most recently used
+        self.entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self.nbytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        # Loaders run in the thread pools of load_sources.
+        self.lock: threading.Lock = threading.Lock()
+
+
+_state: _State = _State()
+
+
+def enable(
+    max_bytes: int = MAX_BYTES, disk: bool = False, memo_dir: Path = MEMO_DIR
+) -> None:
+    """Turn memoization on.
+
+    Parameters
+    ----------
+    max_bytes: int
+        Bound of the in-memory tier. Least recently used results are evicted
+        once the cached results take more.
+    disk: bool
+        Also keep DataFrames and Arrow tables as Arrow IPC files in memo_dir,
+        which outlive the session.
+    memo_dir: Path
+        Directory of the on-disk tier.
+    """
+    with _state.lock:
+        _state.enabled = True
+        _state.max_bytes = max_bytes
+        _state.disk = disk
+        _state.memo_dir = memo_dir
+        _evict()
+
+
+def disable() -> None:
+    """Turn memoization off and drop the in-memory tier."""
+    with _state.lock:
+        _state.enabled = False
+        _state.entries.clear()
+        _state.nbytes = 0
+
+
+def invalidate(func: Optional[Callable[..., Any]] = None, disk: bool = True) -> int:
+    """Drop cached results.
+
+    Parameters
+    ----------
+    func: Optional[Callable[..., Any]]
+        Memoized loader whose results are dropped. Every result is dropped if
+        None.
+    disk: bool
+        Delete the on-disk tier's files too.
+
+    Returns
+    -------
+    int
+        Number of in-memory results that were dropped.
+    """
+    name: Optional[str] = _qualname(func) if func is not None else None
+    with _state.lock:
+        keys: list[Hashable] = [
+            key for key in _state.entries if name is None or key[0] == name
+        ]
+        for key in keys:
+            _state.nbytes -= _state.entries.pop(key)[1]
+
+    if disk:
+        # Files are grouped per loader, so a loader's tier is one directory.
+        target: Path = (
+            _state.memo_dir.joinpath(name) if name is not None else _state.memo_dir
+        )
+        logging.info(f"Removing memoized files in {target}")
+        shutil.rmtree(target, ignore_errors=True)
+
+    return len(keys)
+
+
+def info() -> dict[str, Any]:
+    """Hits, misses, and size of the in-memory tier."""
+    with _state.lock:
+        return {
+            "enabled": _state.enabled,
+            "hits": _state.hits,
+            "misses": _state.misses,
+            "entries": len(_state.entries),
+            "nbytes": _state.nbytes,
+            "max_bytes": _state.max_bytes,
+        }
+
+
+def nbytes(result: Any) -> Optional[int]:
+    """Approximate bytes held by a loader's result or None if it can't be
+    cached."""
+    import pandas as pd
+
+    from eviction_analysis.crosswalk import CrosswalkIndex
+
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(index=True, deep=True).sum())
+    if isinstance(result, pa.Table):
+        return result.nbytes
+    if isinstance(result, CrosswalkIndex):
+        return (
+            result.geoid.nbytes
+            + result.zipcode.nbytes
+            + result.city.nbytes
+            + result.state.nbytes
+        )
+    # Polars LazyFrames and other query plans are cheap to rebuild.
+    return None
+
+
+def _qualname(func: Callable[..., Any]) -> str:
+    func = inspect.unwrap(func)
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def _evict() -> None:
+    """Evict least recently used results until the tier fits. Holds the lock."""
+    while _state.entries and _state.nbytes > _state.max_bytes:
+        key, (_, size) = _state.entries.popitem(last=False)
+        _state.nbytes -= size
+        logging.debug(f"Evicted memoized {key[0]} ({size} bytes)")
+
+
+def _share(result: Any) -> Any:
+    """Copy of a cached result that callers may modify freely."""
+    import pandas as pd
+
+    # A shallow copy shares the data, so in-place edits such as
+    # `df.loc[...] = ...` or `fillna(inplace=True)` would leak into the cache.
+    return result.copy(deep=True) if isinstance(result, pd.DataFrame) else result
+
+
+def _disk_path(key: tuple[Hashable, ...]) -> Path:
+    digest: str = hashlib.sha1(repr(key).encode()).hexdigest()
+    return _state.memo_dir.joinpath(key[0], f"{digest}.arrow")
+
+
+def _read_disk(path: Path) -> Any:
+    """Memory map a result from the on-disk tier."""
+    with pa.memory_map(str(path)) as source:
+        table: pa.Table = pa.ipc.open_file(source).read_all()
+    # Tables written from pandas carry their dtypes in the schema metadata.
+    if table.schema.pandas_metadata is not None:
+        return table.to_pandas()
+    return table
+
+
+def _write_disk(path: Path, result: Any) -> None:
+    """Atomically write a DataFrame or Arrow table to the on-disk tier."""
+    import pandas as pd
+
+    if isinstance(result, pd.DataFrame):
+        table: pa.Table = pa.Table.from_pandas(result)
+    elif isinstance(result, pa.Table):
+        table = result
+    else:
+        return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp: Path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with pa.OSFile(str(temp), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(temp, path)
+
+
+def memoize(path_arg: str = "path") -> Callable[[F], F]:
+    """Memoize a loader while memoization is enabled.
+
+    Parameters
+    ----------
+    path_arg: str
+        Parameter that holds the source's path. The source's mtime and size
+        are part of the key, so editing or replacing the file is a miss.
+
+    Returns
+    -------
+    Callable[[F], F]
+        Decorator.
+    """
+
+    def decorator(func: F) -> F:
+        signature: inspect.Signature = inspect.signature(func)
+        name: str = _qualname(func)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _state.enabled:
+                return func(*args, **kwargs)
+
+            bound: inspect.BoundArguments = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments: dict[str, Any] = dict(bound.arguments)
+            try:
+                source: Path = Path(mirror.locate(arguments.pop(path_arg)))
+                source_fp: dict[str, Any] = fingerprint(source, content=False)
+                key: tuple[Hashable, ...] = (
+                    name,
+                    source_fp["path"],
+                    source_fp["mtime_ns"],
+                    source_fp["size"],
+                    repr(sorted(arguments.items())),
+                )
+            except (OSError, TypeError, ValueError):
+                # Missing sources and URLs aren't memoized; the loader reports
+                # the error or downloads as usual.
+                return func(*args, **kwargs)
+
+            with _state.lock:
+                if key in _state.entries:
+                    _state.entries.move_to_end(key)
+                    _state.hits += 1
+                    return _share(_state.entries[key][0])
+
+            disk_path: Path = _disk_path(key)
+            if _state.disk and disk_path.exists():
+                logging.info(f"Loading memoized {name} from {disk_path}")
+                result: Any = _read_disk(disk_path)
+            else:
+                result = func(*args, **kwargs)
+                if _state.disk:
+                    _write_disk(disk_path, result)
+
+            size: Optional[int] = nbytes(result)
+            with _state.lock:
+                _state.misses += 1
+                if size is not None and size <= _state.max_bytes:
+                    _state.entries[key] = (result, size)
+                    _state.nbytes += size
+                    _evict()
+
+            return _share(result)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
@@ -0,0 +1,352 @@
+"""Local mirror of the online data sets.
+
+Downloads are kept in a content-addressed store (`objects/ab/abcdef....csv`)
+and a JSON manifest maps each file name to its URL, SHA-256, size, ETag, and
+Last-Modified. Loaders resolve their paths with `locate`, so a file that's
+missing from `assets/data/raw` is served from the store and a warm run never
+touches the network. Refreshes are conditional (If-None-Match and
+If-Modified-Since), interrupted downloads resume with Range requests, and
+several files can be fetched in parallel.
+
+Set EVICTION_OFFLINE=1 (or pass offline=True) to never download anything and
+EVICTION_MIRROR to a base URL to fetch every file as `{base}/{file name}`
+instead of from its upstream, e.g. from a local HTTP server.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from email.utils import formatdate
+from os import PathLike
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from eviction_analysis import paths
+from eviction_analysis.jobs import Jobs, run_jobs
+
+## Relative paths
+MIRROR_DIR: Path = (
+    Path(__file__).parents[1].resolve().joinpath("assets", "data", "mirror")
+)
+
+OFFLINE_ENV: str = "EVICTION_OFFLINE"
+MIRROR_ENV: str = "EVICTION_MIRROR"
+# Bytes per read while streaming a download
+CHUNK_SIZE: int = 1 << 20
+TIMEOUT: float = 60.0
+
+# The manifest is rewritten by every download, including parallel ones.
+_manifest_lock: threading.Lock = threading.Lock()
+
+
+class Source(NamedTuple):
+    """Online data set and the file name loaders know it by."""
+
+    url: str
+    filename: str
+
+
+def sources() -> dict[str, Source]:
+    """Known online data sets keyed by file name."""
+    known: list[Source] = [
+        Source(paths.EVICTION_FULL, Path(paths.EVICTION_FULL).name),
+        Source(paths.EVICTION_NY, Path(paths.EVICTION_NY).name),
+        Source(paths.EVICTION_MONTHLY, paths.EVICTION_REL.name),
+        Source(paths.ZIP_TRACT_URL, paths.ZIP_TRACT.name),
+        Source(paths.SMALL_FMR_22, Path(paths.SMALL_FMR_22).name),
+        Source(paths.NYC_ZIP_GEOJSON, Path(paths.NYC_ZIP_GEOJSON).name),
+        Source(paths.NY_TRACTS_URL, paths.NY_TRACTS.name),
+        Source(paths.EVICT_FMR_CSV, Path(paths.EVICT_FMR_CSV).name),
+    ]
+    return {source.filename: source for source in known}
+
+
+def is_offline(offline: Optional[bool] = None) -> bool:
+    """Resolve offline from the argument or the EVICTION_OFFLINE variable."""
+    if offline is not None:
+        return offline
+    return os.environ.get(OFFLINE_ENV, "").lower() in {"1", "true", "yes"}
+
+
+def source_url(source: Source) -> str:
+    """URL to fetch source from, honoring EVICTION_MIRROR."""
+    base: Optional[str] = os.environ.get(MIRROR_ENV)
+    return f"{base.rstrip('/')}/{source.filename}" if base else source.url
+
+
+def read_manifest(mirror_dir: Path = MIRROR_DIR) -> dict[str, dict[str, Any]]:
+    """Manifest entries keyed by file name."""
+    path: Path = mirror_dir.joinpath("manifest.json")
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def _update_manifest(
+    filename: str, entry: dict[str, Any], mirror_dir: Path = MIRROR_DIR
+) -> None:
+    """Atomically replace filename's manifest entry."""
+    with _manifest_lock:
+        manifest: dict[str, dict[str, Any]] = read_manifest(mirror_dir)
+        manifest[filename] = entry
+
+        path: Path = mirror_dir.joinpath("manifest.json")
+        temp: Path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        temp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+        os.replace(temp, path)
+
+
+def object_path(digest: str, suffix: str = "", mirror_dir: Path = MIRROR_DIR) -> Path:
+    """Location of content with SHA-256 digest in the store.
+
+    The suffix is kept so that readers which sniff file types by extension
+    still work.
+    """
+    return mirror_dir.joinpath("objects", digest[:2], f"{digest}{suffix}")
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stored(filename: str, mirror_dir: Path = MIRROR_DIR) -> Optional[Path]:
+    """Stored object of filename if it's in the manifest and intact on disk."""
+    entry: Optional[dict[str, Any]] = read_manifest(mirror_dir).get(filename)
+    if entry is None:
+        return None
+
+    path: Path = object_path(entry["sha256"], Path(filename).suffix, mirror_dir)
+    if not path.exists() or path.stat().st_size != entry["size"]:
+        return None
+    return path
+
+
+def _expected_size(response: Any) -> Optional[int]:
+    """Full size of the resource from Content-Range or Content-Length."""
+    content_range: Optional[str] = response.headers.get("Content-Range")
+    if response.status == 206 and content_range:
+        total: str = content_range.rpartition("/")[2]
+        return int(total) if total.isdigit() else None
+
+    length: Optional[str] = response.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else None
+
+
+def _download(
+    source: Source, entry: Optional[dict[str, Any]], mirror_dir: Path
+) -> Optional[dict[str, Any]]:
+    """Download source into the store.
+
+    Returns the new manifest entry, or None if the server says the stored
+    copy (entry) is still current.
+    """
+    url: str = source_url(source)
+    partial: Path = mirror_dir.joinpath("partial", f"{source.filename}.part")
+    partial_meta: Path = partial.with_suffix(".part.json")
+    partial.parent.mkdir(parents=True, exist_ok=True)
+
+    headers: dict[str, str] = {}
+    offset: int = 0
+    validator: dict[str, Any] = (
+        json.loads(partial_meta.read_text()) if partial_meta.exists() else {}
+    )
+    if partial.exists() and validator.get("url") == url:
+        # Resume, but only if the resource hasn't changed in the meantime.
+        offset = partial.stat().st_size
+        headers["Range"] = f"bytes={offset}-"
+        if validator.get("etag") or validator.get("last_modified"):
+            headers["If-Range"] = validator.get("etag") or validator["last_modified"]
+    elif entry is not None:
+        # Conditional refresh of a stored copy
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    logging.info(f"Fetching {url}" + (f" from byte {offset}" if offset else ""))
+    try:
+        response = urlopen(Request(url, headers=headers), timeout=TIMEOUT)
+    except HTTPError as e:
+        if e.code == 304:
+            return None
+        if e.code == 416:
+            # The partial file is unusable, e.g. it's longer than the resource.
+            partial.unlink(missing_ok=True)
+            return _download(source, entry, mirror_dir)
+        raise
+
+    with response:
+        etag: Optional[str] = response.headers.get("ETag")
+        last_modified: Optional[str] = response.headers.get("Last-Modified")
+        # A 200 (rather than 206) means the server ignored or rejected the
+        # range, so the download starts over.
+        mode: str = "ab" if response.status == 206 else "wb"
+        partial_meta.write_text(
+            json.dumps({"url": url, "etag": etag, "last_modified": last_modified})
+        )
+        with open(partial, mode) as out:
+            shutil.copyfileobj(response, out, CHUNK_SIZE)
+        expected: Optional[int] = _expected_size(response)
+
+    # Reads stop quietly if the connection drops, so the partial file is kept
+    # to resume from rather than stored as a truncated copy.
+    size: int = partial.stat().st_size
+    if expected is not None and size != expected:
+        raise ConnectionError(
+            f"Download of {url} stopped at {size} of {expected} bytes"
+        )
+
+    digest: str = _file_digest(partial)
+    path: Path = object_path(digest, Path(source.filename).suffix, mirror_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(partial, path)
+    partial_meta.unlink(missing_ok=True)
+
+    return {
+        "url": url,
+        "sha256": digest,
+        "size": path.stat().st_size,
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched": formatdate(time.time(), usegmt=True),
+    }
+
+
+def fetch(
+    filename: str,
+    refresh: bool = False,
+    offline: Optional[bool] = None,
+    mirror_dir: Path = MIRROR_DIR,
+) -> Path:
+    """Path of a known online data set in the store, downloading it if needed.
+
+    Parameters
+    ----------
+    filename: str
+        File name of a data set in `sources`.
+    refresh: bool
+        Ask the server whether the stored copy changed (a conditional
+        request) even if there is one.
+    offline: Optional[bool]
+        Never download. Defaults to the EVICTION_OFFLINE variable.
+    mirror_dir: Path
+        Directory that holds the manifest and store.
+
+    Returns
+    -------
+    Path
+        Stored file.
+
+    Raises
+    ------
+    KeyError
+        filename isn't a known data set.
+    FileNotFoundError
+        The file isn't stored and offline mode is on.
+    """
+    source: Source = sources()[filename]
+    stored: Optional[Path] = _stored(filename, mirror_dir)
+    if stored is not None and not refresh:
+        return stored
+
+    if is_offline(offline):
+        if stored is not None:
+            return stored
+        raise FileNotFoundError(
+            f"{filename} isn't in the mirror at {mirror_dir} and offline mode is on."
+        )
+
+    entry: Optional[dict[str, Any]] = (
+        read_manifest(mirror_dir).get(filename) if stored is not None else None
+    )
+    new_entry: Optional[dict[str, Any]] = _download(source, entry, mirror_dir)
+    if new_entry is None:
+        logging.info(f"{filename} is unchanged upstream")
+        return stored
+
+    _update_manifest(filename, new_entry, mirror_dir)
+    return object_path(new_entry["sha256"], Path(filename).suffix, mirror_dir)
+
+
+def fetch_all(
+    filenames: Optional[list[str]] = None,
+    refresh: bool = False,
+    offline: Optional[bool] = None,
+    max_workers: int = 4,
+    mirror_dir: Path = MIRROR_DIR,
+) -> dict[str, Path]:
+    """Fetch several data sets in parallel.
+
+    Parameters
+    ----------
+    filenames: Optional[list[str]]
+        Data sets to fetch. Every known data set is fetched if None.
+    refresh: bool
+        Conditionally refresh stored copies.
+    offline: Optional[bool]
+        Never download.
+    max_workers: int
+        Concurrent downloads.
+    mirror_dir: Path
+        Directory that holds the manifest and store.
+
+    Returns
+    -------
+    dict[str, Path]
+        Stored file per data set in the order requested.
+
+    Raises
+    ------
+    RuntimeError
+        A download failed. The message names the file and the original
+        exception is chained.
+    """
+    filenames = filenames if filenames is not None else list(sources())
+    jobs: Jobs = {
+        filename: (fetch, (filename, refresh, offline, mirror_dir))
+        for filename in filenames
+    }
+    return run_jobs(jobs, "thread", max_workers, "fetch")
+
+
+def locate(
+    path: str | PathLike[str],
+    offline: Optional[bool] = None,
+    mirror_dir: Path = MIRROR_DIR,
+) -> str | Path:
+    """Resolve a loader's path, falling back to the mirror.
+
+    Every loader passes its path through here, so files missing from the raw
+    directory are served from the mirror. Existing local files win. Otherwise, a known online data set with the
+    same file name is served from (or downloaded into) the store. Unknown
+    missing paths are returned as-is so the loader raises its usual error.
+    URLs of unknown files are returned unchanged for the loader to read.
+    """
+    if isinstance(path, str) and "://" in path:
+        filename: str = Path(urlsplit(path).path).name
+        if filename not in sources():
+            return path
+        return fetch(filename, offline=offline, mirror_dir=mirror_dir)
+
+    path = Path(path)
+    if path.exists() or path.name not in sources():
+        return path
+    return fetch(path.name, offline=offline, mirror_dir=mirror_dir)
+
+
+def verify(mirror_dir: Path = MIRROR_DIR) -> list[str]:
+    """File names whose stored object is missing or doesn't match its hash."""
+    bad: list[str] = []
+    for filename, entry in read_manifest(mirror_dir).items():
+        path: Path = object_path(entry["sha256"], Path(filename).suffix, mirror_dir)
+        if not path.exists() or _file_digest(path) != entry["sha256"]:
+            bad.append(filename)
+    return bad
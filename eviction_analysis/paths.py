@@ -0,0 +1,53 @@
+"""Locations of the online data sets and of the local inputs and outputs.
+
+Kept free of third-party imports so that the command line, the mirror, and
+health checks can resolve paths without loading pandas or Arrow.
+"""
+from pathlib import Path
+
+## Online paths
+# Eviction lab data: https://evictionlab.org/
+EVICTION_FULL: str = "https://eviction-lab-data-downloads.s3.amazonaws.com/ets/all_sites_weekly_2020_2021.csv"
+EVICTION_NY: str = "https://evictionlab.org/uploads/newyork_weekly_2020_2021.csv"
+EVICTION_MONTHLY: str = "https://eviction-lab-data-downloads.s3.amazonaws.com/ets/allcities_monthly_2020_2021.csv"
+# Fair market rate data: https://www.huduser.gov/portal/datasets/fmr.html
+SMALL_FMR_22: str = (
+    "https://www.huduser.gov/portal/datasets/fmr/fmr2022/fy2022_safmrs_revised.xlsx"
+)
+# HUD USPS crosswalk: https://www.huduser.gov/portal/datasets/usps_crosswalk.html
+ZIP_TRACT_URL: str = (
+    "https://www.huduser.gov/portal/datasets/usps/ZIP_TRACT_122021.xlsx"
+)
+# Census 2010 cartographic tract boundaries of New York State
+NY_TRACTS_URL: str = (
+    "https://www2.census.gov/geo/tiger/GENZ2010/gz_2010_36_140_00_500k.zip"
+)
+# Used by the mapping tests
+NYC_ZIP_GEOJSON: str = "https://raw.githubusercontent.com/OpenDataDE/State-zip-code-GeoJSON/master/ny_new_york_zip_codes_geo.min.json"
+EVICT_FMR_CSV: str = "https://raw.githubusercontent.com/amelia-ingram/eviction-rent/main/assets/data/raw/Evict_FMR_merged.csv"
+
+## Relative paths
+PKG_DIR: Path = Path(__file__).parents[1].resolve()
+DATA_DIR: Path = PKG_DIR.joinpath("assets", "data", "raw")
+ZIP_TRACT: Path = DATA_DIR.joinpath("ZIP_TRACT_122021.xlsx")
+EVICTION_REL: Path = DATA_DIR.joinpath("evictions_allcities_monthly_2020_2021.csv")
+NYC_BOROUGH: Path = DATA_DIR.joinpath("nyc_zip_borough_neighborhoods_pop.csv")
+NYC_ZCTA: Path = DATA_DIR.joinpath("nyc-zip-code-tabulation-areas-polygons.geojson")
+NY_TRACTS: Path = DATA_DIR.joinpath("gz_2010_36_140_00_500k.zip")
+# Merged outputs
+MERGED: Path = DATA_DIR.parent.joinpath("evict_merged.parquet")
+MERGED_DATASET: Path = DATA_DIR.parent.joinpath("evict_merged")
+MERGED_CUBE: Path = DATA_DIR.parent.joinpath("evict_cube")
+# Memory mappable Arrow IPC copy of the merged data for notebooks
+SNAPSHOT: Path = DATA_DIR.parent.joinpath("evict_merged.arrow")
+# Data quality report of the last merge
+QUALITY_REPORT: Path = DATA_DIR.parent.joinpath("evict_quality.json")
+# Per city partitions written by the batch ETL
+MERGED_CITIES: Path = DATA_DIR.parent.joinpath("evict_cities")
+# Rendered maps
+MAPS_DIR: Path = PKG_DIR.joinpath("assets", "maps")
+# Fair market rate data sets are issued per year
+FMR_YEARS: list[int] = [2020, 2021, 2022]
+FMR_PATHS: list[Path] = [
+    DATA_DIR.joinpath(f"fy{year}_safmrs_revised.xlsx") for year in FMR_YEARS
+]
@@ -0,0 +1,280 @@
+"""Per-stage timing and profiling of the ETL.
+
+Stages are wrapped with `stage` (or decorated with `instrument`). Each stage
+emits a record with its wall time, CPU time, rows in and out, and memory
+delta to every registered hook. Hooks are plain callables, so a hook can log
+(`log_hook`), append JSON lines (`JsonLinesHook`), or collect records in
+process. Nothing is measured while no hooks are registered and profiling is
+off, so instrumentation is free by default.
+
+`enable_profiling` additionally dumps a cProfile and a tracemalloc report per
+stage. Only one cProfile profiler can be active per thread, so nested stages
+are timed but covered by their outermost stage's profile.
+"""
+import cProfile
+import functools
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from os import PathLike
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+# Hooks receive one record per stage.
+Hook = Callable[[dict[str, Any]], None]
+F = TypeVar("F", bound=Callable[..., Any])
+
+HOOKS: list[Hook] = []
+# Directory of per-stage profiles, or None if profiling is off.
+PROFILE_DIR: Optional[Path] = None
+# Lines of each tracemalloc report
+TRACEMALLOC_TOP: int = 25
+
+# Stages nest, e.g. load_fmr inside load_sources. The stack is per thread
+# because the loaders run in thread pools.
+_local: threading.local = threading.local()
+
+
+def add_hook(hook: Hook) -> Hook:
+    """Register hook and return it so it can be removed later."""
+    HOOKS.append(hook)
+    return hook
+
+
+def remove_hook(hook: Hook) -> None:
+    """Unregister hook if it's registered."""
+    if hook in HOOKS:
+        HOOKS.remove(hook)
+
+
+def enable_profiling(path: str | PathLike[str]) -> None:
+    """Dump a cProfile and tracemalloc report per stage to path."""
+    global PROFILE_DIR
+    PROFILE_DIR = Path(path)
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable_profiling() -> None:
+    """Stop dumping reports."""
+    global PROFILE_DIR
+    PROFILE_DIR = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def rss() -> Optional[int]:
+    """Current resident set size of this process in bytes if it's known."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes."""
+    # Linux carries ru_maxrss over from the parent across fork and exec, so
+    # the high water mark of the address space is preferred.
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kibibytes while macOS reports bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def count_rows(obj: Any) -> Optional[int]:
+    """Rows in a DataFrame, Arrow table, index, or a collection of them."""
+    if obj is None or isinstance(obj, (str, bytes, dict)):
+        return None
+    if isinstance(obj, (list, tuple)):
+        counts: list[int] = [
+            count for count in map(count_rows, obj) if count is not None
+        ]
+        return sum(counts) if counts else None
+    # Polars LazyFrames and other query plans don't have a length.
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+def log_hook(record: dict[str, Any]) -> None:
+    """Log a one line summary of record."""
+    rows: str = f"{record['rows_in']} -> {record['rows_out']} rows"
+    memory: str = (
+        f"{record['rss_delta_mb']:+.1f} MiB"
+        if record["rss_delta_mb"] is not None
+        else "memory unknown"
+    )
+    logging.info(
+        f"[{record['stage']}] {record['wall_seconds']:.3f}s wall, "
+        f"{record['cpu_seconds']:.3f}s CPU, {rows}, {memory}"
+    )
+
+
+class JsonLinesHook:
+    """Append records to a JSON lines file.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        File to append to. It's created if it doesn't exist.
+    """
+
+    def __init__(self, path: str | PathLike[str]) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def __call__(self, record: dict[str, Any]) -> None:
+        line: str = json.dumps(record, default=str)
+        with self._lock, open(self.path, "a") as out:
+            out.write(line + "\n")
+
+
+def _emit(record: dict[str, Any]) -> None:
+    for hook in list(HOOKS):
+        try:
+            hook(record)
+        except Exception:
+            # A broken hook shouldn't take down the ETL.
+            logging.exception(f"Profiling hook {hook!r} failed")
+
+
+def _dump_reports(
+    name: str,
+    profiler: Optional[cProfile.Profile],
+    snapshot: Optional[tracemalloc.Snapshot],
+) -> None:
+    """Write the cProfile and tracemalloc reports of a stage."""
+    assert PROFILE_DIR is not None
+    stem: str = name.replace("/", "_")
+
+    if profiler is not None:
+        profiler.dump_stats(PROFILE_DIR.joinpath(f"{stem}.prof"))
+
+    if snapshot is not None and tracemalloc.is_tracing():
+        stats = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+        lines: list[str] = [str(stat) for stat in stats[:TRACEMALLOC_TOP]]
+        PROFILE_DIR.joinpath(f"{stem}.tracemalloc.txt").write_text(
+            "\n".join(lines) + "\n"
+        )
+
+
+@contextmanager
+def stage(name: str, rows_in: Optional[int] = None) -> Iterator[dict[str, Any]]:
+    """Measure the enclosed block as a stage.
+
+    Parameters
+    ----------
+    name: str
+        Stage name. Nested stages are recorded with their parents' names as
+        "parent/child."
+    rows_in: Optional[int]
+        Rows going into the stage, if it has an input.
+
+    Yields
+    ------
+    dict[str, Any]
+        The stage's record. Set "rows_out" (or any other key) on it before
+        the block ends and it's included in what hooks receive.
+    """
+    record: dict[str, Any] = {"stage": name, "rows_in": rows_in, "rows_out": None}
+    if not HOOKS and PROFILE_DIR is None:
+        yield record
+        return
+
+    stack: list[str] = _local.__dict__.setdefault("stack", [])
+    record["stage"] = "/".join(stack + [name])
+    stack.append(name)
+
+    profiler: Optional[cProfile.Profile] = None
+    snapshot: Optional[tracemalloc.Snapshot] = None
+    if PROFILE_DIR is not None:
+        if not _local.__dict__.get("profiling", False):
+            _local.profiling = True
+            profiler = cProfile.Profile()
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+
+    rss_before: Optional[int] = rss()
+    cpu_start: float = time.process_time()
+    start: float = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+
+    try:
+        yield record
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _local.profiling = False
+        wall: float = time.perf_counter() - start
+        cpu: float = time.process_time() - cpu_start
+        rss_after: Optional[int] = rss()
+        stack.pop()
+
+        record.update(
+            {
+                "wall_seconds": wall,
+                # Process wide, so it includes other threads and native pools.
+                "cpu_seconds": cpu,
+                "rss_delta_mb": (
+                    (rss_after - rss_before) / 2**20
+                    if rss_after is not None and rss_before is not None
+                    else None
+                ),
+                "peak_rss_mb": peak_rss() / 2**20,
+                "started": time.time() - wall,
+                "pid": os.getpid(),
+            }
+        )
+        if PROFILE_DIR is not None:
+            _dump_reports(record["stage"], profiler, snapshot)
+        _emit(record)
+
+
+def instrument(name: Optional[str] = None) -> Callable[[F], F]:
+    """Decorate a function as a stage.
+
+    Rows in are counted from the DataFrame arguments and rows out from the
+    return value with `count_rows`.
+
+    Parameters
+    ----------
+    name: Optional[str]
+        Stage name. Defaults to the function's name.
+    """
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not HOOKS and PROFILE_DIR is None:
+                return func(*args, **kwargs)
+
+            inputs: list[Any] = [
+                arg
+                for arg in list(args) + list(kwargs.values())
+                if hasattr(arg, "shape")
+            ]
+            with stage(name or func.__name__, count_rows(inputs)) as record:
+                result: Any = func(*args, **kwargs)
+                record["rows_out"] = count_rows(result)
+            return result
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
@@ -0,0 +1,211 @@
+"""Registry of the column layouts of the source workbooks.
+
+HUD renames the SAFMR columns almost every year ("SAFMR 2020 2br",
+"2021 SAFMR\\n2BR", "SAFMR\\n2BR"), so `load_fmr` used to read every column
+and pick the ones it wanted with a regular expression that grew a branch per
+spelling. Each year's layout is instead declared here as the headers of the
+columns to keep, their canonical names, and their dtypes. A workbook's layout
+is detected from its header row alone, which then drives a read of only those
+columns with their dtypes.
+
+Supporting a new fiscal year is a matter of adding its layout to FMR_SCHEMAS.
+Workbooks that don't match any layout fail before their data is read with a
+report of the headers that are missing and what the workbook has instead.
+"""
+import difflib
+import logging
+from os import PathLike
+from typing import Any, NamedTuple, Optional
+
+
+class Column(NamedTuple):
+    """A column to keep from a source.
+
+    Headers are compared after `normalize`, so the variants may be written
+    exactly as they appear in the workbooks.
+    """
+
+    name: str
+    variants: list[str]
+    dtype: Any
+
+
+class SourceSchema(NamedTuple):
+    """Columns to keep from one layout of a source in output order."""
+
+    name: str
+    columns: list[Column]
+
+    @property
+    def names(self) -> list[str]:
+        """Canonical column names."""
+        return [column.name for column in self.columns]
+
+    @property
+    def dtypes(self) -> dict[str, Any]:
+        """Canonical column name -> dtype."""
+        return {column.name: column.dtype for column in self.columns}
+
+
+# Zip codes and years are small, and rents are whole dollars, so compact types
+# halve the frames. Zip codes are nullable because some of the tracts are null.
+ZIP_DTYPE: str = "Int32"
+RENT_DTYPE: str = "float32"
+
+
+def _safmr_2br(zipcode: str, fmr: str, fmr_90: str, fmr_110: str) -> list[Column]:
+    """Columns of the two bedroom SAFMRs and their payment standards."""
+    return [
+        Column("zipcode", [zipcode], ZIP_DTYPE),
+        Column("fmr_2br", [fmr], RENT_DTYPE),
+        Column("fmr_2br_90", [fmr_90], RENT_DTYPE),
+        Column("fmr_2br_110", [fmr_110], RENT_DTYPE),
+    ]
+
+
+# Layouts of the SAFMR workbooks per fiscal year
+FMR_SCHEMAS: dict[int, SourceSchema] = {
+    2020: SourceSchema(
+        "FY2020 SAFMR",
+        _safmr_2br(
+            "zcta",
+            "SAFMR 2020 2br",
+            "SAFMR20 2br 90pct pay_std",
+            "safmr20 2br 110pct pay_std",
+        ),
+    ),
+    2021: SourceSchema(
+        "FY2021 SAFMR",
+        _safmr_2br(
+            "ZIP\nCode",
+            "2021 SAFMR\n2BR",
+            "SAFMR21\n2BR -\n90%\nPayment\nStandard",
+            "SAFMR21\n2BR -\n110%\nPayment\nStandard",
+        ),
+    ),
+    2022: SourceSchema(
+        "FY2022 SAFMR",
+        _safmr_2br(
+            "ZIP\nCode",
+            "SAFMR\n2BR",
+            "SAFMR\n2BR -\n90%\nPayment\nStandard",
+            "SAFMR\n2BR -\n110%\nPayment\nStandard",
+        ),
+    ),
+}
+
+
+def normalize(header: Any) -> str:
+    """Lower case header and collapse its whitespace (including Excel's line
+    breaks) into single spaces."""
+    return " ".join(str(header).split()).lower()
+
+
+def match(schema: SourceSchema, headers: list[str]) -> Optional[dict[str, str]]:
+    """Map headers to schema's canonical names.
+
+    Returns
+    -------
+    Optional[dict[str, str]]
+        Header -> canonical name in schema order, or None if any column of
+        schema is missing.
+    """
+    normalized: dict[str, str] = {}
+    for header in headers:
+        # The first of duplicated headers wins, like pandas' usecols.
+        normalized.setdefault(normalize(header), header)
+
+    mapping: dict[str, str] = {}
+    for column in schema.columns:
+        found: list[str] = [
+            normalized[variant]
+            for variant in map(normalize, column.variants)
+            if variant in normalized
+        ]
+        if not found:
+            return None
+        mapping[found[0]] = column.name
+
+    return mapping
+
+
+def _diff(schema: SourceSchema, headers: list[str]) -> str:
+    """Report the columns of schema missing from headers with near misses."""
+    normalized: dict[str, str] = {normalize(header): header for header in headers}
+    lines: list[str] = []
+    for column in schema.columns:
+        variants: list[str] = [normalize(variant) for variant in column.variants]
+        if any(variant in normalized for variant in variants):
+            continue
+        close: list[str] = [
+            normalized[near]
+            for near in difflib.get_close_matches(
+                variants[0], list(normalized), n=2, cutoff=0.5
+            )
+        ]
+        lines.append(
+            f"  - {column.name}: expected one of {column.variants!r}"
+            + (f"; closest: {close!r}" if close else "")
+        )
+
+    return "\n".join(lines)
+
+
+def detect(
+    headers: list[str],
+    year: Optional[int] = None,
+    schemas: dict[int, SourceSchema] = FMR_SCHEMAS,
+    source: Optional[str | PathLike[str]] = None,
+) -> tuple[SourceSchema, dict[str, str]]:
+    """Find the layout of a source from its headers.
+
+    Parameters
+    ----------
+    headers: list[str]
+        Header row of the source.
+    year: Optional[int]
+        Year the source is for. Its layout is tried first, followed by the
+        other years' layouts in case HUD reused one.
+    schemas: dict[int, SourceSchema]
+        Layouts to try per year.
+    source: Optional[str | PathLike[str]]
+        Name of the source for the error message.
+
+    Returns
+    -------
+    tuple[SourceSchema, dict[str, str]]
+        Matching layout and its header -> canonical name mapping.
+
+    Raises
+    ------
+    ValueError
+        No layout matches. The message lists the missing columns of the
+        year's layout (or the latest layout) next to the closest headers.
+    """
+    order: list[int] = sorted(schemas, reverse=True)
+    if year in schemas:
+        order.remove(year)
+        order.insert(0, year)
+
+    for key in order:
+        mapping: Optional[dict[str, str]] = match(schemas[key], headers)
+        if mapping is not None:
+            if key != year:
+                logging.info(f"{source or 'Source'} uses the {key} layout")
+            return schemas[key], mapping
+
+    expected: SourceSchema = schemas[order[0]]
+    raise ValueError(
+        f"Unknown layout for {source or 'source'}; no registered layout matches.\n"
+        f"Missing from the {expected.name} layout:\n{_diff(expected, headers)}\n"
+        f"Headers: {headers!r}\n"
+        "Add the layout to eviction_analysis.schemas.FMR_SCHEMAS if it's new."
+    )
+
+
+def read_excel_header(path: str | PathLike[str]) -> list[str]:
+    """Header row of the first sheet of a workbook without reading its data."""
+    # Detection from a cached workbook's schema doesn't need pandas.
+    import pandas as pd
+
+    return [str(header) for header in pd.read_excel(path, nrows=0).columns]
@@ -0,0 +1,675 @@
+"""Local HTTP query service over the merged data.
+
+Dashboards and analysts each loaded `evict_merged.parquet` into their own
+pandas process. `serve` loads the merged data once as an Arrow table (memory
+mapped when it's a single file) and answers filter and aggregate queries over
+HTTP from an asyncio server using only the standard library and Arrow.
+
+    python -m eviction_analysis serve --port 8765
+    curl 'http://127.0.0.1:8765/query?by=borough,month&year=2021&metrics=filings_2020'
+
+Queries group by and filter on zip, borough, neighborhood, month, year, and
+racial_majority. Responses are kept in an LRU keyed on the query and the data
+version (the fingerprint of the data files), so replacing the data is never
+answered from stale entries. Identical queries that arrive while one is
+running share its result, at most `concurrency` queries run at once in a
+thread pool (Arrow's kernels release the GIL), and requests beyond
+`max_pending` queued queries are turned away with 503 rather than piling up.
+Connections are kept alive so that clients can pool them.
+
+`load_test` drives a running server from a pool of keep-alive connections and
+reports throughput and latency percentiles.
+"""
+import asyncio
+import concurrent.futures
+import datetime
+import hashlib
+import http.client
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from http import HTTPStatus
+from os import PathLike
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from eviction_analysis import dataset, snapshot
+from eviction_analysis.cube import FILINGS, METRICS
+from eviction_analysis.etl_evict import EVICTION_COLUMNS, MERGED
+
+# Query name -> column of the merged data
+DIMENSIONS: dict[str, str] = {
+    "zip": "geoid",
+    "borough": "borough",
+    "neighborhood": "neighborhood",
+    "month": "month",
+    "year": "year",
+    "racial_majority": "racial_majority",
+}
+HOST: str = "127.0.0.1"
+PORT: int = 8765
+# Queries running at once
+CONCURRENCY: int = os.cpu_count() or 4
+# Queries waiting for a slot before requests are turned away
+MAX_PENDING: int = 64
+# Responses kept in the LRU
+CACHE_ENTRIES: int = 1024
+# Seconds between checks of the data files for a new version
+RELOAD_INTERVAL: float = 5.0
+# Seconds an idle keep-alive connection is kept open
+KEEPALIVE_TIMEOUT: float = 30.0
+# Requests a load test sends when no targets are given
+TARGETS: list[str] = [
+    "/query?by=borough,month",
+    "/query?by=zip&year=2021",
+    "/query?by=racial_majority,year&borough=Bronx,Brooklyn",
+    "/query?by=neighborhood&month=2021-01&metrics=filings_2020,fmr_2br",
+    "/query?by=month&zip=10453,10457,11226",
+]
+
+
+class Query(NamedTuple):
+    """Canonical form of a query, so that equivalent URLs share a cache entry.
+
+    Attributes
+    ----------
+    by: tuple[str, ...]
+        Dimensions to group by. Everything is rolled into one row if empty.
+    where: tuple[tuple[str, tuple[Any, ...]], ...]
+        Sorted dimensions and the sorted values to keep of each.
+    metrics: tuple[str, ...]
+        Metrics to aggregate.
+    """
+
+    by: tuple[str, ...]
+    where: tuple[tuple[str, tuple[Any, ...]], ...]
+    metrics: tuple[str, ...]
+
+
+def _parse_value(dim: str, value: str) -> Any:
+    """Value of a dimension as stored in the table."""
+    if dim in ("zip", "year"):
+        return int(value)
+    if dim == "month":
+        # Months are stored as their first day.
+        month: datetime.date = datetime.date.fromisoformat(f"{value[:7]}-01")
+        return datetime.datetime(month.year, month.month, 1)
+    return value
+
+
+def parse_query(params: dict[str, list[str]]) -> Query:
+    """Parse the parameters of a /query URL.
+
+    Parameters
+    ----------
+    params: dict[str, list[str]]
+        Output of `urllib.parse.parse_qs`. by and metrics take comma
+        separated names and every dimension takes comma separated values to
+        keep, e.g. `by=borough,year&zip=10453,10457&metrics=filings_2020`.
+
+    Returns
+    -------
+    Query
+
+    Raises
+    ------
+    ValueError
+        Unknown parameter, dimension, or metric, or a malformed value.
+    """
+
+    def split(name: str) -> list[str]:
+        return [
+            item for value in params.get(name, []) for item in value.split(",") if item
+        ]
+
+    unknown: set[str] = set(params) - set(DIMENSIONS) - {"by", "metrics"}
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+
+    by: list[str] = split("by")
+    metrics: list[str] = split("metrics") or METRICS
+    bad: list[str] = [dim for dim in by if dim not in DIMENSIONS]
+    bad += [metric for metric in metrics if metric not in METRICS]
+    if bad:
+        raise ValueError(f"Unknown dimensions or metrics: {', '.join(bad)}")
+
+    where: list[tuple[str, tuple[Any, ...]]] = []
+    for dim in sorted(set(params) & set(DIMENSIONS)):
+        try:
+            values: set[Any] = {_parse_value(dim, value) for value in split(dim)}
+        except ValueError:
+            raise ValueError(f"Malformed {dim}: {','.join(split(dim))}") from None
+        where.append((dim, tuple(sorted(values))))
+
+    return Query(tuple(dict.fromkeys(by)), tuple(where), tuple(dict.fromkeys(metrics)))
+
+
+def _version(path: Path) -> str:
+    """Fingerprint of the data file or of every file of a data set directory."""
+    files: list[Path] = sorted(path.rglob("*.parquet")) if path.is_dir() else [path]
+    digest = hashlib.sha1()
+    for file in files:
+        stat: os.stat_result = file.stat()
+        digest.update(f"{file}:{stat.st_mtime_ns}:{stat.st_size};".encode())
+    return digest.hexdigest()[:16]
+
+
+def read_table(path: str | PathLike[str] = MERGED) -> pa.Table:
+    """Read the merged data in the shape queries run on.
+
+    Dictionary columns are decoded so that they filter and group as plain
+    strings, year is derived from month, and the filings of the rows a merge
+    fanned out are nulled so that each observation is counted once (see
+    `cube.build_cube`). __rows flags the rows that are observations.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Merged Parquet file, which is memory mapped, a snapshot from
+        `snapshot.write_snapshot`, or a partitioned data set from
+        `dataset.write_merged`.
+
+    Returns
+    -------
+    pyarrow.Table
+    """
+    path = Path(path)
+    logging.info(f"Loading merged data to serve from {path}")
+    if path.suffix in (".arrow", ".feather"):
+        # Snapshots are mapped without reading or decoding anything.
+        table: pa.Table = snapshot.load_snapshot(path)
+    elif path.is_dir():
+        table = ds.dataset(
+            path, format="parquet", partitioning=dataset.partitioning()
+        ).to_table()
+    else:
+        table = pq.read_table(path, memory_map=True)
+
+    for position, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(
+                position, field.name, table.column(position).cast(field.type.value_type)
+            )
+    if "year" not in table.column_names:
+        table = table.append_column("year", pc.year(table.column("month")))
+    for col in DIMENSIONS.values():
+        if col not in table.column_names:
+            # Neighborhoods weren't merged.
+            table = table.append_column(col, pa.nulls(len(table), pa.string()))
+
+    # Fanned out copies of an observation have the same Eviction Lab columns.
+    keys: list[str] = [col for col in EVICTION_COLUMNS if col in table.column_names]
+    observation: pa.Array = pa.array(~table.select(keys).to_pandas().duplicated())
+    for col in FILINGS:
+        position = table.schema.get_field_index(col)
+        table = table.set_column(
+            position,
+            col,
+            pc.if_else(
+                observation,
+                table.column(col),
+                pa.scalar(None, table.schema.field(col).type),
+            ),
+        )
+    return table.append_column("__rows", pc.cast(observation, pa.int64()))
+
+
+def run_query(table: pa.Table, query: Query) -> list[dict[str, Any]]:
+    """Answer query from a table from `read_table`.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        One record per group sorted by the by dimensions with rows (Eviction
+        Lab observations) and the sum and mean of each metric.
+    """
+    mask: Optional[pa.ChunkedArray] = None
+    for dim, values in query.where:
+        col: str = DIMENSIONS[dim]
+        keep: pa.ChunkedArray = pc.is_in(
+            table.column(col),
+            value_set=pa.array(values, type=table.schema.field(col).type),
+        )
+        mask = keep if mask is None else pc.and_(mask, keep)
+    if mask is not None:
+        table = table.filter(mask)
+
+    keys: list[str] = [DIMENSIONS[dim] for dim in query.by]
+    if not keys:
+        # Everything rolls into a single constant group.
+        table = table.append_column("__all", pa.array(np.zeros(len(table), np.int8)))
+        keys = ["__all"]
+
+    aggregations: list[tuple[str, str]] = [("__rows", "sum")]
+    for metric in query.metrics:
+        aggregations += [(metric, "sum"), (metric, "count")]
+    grouped: pa.Table = (
+        table.group_by(keys)
+        .aggregate(aggregations)
+        .sort_by([(key, "ascending") for key in keys])
+    )
+
+    records: list[dict[str, Any]] = []
+    for row in grouped.to_pylist():
+        record: dict[str, Any] = {dim: row[DIMENSIONS[dim]] for dim in query.by}
+        record["rows"] = row["__rows_sum"] or 0
+        for metric in query.metrics:
+            total: Optional[float] = row[f"{metric}_sum"]
+            count: int = row[f"{metric}_count"]
+            record[f"{metric}_sum"] = total
+            record[f"{metric}_mean"] = total / count if count else None
+        records.append(record)
+
+    return records
+
+
+class Store:
+    """The merged data and its version, reloaded when its files change.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Merged Parquet file, Arrow snapshot, or partitioned data set.
+    reload_interval: float
+        Seconds between checks of the files.
+    """
+
+    def __init__(
+        self,
+        path: str | PathLike[str] = MERGED,
+        reload_interval: float = RELOAD_INTERVAL,
+    ) -> None:
+        self.path: Path = Path(path)
+        self.reload_interval: float = reload_interval
+        self._lock: threading.Lock = threading.Lock()
+        self._checked: float = time.monotonic()
+        # Swapped as one so that a version always goes with its table
+        self.current: tuple[str, pa.Table] = (_version(self.path), read_table(path))
+
+    def due(self) -> bool:
+        """Whether the files should be checked for a new version."""
+        return time.monotonic() - self._checked >= self.reload_interval
+
+    def refresh(self) -> None:
+        """Reload the table if the files changed. Queries keep running on the
+        table they started with."""
+        with self._lock:
+            if not self.due():
+                return
+            self._checked = time.monotonic()
+            try:
+                version: str = _version(self.path)
+            except OSError:
+                # Mid replace; keep serving what's loaded.
+                return
+            if version != self.current[0]:
+                logging.info(f"Reloading {self.path} (version {version})")
+                self.current = (version, read_table(self.path))
+
+
+class ResponseCache:
+    """LRU of encoded responses."""
+
+    def __init__(self, max_entries: int = CACHE_ENTRIES) -> None:
+        self.max_entries: int = max_entries
+        self.entries: OrderedDict[tuple[str, Query], bytes] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: tuple[str, Query]) -> Optional[bytes]:
+        body: Optional[bytes] = self.entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: tuple[str, Query], body: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        self.entries[key] = body
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class Busy(Exception):
+    """Too many queries are waiting for a slot."""
+
+
+def _json_default(value: Any) -> Any:
+    # Months are whole days.
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} isn't JSON serializable")
+
+
+class Server:
+    """asyncio HTTP server over a Store.
+
+    Routes
+    ------
+    GET /query
+        Aggregates as JSON, see `parse_query`.
+    GET /health
+        Data version and rows.
+    GET /stats
+        Cache and concurrency counters.
+    """
+
+    def __init__(
+        self,
+        store: Store,
+        concurrency: int = CONCURRENCY,
+        max_pending: int = MAX_PENDING,
+        cache_entries: int = CACHE_ENTRIES,
+    ) -> None:
+        self.store: Store = store
+        self.cache: ResponseCache = ResponseCache(cache_entries)
+        self.max_pending: int = max_pending
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="query"
+        )
+        # Created on the server's loop in `serve`
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._concurrency: int = concurrency
+        self._inflight: dict[tuple[str, Query], asyncio.Future[bytes]] = {}
+        self.pending: int = 0
+        self.served: int = 0
+        self.rejected: int = 0
+
+    def _encode(self, query: Query, version: str, table: pa.Table) -> bytes:
+        started: float = time.perf_counter()
+        records: list[dict[str, Any]] = run_query(table, query)
+        logging.debug(
+            f"Answered {query} in {time.perf_counter() - started:.3f}s "
+            f"({len(records)} rows)"
+        )
+        return json.dumps(
+            {"version": version, "rows": records}, default=_json_default
+        ).encode()
+
+    async def answer(self, query: Query) -> tuple[str, bytes]:
+        """Version and encoded response to query, from the cache if possible.
+
+        Raises
+        ------
+        Busy
+            max_pending queries are already waiting.
+        """
+        loop = asyncio.get_running_loop()
+        if self.store.due():
+            # Off the query pool so that reloads don't wait for slots
+            await loop.run_in_executor(None, self.store.refresh)
+        version, table = self.store.current
+        key: tuple[str, Query] = (version, query)
+        body: Optional[bytes] = self.cache.get(key)
+        if body is not None:
+            return version, body
+
+        # Identical queries in flight share one computation.
+        running: Optional[asyncio.Future[bytes]] = self._inflight.get(key)
+        if running is not None:
+            return version, await asyncio.shield(running)
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Busy()
+
+        assert self._slots is not None
+        future: asyncio.Future[bytes] = loop.create_future()
+        self._inflight[key] = future
+        self.pending += 1
+        try:
+            async with self._slots:
+                body = await loop.run_in_executor(
+                    self.executor, self._encode, query, version, table
+                )
+            self.cache.put(key, body)
+            future.set_result(body)
+            return version, body
+        except Exception as error:
+            future.set_exception(error)
+            # Marks the exception retrieved if nobody else was waiting.
+            future.exception()
+            raise
+        finally:
+            self.pending -= 1
+            del self._inflight[key]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "version": self.store.current[0],
+            "served": self.served,
+            "rejected": self.rejected,
+            "pending": self.pending,
+            "inflight": len(self._inflight),
+            "cache_entries": len(self.cache.entries),
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+        }
+
+    async def _route(
+        self, method: str, target: str, headers: dict[str, str]
+    ) -> tuple[HTTPStatus, bytes, dict[str, str]]:
+        """Status, body, and extra headers of a request."""
+        url: urllib.parse.SplitResult = urllib.parse.urlsplit(target)
+        if method not in ("GET", "HEAD"):
+            return HTTPStatus.METHOD_NOT_ALLOWED, b"", {"Allow": "GET, HEAD"}
+        if url.path == "/health":
+            version, table = self.store.current
+            body: bytes = json.dumps({"version": version, "rows": len(table)}).encode()
+            return HTTPStatus.OK, body, {}
+        if url.path == "/stats":
+            return HTTPStatus.OK, json.dumps(self.stats()).encode(), {}
+        if url.path != "/query":
+            return HTTPStatus.NOT_FOUND, b'{"error": "not found"}', {}
+
+        try:
+            query: Query = parse_query(urllib.parse.parse_qs(url.query))
+            version, body = await self.answer(query)
+        except ValueError as error:
+            return (
+                HTTPStatus.BAD_REQUEST,
+                json.dumps({"error": str(error)}).encode(),
+                {},
+            )
+        except Busy:
+            return (
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                b'{"error": "too many queries"}',
+                {"Retry-After": "1"},
+            )
+
+        # Clients that kept a response revalidate it against the version.
+        etag: str = f'"{version}-{hashlib.sha1(repr(query).encode()).hexdigest()[:16]}"'
+        if headers.get("if-none-match") == etag:
+            return HTTPStatus.NOT_MODIFIED, b"", {"ETag": etag}
+        return HTTPStatus.OK, body, {"ETag": etag}
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve the requests of one keep-alive connection."""
+        try:
+            while True:
+                try:
+                    line: bytes = await asyncio.wait_for(
+                        reader.readline(), KEEPALIVE_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    break
+                if not line.strip():
+                    break
+                method, target, protocol = line.decode("latin-1").split(maxsplit=2)
+
+                headers: dict[str, str] = {}
+                while True:
+                    header: bytes = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                # Bodies aren't used by any route.
+                if int(headers.get("content-length", 0)):
+                    await reader.readexactly(int(headers["content-length"]))
+
+                status, body, extra = await self._route(method, target, headers)
+                self.served += 1
+                keep_alive: bool = (
+                    headers.get("connection", "").lower() != "close"
+                    and protocol.strip() == "HTTP/1.1"
+                )
+                head: list[str] = [
+                    f"HTTP/1.1 {status.value} {status.phrase}",
+                    "Content-Type: application/json",
+                    f"Content-Length: {len(body)}",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                ] + [f"{name}: {value}" for name, value in extra.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as error:
+            logging.debug(f"Dropped connection: {error!r}")
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = HOST, port: int = PORT) -> None:
+        """Serve until cancelled."""
+        self._slots = asyncio.Semaphore(self._concurrency)
+        server: asyncio.AbstractServer = await asyncio.start_server(
+            self.handle, host, port
+        )
+        logging.info(f"Serving {self.store.path} on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False)
+
+
+def serve(
+    path: str | PathLike[str] = MERGED,
+    host: str = HOST,
+    port: int = PORT,
+    concurrency: int = CONCURRENCY,
+    max_pending: int = MAX_PENDING,
+    cache_entries: int = CACHE_ENTRIES,
+) -> None:
+    """Load the merged data and serve queries on it until interrupted.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Merged Parquet file, Arrow snapshot, or partitioned data set.
+    host: str
+        Interface to listen on. Defaults to localhost only.
+    port: int
+        Port to listen on.
+    concurrency: int
+        Queries that run at once.
+    max_pending: int
+        Queries that may wait for a slot before requests get 503.
+    cache_entries: int
+        Responses kept in the cache. 0 disables it, e.g. for load tests of
+        the query path.
+    """
+    server: Server = Server(Store(path), concurrency, max_pending, cache_entries)
+    try:
+        asyncio.run(server.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+def load_test(
+    url: str = f"http://{HOST}:{PORT}",
+    targets: Optional[list[str]] = None,
+    requests: int = 1000,
+    concurrency: int = 8,
+) -> dict[str, Any]:
+    """Send requests to a running server from concurrent keep-alive
+    connections.
+
+    Parameters
+    ----------
+    url: str
+        Base URL of the server.
+    targets: Optional[list[str]]
+        Paths and queries to cycle through. Defaults to TARGETS.
+    requests: int
+        Total requests to send.
+    concurrency: int
+        Connections, each sending its share of the requests in turn.
+
+    Returns
+    -------
+    dict[str, Any]
+        Requests, non-200 responses, failed requests, seconds, requests per
+        second, and the 50th, 95th, and 99th percentile latencies in
+        milliseconds.
+    """
+    base: urllib.parse.SplitResult = urllib.parse.urlsplit(url)
+    targets = targets or TARGETS
+    counter = itertools.count()
+
+    def client() -> tuple[list[float], int, int]:
+        connection = http.client.HTTPConnection(base.hostname, base.port, timeout=60)
+        latencies: list[float] = []
+        statuses: int = 0
+        failures: int = 0
+        while (n := next(counter)) < requests:
+            started: float = time.perf_counter()
+            try:
+                connection.request("GET", targets[n % len(targets)])
+                response: http.client.HTTPResponse = connection.getresponse()
+                response.read()
+                statuses += response.status != HTTPStatus.OK
+            except (OSError, http.client.HTTPException):
+                failures += 1
+                connection.close()
+                continue
+            latencies.append(time.perf_counter() - started)
+        connection.close()
+        return latencies, statuses, failures
+
+    started: float = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results: list[tuple[list[float], int, int]] = list(
+            pool.map(lambda _: client(), range(concurrency))
+        )
+    seconds: float = time.perf_counter() - started
+
+    latencies: np.ndarray = np.array(
+        [latency for result in results for latency in result[0]]
+    )
+    p50, p95, p99 = (
+        np.percentile(latencies, [50, 95, 99]) * 1000
+        if len(latencies)
+        else [np.nan] * 3
+    )
+    return {
+        "requests": requests,
+        "non_200": sum(result[1] for result in results),
+        "failures": sum(result[2] for result in results),
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(len(latencies) / seconds, 1),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+    }
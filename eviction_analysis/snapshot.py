@@ -0,0 +1,170 @@
+"""Arrow IPC (Feather V2) snapshot of the merged data for notebooks.
+
+Notebooks start from the CSVs on GitHub or rerun the ETL, and even
+`evict_merged.parquet` has to be decompressed and have its categoricals
+rebuilt every time it's read. The ETL also writes the merged data as an
+Arrow IPC file instead. Buffers in the file are laid out exactly as in memory,
+so `load_snapshot` memory maps it and hands out columns that point into the
+page cache without reading or copying anything. Opening it takes about the
+same time regardless of its size, and only the pages of the columns that are
+used are ever read.
+
+    from eviction_analysis import snapshot
+
+    merged = snapshot.read_snapshot(columns=["geoid", "month", "filings_2020"])
+
+The categorical columns are stored as dictionary arrays with one dictionary
+per column, so they come back as pandas categoricals without re-encoding.
+Buffers can be compressed with LZ4 or ZSTD for a smaller file at the cost of
+decompressing the whole file on load, which also rules out zero-copy.
+"""
+import logging
+import os
+from os import PathLike
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+import pyarrow.ipc as ipc
+
+from eviction_analysis import profiling
+from eviction_analysis.paths import SNAPSHOT
+
+# Columns stored as dictionary arrays
+CATEGORICAL: list[str] = [
+    "geoid",
+    "city",
+    "type",
+    "racial_majority",
+    "borough",
+    "post_office",
+    "neighborhood",
+]
+# Rows per record batch. Batches share their dictionaries.
+CHUNKSIZE: int = 1 << 16
+
+
+def to_table(merged: pd.DataFrame | pa.Table) -> pa.Table:
+    """Merged data as an Arrow table with dictionary encoded categoricals."""
+    if isinstance(merged, pd.DataFrame):
+        # Encoding a column after the conversion would leave pandas metadata
+        # of its old dtype, which nullable integers can't be read back with.
+        merged = merged.astype(
+            {
+                col: "category"
+                for col in CATEGORICAL
+                if col in merged.columns
+                and not isinstance(merged[col].dtype, pd.CategoricalDtype)
+            }
+        )
+    table: pa.Table = (
+        pa.Table.from_pandas(merged, preserve_index=False)
+        if isinstance(merged, pd.DataFrame)
+        else merged
+    )
+    for col in CATEGORICAL:
+        if col in table.column_names and not pa.types.is_dictionary(
+            table.schema.field(col).type
+        ):
+            position: int = table.schema.get_field_index(col)
+            table = table.set_column(
+                position, col, pc.dictionary_encode(table.column(col))
+            )
+
+    # The IPC file format can't replace a dictionary between batches.
+    return table.unify_dictionaries()
+
+
+@profiling.instrument()
+def write_snapshot(
+    merged: pd.DataFrame | pa.Table,
+    path: str | PathLike[str] = SNAPSHOT,
+    compression: Optional[str] = None,
+    chunksize: int = CHUNKSIZE,
+) -> Path:
+    """Atomically write merged data as an Arrow IPC file.
+
+    Parameters
+    ----------
+    merged: pandas.DataFrame | pyarrow.Table
+        Output of `etl_evict.merge_evic_fmr` or a table of
+        `etl_arrow.merge_evic_fmr`'s batches.
+    path: str | PathLike[str]
+        Output file.
+    compression: Optional[str]
+        "lz4" or "zstd" to compress the buffers. Uncompressed snapshots are
+        the ones that load zero-copy.
+    chunksize: int
+        Rows per record batch.
+
+    Returns
+    -------
+    Path
+        path.
+    """
+    path = Path(path)
+    table: pa.Table = to_table(merged)
+    logging.info(f"Writing a snapshot of {table.num_rows} merged rows to {path}")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp: Path = path.with_suffix(f".{os.getpid()}.tmp")
+    feather.write_feather(
+        table,
+        temp,
+        compression=compression or "uncompressed",
+        chunksize=chunksize,
+    )
+    os.replace(temp, path)
+    return path
+
+
+def load_snapshot(
+    path: str | PathLike[str] = SNAPSHOT, columns: Optional[list[str]] = None
+) -> pa.Table:
+    """Memory map a snapshot as an Arrow table.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Snapshot from `write_snapshot`.
+    columns: Optional[list[str]]
+        Columns to keep. Every column if None.
+
+    Returns
+    -------
+    pyarrow.Table
+        Table backed by the mapped file if it's uncompressed.
+    """
+    # Feather's own column selection reads the file into memory.
+    with ipc.open_file(pa.memory_map(str(path))) as reader:
+        table: pa.Table = reader.read_all()
+    return table if columns is None else table.select(columns)
+
+
+@profiling.instrument()
+def read_snapshot(
+    path: str | PathLike[str] = SNAPSHOT, columns: Optional[list[str]] = None
+) -> pd.DataFrame:
+    """Read a snapshot into pandas with its categoricals.
+
+    Only the selected columns are converted, so loading a few columns of a
+    large snapshot stays quick. Dictionary columns become categoricals
+    without hashing their values.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Snapshot from `write_snapshot`.
+    columns: Optional[list[str]]
+        Columns to read. Every column if None.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Merged data as written.
+    """
+    # Blocks per column skip pandas' consolidation copy.
+    return load_snapshot(path, columns).to_pandas(split_blocks=True)
@@ -0,0 +1,338 @@
+"""Area weighted allocation of census tract filings to NYC ZCTAs.
+
+`merge_evic_fmr` reconciles tract and zip code GEOIDs through the HUD
+crosswalk, which drops tracts the crosswalk doesn't list and can't split a
+tract's filings between the zip codes it overlaps. This stage overlays the
+Census cartographic tract boundaries on the bundled ZCTA polygons instead.
+Candidate pairs come from an STRtree over the ZCTAs, and each pair's weight is
+the pair's overlap, computed in an equal area projection, as a share of the
+tract's total overlap with the ZCTAs. Building zip codes (e.g. 10118) are ZCTAs
+nested inside others, so a tract's overlaps can add up to more than its area;
+normalizing by the total allocates each tract's filings exactly once.
+
+The overlay only depends on the two boundary files, so it's computed once and
+cached as a sparse weight matrix (GEOID, zip code, weight) next to the SAFMR
+cache. Allocating filings is then a sparse matrix product: a binary search of
+each row's GEOID and a weighted `numpy.bincount` per zip code and group.
+ZCTA zip codes are part of the matrix with a weight of one, so zip code and
+tract GEOIDs are allocated together.
+"""
+import logging
+from os import PathLike
+from pathlib import Path
+from typing import Any, Optional
+
+import geopandas as gpd
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from eviction_analysis import cache, geometry, mirror, profiling
+from eviction_analysis.crosswalk import expand
+from eviction_analysis.paths import NY_TRACTS, NYC_ZCTA
+
+# Artifact name of the weight matrix in the cache
+WEIGHTS_KIND: str = ".zcta-weights"
+# NAD83 / Conus Albers, an equal area projection
+EQUAL_AREA: int = 5070
+# Overlaps smaller than this share of a tract are slivers along shared borders.
+MIN_WEIGHT: float = 1e-6
+# ZCTAs are five digit zip codes from 00501 up. Lower codes are other features
+# of the GeoJSON such as Central Park (00083).
+MIN_ZCTA: int = 501
+# Bumped whenever overlay changes so that cached matrices are rebuilt.
+WEIGHTS_VERSION: int = 2
+
+
+class WeightMatrix:
+    """Sparse GEOID to zip code allocation weights.
+
+    Parameters
+    ----------
+    geoid: npt.NDArray[np.int64]
+        Sorted tract GEOIDs and ZCTA zip codes, one entry per nonzero weight.
+    zipcode: npt.NDArray[np.int32]
+        ZCTA of each entry.
+    weight: npt.NDArray[np.float64]
+        Share of the GEOID's overlap with the ZCTAs inside the ZCTA. A GEOID's
+        weights sum to one.
+    """
+
+    def __init__(
+        self,
+        geoid: npt.NDArray[np.int64],
+        zipcode: npt.NDArray[np.int32],
+        weight: npt.NDArray[np.float64],
+    ) -> None:
+        self.geoid = geoid
+        self.zipcode = zipcode
+        self.weight = weight
+
+    def __len__(self) -> int:
+        return len(self.geoid)
+
+    @classmethod
+    def read(cls, path: str | PathLike[str]) -> "WeightMatrix":
+        """Read a persisted matrix."""
+        table: pa.Table = pq.read_table(path)
+        return cls(
+            table.column("geoid").to_numpy(),
+            table.column("zipcode").to_numpy(),
+            table.column("weight").to_numpy(),
+        )
+
+    def to_arrow(self) -> pa.Table:
+        """Matrix as an Arrow table of its nonzero entries."""
+        return pa.table(
+            {"geoid": self.geoid, "zipcode": self.zipcode, "weight": self.weight}
+        )
+
+    def zipcodes(self) -> npt.NDArray[np.int32]:
+        """Unique zip codes (columns) of the matrix."""
+        return np.unique(self.zipcode)
+
+
+def read_tracts(path: str | PathLike[str] = NY_TRACTS) -> gpd.GeoDataFrame:
+    """Read Census cartographic tract boundaries.
+
+    Parameters
+    ----------
+    path: str | PathLike[str]
+        Shapefile or zipped shapefile of tracts, e.g. the 2010 cartographic
+        boundaries of New York State.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        geoid as an integer and geometry.
+    """
+    path = mirror.locate(path)
+    logging.info(f"Reading census tract polygons from {path}")
+
+    tracts: gpd.GeoDataFrame = gpd.read_file(
+        f"zip://{path}" if Path(path).suffix == ".zip" else path
+    )
+    # The 2010 files split the GEOID into its parts while later ones have it.
+    if "GEOID" in tracts.columns:
+        geoid: pd.Series = tracts.GEOID
+    else:
+        geoid = tracts.STATE + tracts.COUNTY + tracts.TRACT
+
+    return gpd.GeoDataFrame(
+        {"geoid": geoid.astype(np.int64).to_numpy()},
+        geometry=tracts.geometry.values,
+        crs=tracts.crs,
+    )
+
+
+def overlay(tracts: gpd.GeoDataFrame, zctas: gpd.GeoDataFrame) -> WeightMatrix:
+    """Compute area weights of tracts over ZCTAs.
+
+    Parameters
+    ----------
+    tracts: geopandas.GeoDataFrame
+        Output of `read_tracts`.
+    zctas: geopandas.GeoDataFrame
+        Output of `geometry.read_zcta`.
+
+    Returns
+    -------
+    WeightMatrix
+        Weights of every tract that overlaps a ZCTA plus a weight of one from
+        each ZCTA's zip code to itself. Features that aren't ZCTAs are dropped.
+    """
+    zctas = zctas.loc[zctas.zipcode.to_numpy(np.int64) >= MIN_ZCTA, :]
+    tract_shapes: gpd.GeoSeries = tracts.geometry.to_crs(EQUAL_AREA)
+    zcta_shapes: gpd.GeoSeries = zctas.geometry.to_crs(EQUAL_AREA)
+
+    # Bulk STRtree query of every tract at once. geopandas 0.12 folded
+    # query_bulk into query.
+    sindex = zcta_shapes.sindex
+    query = getattr(sindex, "query_bulk", sindex.query)
+    tract_pos, zcta_pos = query(tract_shapes.values, predicate="intersects")
+    logging.info(f"Overlaying {len(tract_pos)} tract and ZCTA candidate pairs")
+
+    overlap: npt.NDArray[np.float64] = (
+        gpd.GeoSeries(tract_shapes.values[tract_pos])
+        .intersection(gpd.GeoSeries(zcta_shapes.values[zcta_pos]))
+        .area.to_numpy()
+    )
+    keep: npt.NDArray[np.bool_] = (
+        overlap / tract_shapes.area.to_numpy()[tract_pos] >= MIN_WEIGHT
+    )
+    tract_pos, zcta_pos, overlap = tract_pos[keep], zcta_pos[keep], overlap[keep]
+
+    # Nested ZCTAs count the same area twice, so weights are shares of the
+    # tract's total overlap rather than of its area.
+    total: npt.NDArray[np.float64] = np.bincount(
+        tract_pos, weights=overlap, minlength=len(tracts)
+    )
+    weight: npt.NDArray[np.float64] = overlap / total[tract_pos]
+
+    zipcodes: npt.NDArray[np.int64] = zctas.zipcode.to_numpy(np.int64)
+    frame: pd.DataFrame = pd.DataFrame(
+        {
+            "geoid": np.concatenate(
+                [tracts.geoid.to_numpy(np.int64)[tract_pos], zipcodes]
+            ),
+            "zipcode": np.concatenate([zipcodes[zcta_pos], zipcodes]).astype(np.int32),
+            "weight": np.concatenate([weight, np.ones(len(zipcodes))]),
+        }
+    ).sort_values(["geoid", "zipcode"], kind="stable", ignore_index=True)
+
+    return WeightMatrix(
+        frame.geoid.to_numpy(), frame.zipcode.to_numpy(), frame.weight.to_numpy()
+    )
+
+
+def _sources_fingerprint(
+    tracts_path: Path, zcta_path: Path, content: bool = True
+) -> dict[str, Any]:
+    """Fingerprints of both boundary files the matrix depends on."""
+    return {
+        "version": WEIGHTS_VERSION,
+        "tracts": cache.fingerprint(tracts_path, content),
+        "zctas": cache.fingerprint(zcta_path, content),
+    }
+
+
+def _is_fresh(
+    tracts_path: Path, zcta_path: Path, cache_dir: Path = cache.CACHE_DIR
+) -> bool:
+    """Check the cached matrix against the boundary files' mtimes and sizes."""
+    cached: Optional[dict[str, Any]] = cache.cached_fingerprint(
+        tracts_path, cache_dir, WEIGHTS_KIND
+    )
+    if cached is None:
+        return False
+
+    current: dict[str, Any] = _sources_fingerprint(tracts_path, zcta_path, False)
+    if cached.get("version") != current.pop("version"):
+        return False
+    return all(
+        cached.get(name, {}).get(field) == fp[field]
+        for name, fp in current.items()
+        for field in ("path", "mtime_ns", "size")
+    )
+
+
+@profiling.instrument()
+def load_weights(
+    tracts_path: str | PathLike[str] = NY_TRACTS,
+    zcta_path: str | PathLike[str] = NYC_ZCTA,
+    cache_dir: Path = cache.CACHE_DIR,
+) -> WeightMatrix:
+    """Load the tract to ZCTA weight matrix, overlaying the boundaries first if
+    it isn't cached or either file changed.
+
+    Parameters
+    ----------
+    tracts_path: str | PathLike[str]
+        Census tract boundaries for `read_tracts`.
+    zcta_path: str | PathLike[str]
+        NYC ZCTA polygons as GeoJSON.
+    cache_dir: Path
+        Directory that holds the cache.
+
+    Returns
+    -------
+    WeightMatrix
+        Allocation weights.
+    """
+    tracts_path = mirror.locate(tracts_path)
+    zcta_path = mirror.locate(zcta_path)
+    weights_path: Path = cache.cache_path(tracts_path, cache_dir, WEIGHTS_KIND)
+    if _is_fresh(tracts_path, zcta_path, cache_dir):
+        logging.info(f"Loading tract to ZCTA weights from {weights_path}")
+        return WeightMatrix.read(weights_path)
+
+    source_fp: dict[str, Any] = _sources_fingerprint(tracts_path, zcta_path)
+    weights: WeightMatrix = overlay(
+        read_tracts(tracts_path), geometry.read_zcta(zcta_path)
+    )
+    logging.info(f"Saving {len(weights)} tract to ZCTA weights to {weights_path}")
+    cache.write_cached(weights.to_arrow(), weights_path, source_fp)
+
+    return weights
+
+
+@profiling.instrument()
+def allocate(
+    evictions: pd.DataFrame,
+    weights: Optional[WeightMatrix] = None,
+    values: Optional[list[str]] = None,
+    by: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """Allocate filings to ZCTAs by area.
+
+    Each row's values are split between the ZCTAs its GEOID overlaps in
+    proportion to the weights and summed per zip code and group. Rows whose
+    GEOID isn't in the matrix (outside NYC) are dropped.
+
+    Parameters
+    ----------
+    evictions: pandas.DataFrame
+        Eviction Lab data with geoid, e.g. from `etl_evict.load_eviction`.
+    weights: Optional[WeightMatrix]
+        Matrix from `load_weights`. Loaded if None.
+    values: Optional[list[str]]
+        Additive columns to allocate. Defaults to the filing counts.
+    by: Optional[list[str]]
+        Columns to keep as groups, e.g. month. Defaults to ["month"].
+
+    Returns
+    -------
+    pandas.DataFrame
+        zipcode, the by columns, and the allocated values per zip code and
+        group that received any weight.
+    """
+    weights = weights if weights is not None else load_weights()
+    values = values if values is not None else ["filings_2020", "filings_avg"]
+    by = by if by is not None else ["month"]
+
+    geoids: npt.NDArray[np.int64] = evictions.geoid.astype("Int64").to_numpy(
+        np.int64, na_value=-1
+    )
+    row_pos, entry_pos = expand(weights.geoid, geoids)
+
+    # Groups and ZCTAs pack into one key per output cell.
+    groups: pd.Series = (
+        evictions.groupby(by, sort=True, observed=True, dropna=False).ngroup()
+        if by
+        else pd.Series(np.zeros(len(evictions), dtype=np.int64))
+    )
+    group_ids: npt.NDArray[np.int64] = groups.to_numpy(np.int64)
+    n_groups: int = int(group_ids.max()) + 1 if len(group_ids) else 1
+    zipcodes: npt.NDArray[np.int32] = weights.zipcodes()
+    columns: npt.NDArray[np.intp] = np.searchsorted(
+        zipcodes, weights.zipcode[entry_pos]
+    )
+    cells: npt.NDArray[np.int64] = columns * n_groups + group_ids[row_pos]
+    used: npt.NDArray[np.int64]
+    used, cells = np.unique(cells, return_inverse=True)
+
+    weight: npt.NDArray[np.float64] = weights.weight[entry_pos]
+    allocated: dict[str, npt.NDArray[np.float64]] = {
+        col: np.bincount(
+            cells,
+            weights=np.nan_to_num(
+                pd.to_numeric(evictions[col]).to_numpy(np.float64, na_value=np.nan)
+            )[row_pos]
+            * weight,
+            minlength=len(used),
+        )
+        for col in values
+    }
+
+    # One representative row per group restores the by columns.
+    first: npt.NDArray[np.intp] = np.unique(group_ids, return_index=True)[1]
+    group_frame: pd.DataFrame = (
+        evictions[by].iloc[first].reset_index(drop=True)
+        if by
+        else pd.DataFrame(index=pd.RangeIndex(1))
+    )
+    result: pd.DataFrame = group_frame.iloc[used % n_groups].reset_index(drop=True)
+    result.insert(0, "zipcode", zipcodes[used // n_groups])
+    return result.assign(**allocated)
@@ -0,0 +1,288 @@
+"""Per-GEOID time series features of the merged data.
+
+The notebooks derived rolling averages, lags, filings over the
+`filings_avg` baseline, and year over year FMR growth with a groupby/apply
+per zip code. Here the panel is sorted once by GEOID and period, and every
+feature is computed for every GEOID in one pass over the sorted arrays. Each
+row is packed into a single sortable integer (GEOID code and period), so a
+window's first row or a lag's source row is one `numpy.searchsorted` for the
+whole panel, and window sums are differences of a cumulative sum. Windows and
+lags are in periods rather than rows, so missing months are gaps rather than
+neighbors.
+
+Periods are months for the monthly files and weeks for the weekly Eviction
+Tracking System files. `append` updates the features of a previous run with
+new periods by recomputing only the tail that the new rows can affect.
+"""
+import logging
+from typing import Literal, Optional
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from eviction_analysis import profiling
+
+Freq = Literal["M", "W"]
+
+VALUES: list[str] = ["filings_2020", "filings_avg", "fmr_2br"]
+# Rolling windows and lags in periods
+WINDOWS: list[int] = [3, 6]
+LAGS: list[int] = [1]
+PERIODS_PER_YEAR: dict[str, int] = {"M": 12, "W": 52}
+# FMR columns that get year over year growth
+GROWTH: list[str] = ["fmr_2br", "fmr_2br_90", "fmr_2br_110"]
+
+
+def periods(dates: pd.Series, freq: Freq = "M") -> npt.NDArray[np.int64]:
+    """Ordinal of each date's month or week since the epoch."""
+    return (
+        pd.to_datetime(dates)
+        .to_numpy("datetime64[ns]")
+        .astype(f"datetime64[{freq}]")
+        .astype(np.int64)
+    )
+
+
+@profiling.instrument()
+def panel(
+    merged: pd.DataFrame,
+    key: str = "geoid",
+    time_col: str = "month",
+    values: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """Collapse the merged data to one row per GEOID and period.
+
+    A row fans out in the merge when a tract spans zip codes with different
+    FMRs. Filings are counted once per observation and FMRs are averaged.
+
+    Parameters
+    ----------
+    merged: pandas.DataFrame
+        Output of `etl_evict.merge_evic_fmr` or `dataset.read_merged`.
+    key: str
+        Column that identifies a series.
+    time_col: str
+        Date column of the periods.
+    values: Optional[list[str]]
+        Columns to keep. Defaults to the filings and every FMR column in
+        merged.
+
+    Returns
+    -------
+    pandas.DataFrame
+        key, time_col, and values sorted by key and time_col.
+    """
+    if values is None:
+        values = [
+            col
+            for col in ["filings_2020", "filings_avg"] + GROWTH
+            if col in merged.columns
+        ]
+
+    aggregations: dict[str, tuple[str, str]] = {
+        col: (col, "mean" if col.startswith("fmr") else "first") for col in values
+    }
+    return (
+        merged.groupby([key, time_col], observed=True, sort=True)
+        .agg(**aggregations)
+        .reset_index()
+    )
+
+
+def _sorted_keys(
+    df: pd.DataFrame, key: str, time_col: str, freq: Freq, lookback: int
+) -> tuple[npt.NDArray[np.intp], npt.NDArray[np.int64]]:
+    """Order of df by key and period and the packed (key, period) of each
+    sorted row.
+
+    Periods are offset by lookback within each key's range of integers so
+    that looking back never crosses into the previous key.
+    """
+    codes: npt.NDArray[np.intp] = pd.factorize(df[key], sort=True)[0]
+    if (codes < 0).any():
+        raise ValueError(f"{key} has missing values; drop them first.")
+
+    t: npt.NDArray[np.int64] = periods(df[time_col], freq)
+    order: npt.NDArray[np.intp] = np.lexsort((t, codes))
+    t_min: int = int(t.min()) if len(t) else 0
+    span: int = (int(t.max()) - t_min + 1 if len(t) else 1) + lookback
+    packed: npt.NDArray[np.int64] = codes[order].astype(np.int64) * span + (
+        t[order] - t_min + lookback
+    )
+    if len(packed) > 1 and not (np.diff(packed) > 0).all():
+        raise ValueError(f"{key} and {time_col} aren't unique; see `panel`.")
+
+    return order, packed
+
+
+def _rolling_mean(
+    values: npt.NDArray[np.float64],
+    packed: npt.NDArray[np.int64],
+    window: int,
+) -> npt.NDArray[np.float64]:
+    """Mean of the non-null values in the last window periods of each row."""
+    present: npt.NDArray[np.bool_] = ~np.isnan(values)
+    sums: npt.NDArray[np.float64] = np.concatenate(
+        [[0.0], np.cumsum(np.where(present, values, 0.0))]
+    )
+    counts: npt.NDArray[np.int64] = np.concatenate([[0], np.cumsum(present)])
+
+    # The first row of each window is the first packed key inside it.
+    lower: npt.NDArray[np.intp] = np.searchsorted(
+        packed, packed - (window - 1), side="left"
+    )
+    upper: npt.NDArray[np.intp] = np.arange(1, len(packed) + 1)
+    n: npt.NDArray[np.int64] = counts[upper] - counts[lower]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, (sums[upper] - sums[lower]) / n, np.nan)
+
+
+def _lag(
+    values: npt.NDArray[np.float64], packed: npt.NDArray[np.int64], lag: int
+) -> npt.NDArray[np.float64]:
+    """Value of each row's series lag periods earlier or NaN if it's missing."""
+    target: npt.NDArray[np.int64] = packed - lag
+    source: npt.NDArray[np.intp] = np.minimum(
+        np.searchsorted(packed, target), len(packed) - 1
+    )
+    return np.where(packed[source] == target, values[source], np.nan)
+
+
+@profiling.instrument()
+def compute(
+    df: pd.DataFrame,
+    key: str = "geoid",
+    time_col: str = "month",
+    values: Optional[list[str]] = None,
+    windows: list[int] = WINDOWS,
+    lags: list[int] = LAGS,
+    freq: Freq = "M",
+) -> pd.DataFrame:
+    """Compute rolling means, lags, excess filings, and FMR growth.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+        One row per key and period, e.g. from `panel`.
+    key: str
+        Column that identifies a series.
+    time_col: str
+        Date column of the periods.
+    values: Optional[list[str]]
+        Columns to roll and lag. Defaults to the VALUES in df.
+    windows: list[int]
+        Rolling window lengths in periods. Adds `{col}_roll{window}`.
+    lags: list[int]
+        Lags in periods. Adds `{col}_lag{lag}`.
+    freq: Freq
+        "M" for months or "W" for weeks.
+
+    Returns
+    -------
+    pandas.DataFrame
+        df sorted by key and time_col with the features added. Filings add
+        excess_filings (filings_2020 - filings_avg) and excess_ratio, and the
+        FMR columns add `{col}_yoy`, the growth over the same period a year
+        earlier.
+    """
+    values = (
+        values if values is not None else [col for col in VALUES if col in df.columns]
+    )
+    per_year: int = PERIODS_PER_YEAR[freq]
+    growth: list[str] = [col for col in GROWTH if col in df.columns]
+    lookback: int = max(windows + lags + ([per_year] if growth else []) + [1])
+    logging.info(f"Computing time series features of {len(df)} rows")
+
+    order, packed = _sorted_keys(df, key, time_col, freq, lookback)
+    result: pd.DataFrame = df.iloc[order].reset_index(drop=True)
+    features: dict[str, npt.NDArray[np.float64]] = {}
+
+    for col in values:
+        column: npt.NDArray[np.float64] = pd.to_numeric(result[col]).to_numpy(
+            np.float64, na_value=np.nan
+        )
+        for window in windows:
+            features[f"{col}_roll{window}"] = _rolling_mean(column, packed, window)
+        for lag in lags:
+            features[f"{col}_lag{lag}"] = _lag(column, packed, lag)
+
+    if "filings_2020" in result.columns and "filings_avg" in result.columns:
+        filings: npt.NDArray[np.float64] = pd.to_numeric(
+            result.filings_2020
+        ).to_numpy(np.float64, na_value=np.nan)
+        baseline: npt.NDArray[np.float64] = pd.to_numeric(
+            result.filings_avg
+        ).to_numpy(np.float64, na_value=np.nan)
+        features["excess_filings"] = filings - baseline
+        with np.errstate(invalid="ignore", divide="ignore"):
+            features["excess_ratio"] = np.where(
+                baseline > 0, filings / baseline, np.nan
+            )
+
+    for col in growth:
+        column = pd.to_numeric(result[col]).to_numpy(np.float64, na_value=np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            features[f"{col}_yoy"] = column / _lag(column, packed, per_year) - 1.0
+
+    return result.assign(**features)
+
+
+@profiling.instrument()
+def append(
+    history: pd.DataFrame,
+    new: pd.DataFrame,
+    key: str = "geoid",
+    time_col: str = "month",
+    values: Optional[list[str]] = None,
+    windows: list[int] = WINDOWS,
+    lags: list[int] = LAGS,
+    freq: Freq = "M",
+) -> pd.DataFrame:
+    """Update the features of a previous `compute` with new periods.
+
+    Only the rows at or after the earliest new period are recomputed, from
+    the new rows and the history they look back on. New rows replace history
+    rows with the same key and period, so revised months can be appended too.
+
+    Parameters
+    ----------
+    history: pandas.DataFrame
+        Output of `compute` or of an earlier `append`.
+    new: pandas.DataFrame
+        New rows in the same shape as the input to `compute`.
+    key, time_col, values, windows, lags, freq
+        As passed to `compute` for history.
+
+    Returns
+    -------
+    pandas.DataFrame
+        history with new rows and updated features sorted by key and time_col.
+    """
+    if new.empty:
+        return history
+
+    per_year: int = PERIODS_PER_YEAR[freq]
+    lookback: int = max(windows + lags + [per_year, 1])
+    start: int = int(periods(new[time_col], freq).min())
+    history_t: npt.NDArray[np.int64] = periods(history[time_col], freq)
+
+    # Rows before start keep their features. Rows from start - lookback on
+    # are what the recomputed rows can look back on.
+    base: list[str] = [col for col in new.columns if col in history.columns]
+    recent: pd.DataFrame = history.loc[history_t >= start - lookback, base]
+    combined: pd.DataFrame = pd.concat(
+        [recent, new[base]], ignore_index=True
+    ).drop_duplicates([key, time_col], keep="last")
+    updated: pd.DataFrame = compute(
+        combined, key, time_col, values, windows, lags, freq
+    )
+    updated = updated.loc[periods(updated[time_col], freq) >= start, :]
+    logging.info(f"Recomputed {len(updated)} rows from {len(new)} new rows")
+
+    return (
+        pd.concat([history.loc[history_t < start, :], updated], ignore_index=True)
+        .sort_values([key, time_col], kind="stable")
+        .reset_index(drop=True)
+    )
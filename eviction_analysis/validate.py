@@ -0,0 +1,487 @@
+"""Data quality checks of the merge.
+
+`merge_evic_fmr` doesn't complain when data goes missing: GEOIDs the
+crosswalk doesn't know end up with NaN rents, a tract that spans zip codes
+fans out into several rows, and a workbook whose columns drifted loads with
+the wrong dtypes. A `Validator` passed to the merge checks each join as it
+happens (hit rates, fan-out, FMR coverage per year, sealed GEOIDs, and dtype
+drift) and collects the results in a machine readable report.
+
+    validator = validate.Validator(fraction=0.1, budget=30.0)
+    merged = etl_evict.merge_evic_fmr(evictions, sources=sources, validator=validator)
+    validator.write(paths.QUALITY_REPORT)
+
+Every check is a handful of vectorized passes: observations (the Eviction Lab
+rows a merged row came from) are identified by a hash of their columns, and
+counts per observation and year are `numpy.bincount`s. Two settings bound the
+cost on the national file. fraction samples GEOIDs by hash, so every stage
+sees the same GEOIDs with their whole fan-out. budget is a limit in seconds
+after which the remaining checks are reported as skipped rather than run.
+"""
+import datetime
+import json
+import logging
+import os
+import time
+from os import PathLike
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from eviction_analysis import schemas
+from eviction_analysis.crosswalk import CrosswalkIndex
+from eviction_analysis.paths import QUALITY_REPORT
+
+# Check name -> ("min" or "max", limit). Checks without one are informational.
+THRESHOLDS: dict[str, tuple[str, float]] = {
+    "sealed_share": ("max", 0.05),
+    "crosswalk_hit_rate": ("min", 0.95),
+    "fmr_schema_mismatches": ("max", 0),
+    "fmr_hit_rate": ("min", 0.9),
+    "fanout_ratio": ("max", 1.5),
+    "fmr_coverage": ("min", 0.9),
+    "neighborhood_hit_rate": ("min", 0.95),
+    "neighborhood_fanout": ("max", 1.0),
+    "dtype_drift": ("max", 0),
+}
+# Columns that identify an Eviction Lab observation in the merged data, as in
+# etl_evict.EVICTION_COLUMNS
+OBSERVATION: list[str] = [
+    "city",
+    "type",
+    "geoid",
+    "racial_majority",
+    "month",
+    "filings_2020",
+    "filings_avg",
+]
+# Checks that only look at the schema run regardless of the budget, so that
+# every report carries a dtype baseline for the next one.
+UNBUDGETED: set[str] = {"dtype_drift"}
+# The neighborhoods data only covers New York City.
+NYC: str = "New York, NY"
+# Sampling resolution of GEOID hashes
+_BUCKETS: int = 1 << 20
+
+
+class Check(NamedTuple):
+    """Outcome of one check.
+
+    Attributes
+    ----------
+    stage: str
+        Step of the merge the check ran after.
+    name: str
+        Check name, also its key in THRESHOLDS.
+    status: str
+        "pass", "fail", "info" (no threshold), "skipped" (out of budget or
+        inputs), or "error".
+    value: Optional[float]
+        Measured value.
+    threshold: Optional[tuple[str, float]]
+        Limit the value was held to.
+    seconds: float
+        Time taken.
+    detail: dict[str, Any]
+        Breakdown of the value.
+    """
+
+    stage: str
+    name: str
+    status: str
+    value: Optional[float]
+    threshold: Optional[tuple[str, float]]
+    seconds: float
+    detail: dict[str, Any]
+
+
+def _geoids(df: pd.DataFrame) -> npt.NDArray[np.int64]:
+    """GEOIDs as integers with -1 for sealed (missing) ones."""
+    return df.geoid.astype("Int64").to_numpy(np.int64, na_value=-1)
+
+
+def _observations(df: pd.DataFrame) -> tuple[npt.NDArray[np.intp], int]:
+    """Observation code of every row and the number of observations."""
+    keys: list[str] = [col for col in OBSERVATION if col in df.columns]
+    hashes: npt.NDArray[np.uint64] = pd.util.hash_pandas_object(
+        df[keys], index=False
+    ).to_numpy()
+    codes, uniques = pd.factorize(hashes)
+    return codes, len(uniques)
+
+
+def _zipcodes(fmr: pd.DataFrame) -> npt.NDArray[np.int64]:
+    return fmr.zipcode.astype("Int64").to_numpy(np.int64, na_value=-1)
+
+
+def sealed(evictions: pd.DataFrame) -> tuple[float, dict[str, Any]]:
+    """Share of rows whose GEOID was sealed (read as missing) per city."""
+    missing: pd.Series = evictions.geoid.isna()
+    by_city: pd.Series = missing.groupby(evictions.city, observed=True).sum()
+    return float(missing.mean()) if len(missing) else 0.0, {
+        "rows": len(missing),
+        "sealed": int(missing.sum()),
+        "by_city": {str(city): int(n) for city, n in by_city.items() if n},
+    }
+
+
+def crosswalk_hits(
+    evictions: pd.DataFrame, fmrs: list[pd.DataFrame], index: CrosswalkIndex
+) -> tuple[float, dict[str, Any]]:
+    """Share of GEOIDs that resolve to a zip code, either through the
+    crosswalk or as a zip code with FMRs."""
+    geoids: npt.NDArray[np.int64] = _geoids(evictions)
+    geoids = geoids[geoids >= 0]
+    positions: npt.NDArray[np.intp] = np.minimum(
+        np.searchsorted(index.geoid, geoids), max(len(index.geoid) - 1, 0)
+    )
+    known: npt.NDArray[np.bool_] = (
+        index.geoid[positions] == geoids
+        if len(index.geoid)
+        else np.zeros(len(geoids), dtype=np.bool_)
+    )
+    zipcodes: npt.NDArray[np.int64] = np.unique(
+        np.concatenate([_zipcodes(fmr) for fmr in fmrs])
+    )
+    known |= np.isin(geoids, zipcodes, assume_unique=False)
+
+    unmatched, counts = np.unique(geoids[~known], return_counts=True)
+    top: npt.NDArray[np.intp] = np.argsort(-counts, kind="stable")[:10]
+    return float(known.mean()) if len(known) else 1.0, {
+        "rows": len(geoids),
+        "unmatched_rows": int((~known).sum()),
+        "unmatched_geoids": len(unmatched),
+        "top_unmatched": {str(unmatched[i]): int(counts[i]) for i in top},
+    }
+
+
+def fmr_schema(fmrs: list[pd.DataFrame]) -> tuple[float, dict[str, Any]]:
+    """Columns of each FMR frame missing or typed unlike the registered layout
+    of its year."""
+    latest: int = max(schemas.FMR_SCHEMAS)
+    mismatches: dict[str, dict[str, list[str]]] = {}
+    for fmr in fmrs:
+        year: int = int(fmr.fmr_year.iloc[0]) if len(fmr) else latest
+        expected: dict[str, Any] = schemas.FMR_SCHEMAS.get(
+            year, schemas.FMR_SCHEMAS[latest]
+        ).dtypes
+        for col, dtype in expected.items():
+            actual: str = str(fmr[col].dtype) if col in fmr.columns else "missing"
+            if actual != str(pd.api.types.pandas_dtype(dtype)):
+                mismatches.setdefault(str(year), {})[col] = [str(dtype), actual]
+    return float(sum(map(len, mismatches.values()))), {"mismatches": mismatches}
+
+
+def _fmr_observations(
+    merged: pd.DataFrame, codes: npt.NDArray[np.intp], n_obs: int
+) -> tuple[npt.NDArray[np.bool_], npt.NDArray[np.bool_]]:
+    """Whether each observation got an FMR and whether its GEOID is known.
+
+    Sealed GEOIDs can't match and are counted by sealed_share instead.
+    """
+    has: npt.NDArray[np.float64] = merged.fmr_2br.notna().to_numpy(np.float64)
+    known: npt.NDArray[np.float64] = merged.geoid.notna().to_numpy(np.float64)
+    return (
+        np.bincount(codes, has, minlength=n_obs) > 0,
+        np.bincount(codes, known, minlength=n_obs) > 0,
+    )
+
+
+def fmr_hits(
+    merged: pd.DataFrame, codes: npt.NDArray[np.intp], n_obs: int
+) -> tuple[float, dict[str, Any]]:
+    """Share of observations with a GEOID that got at least one FMR."""
+    matched, known = _fmr_observations(merged, codes, n_obs)
+    n_known: int = int(known.sum())
+    n_matched: int = int((matched & known).sum())
+    return n_matched / n_known if n_known else 1.0, {
+        "observations": n_known,
+        "without_fmr": n_known - n_matched,
+    }
+
+
+def fanout(codes: npt.NDArray[np.intp], n_obs: int) -> tuple[float, dict[str, Any]]:
+    """Merged rows per observation."""
+    rows: npt.NDArray[np.int64] = np.bincount(codes, minlength=n_obs)
+    return len(codes) / n_obs if n_obs else 1.0, {
+        "rows": len(codes),
+        "observations": n_obs,
+        "max": int(rows.max()) if n_obs else 0,
+        "fanned_out": int((rows > 1).sum()),
+    }
+
+
+def fmr_coverage(
+    merged: pd.DataFrame, codes: npt.NDArray[np.intp], n_obs: int
+) -> tuple[Optional[float], dict[str, Any]]:
+    """Share of observations with a GEOID that got an FMR per year, reporting
+    the worst year."""
+    matched, known = _fmr_observations(merged, codes, n_obs)
+    first: npt.NDArray[np.intp] = np.unique(codes, return_index=True)[1]
+    years: npt.NDArray[np.int64] = merged.month.dt.year.to_numpy(np.int64)[first]
+    years, matched = years[known], matched[known]
+
+    offset: int = int(years.min()) if len(years) else 0
+    totals: npt.NDArray[np.int64] = np.bincount(years - offset)
+    covered: npt.NDArray[np.float64] = np.bincount(years - offset, matched)
+    coverage: dict[str, float] = {
+        str(offset + i): round(float(covered[i] / total), 4)
+        for i, total in enumerate(totals)
+        if total
+    }
+    return min(coverage.values()) if coverage else None, {"by_year": coverage}
+
+
+def neighborhood_hits(merged: pd.DataFrame) -> tuple[float, dict[str, Any]]:
+    """Share of New York City rows with a zip code GEOID (tracts never match)
+    that got a borough."""
+    geoids: npt.NDArray[np.int64] = _geoids(merged)
+    zips: npt.NDArray[np.bool_] = (geoids >= 0) & (geoids < 100_000)
+    if "city" in merged.columns:
+        zips &= (merged.city == NYC).to_numpy(dtype=bool)
+    matched: npt.NDArray[np.bool_] = merged.borough.notna().to_numpy()[zips]
+    unmatched: npt.NDArray[np.int64] = np.unique(geoids[zips][~matched])
+    return float(matched.mean()) if len(matched) else 1.0, {
+        "rows": int(zips.sum()),
+        "unmatched_zipcodes": [int(zipcode) for zipcode in unmatched[:20]],
+    }
+
+
+def dtype_drift(
+    merged: pd.DataFrame, baseline: Optional[dict[str, str]]
+) -> tuple[Optional[float], dict[str, Any]]:
+    """Columns whose dtype changed, appeared, or disappeared since the
+    baseline."""
+    dtypes: dict[str, str] = {col: str(dtype) for col, dtype in merged.dtypes.items()}
+    if baseline is None:
+        return None, {"dtypes": dtypes}
+
+    changed: dict[str, list[str]] = {
+        col: [baseline[col], dtype]
+        for col, dtype in dtypes.items()
+        if col in baseline and baseline[col] != dtype
+    }
+    missing: list[str] = [col for col in baseline if col not in dtypes]
+    added: list[str] = [col for col in dtypes if col not in baseline]
+    return float(len(changed) + len(missing) + len(added)), {
+        "dtypes": dtypes,
+        "changed": changed,
+        "missing": missing,
+        "added": added,
+    }
+
+
+def null_shares(merged: pd.DataFrame) -> tuple[None, dict[str, Any]]:
+    """Share of missing values per column."""
+    shares: pd.Series = merged.isna().mean()
+    return None, {col: round(float(share), 4) for col, share in shares.items()}
+
+
+def load_baseline(
+    path: str | PathLike[str] = QUALITY_REPORT,
+) -> Optional[dict[str, str]]:
+    """Output dtypes recorded by an earlier report or None if there's none."""
+    try:
+        with open(path) as file:
+            report: dict[str, Any] = json.load(file)
+    except (OSError, ValueError):
+        return None
+    for check in report.get("checks", []):
+        if check["name"] == "dtype_drift" and "dtypes" in check["detail"]:
+            return check["detail"]["dtypes"]
+    return None
+
+
+class Validator:
+    """Runs checks after the steps of a merge and collects a report.
+
+    Parameters
+    ----------
+    fraction: float
+        Share of GEOIDs to check, chosen by hash. Sealed GEOIDs and dtypes
+        are always counted on every row since they're cheap.
+    budget: Optional[float]
+        Seconds the checks may take in total. Checks that would start after
+        it's spent are skipped. Unbounded if None.
+    thresholds: dict[str, tuple[str, float]]
+        Limits per check name. Checks without one are informational.
+    baseline: Optional[dict[str, str]]
+        Output dtypes of an earlier run, e.g. from `load_baseline`, to detect
+        dtype drift against.
+    seed: int
+        Seed of the GEOID sample.
+    """
+
+    def __init__(
+        self,
+        fraction: float = 1.0,
+        budget: Optional[float] = None,
+        thresholds: dict[str, tuple[str, float]] = THRESHOLDS,
+        baseline: Optional[dict[str, str]] = None,
+        seed: int = 0,
+    ) -> None:
+        if not 0 < fraction <= 1:
+            raise ValueError(f"fraction must be in (0, 1], not {fraction}")
+        self.fraction: float = fraction
+        self.budget: Optional[float] = budget
+        self.thresholds: dict[str, tuple[str, float]] = thresholds
+        self.baseline: Optional[dict[str, str]] = baseline
+        self.seed: int = seed
+        self.checks: list[Check] = []
+        self.seconds: float = 0.0
+
+    def sample(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Rows of df whose GEOIDs are in the sample."""
+        if self.fraction >= 1:
+            return df
+        hashes: npt.NDArray[np.uint64] = pd.util.hash_array(
+            _geoids(df), hash_key=f"{self.seed:016d}"
+        )
+        keep: npt.NDArray[np.bool_] = hashes % _BUCKETS < self.fraction * _BUCKETS
+        return df.loc[keep, :]
+
+    def _status(self, name: str, value: Optional[float]) -> str:
+        if name not in self.thresholds or value is None:
+            return "info"
+        op, limit = self.thresholds[name]
+        return "pass" if (value >= limit if op == "min" else value <= limit) else "fail"
+
+    def run(
+        self,
+        stage: str,
+        name: str,
+        func: Callable[..., tuple[Optional[float], dict[str, Any]]],
+        *args: Any,
+    ) -> Optional[Check]:
+        """Run a check unless the budget is spent and record its outcome.
+
+        An exception inside a check is recorded as an error rather than
+        failing the merge it's checking.
+        """
+        threshold: Optional[tuple[str, float]] = self.thresholds.get(name)
+        if (
+            self.budget is not None
+            and self.seconds >= self.budget
+            and name not in UNBUDGETED
+        ):
+            check: Check = Check(stage, name, "skipped", None, threshold, 0.0, {})
+            self.checks.append(check)
+            return check
+
+        started: float = time.perf_counter()
+        try:
+            value, detail = func(*args)
+            status: str = self._status(name, value)
+        except Exception as error:
+            logging.exception(f"Data quality check {name} failed")
+            value, detail, status = None, {"error": repr(error)}, "error"
+        seconds: float = time.perf_counter() - started
+        self.seconds += seconds
+
+        check = Check(
+            stage,
+            name,
+            status,
+            None if value is None else round(value, 6),
+            threshold,
+            round(seconds, 4),
+            detail,
+        )
+        if status == "fail":
+            logging.warning(f"Data quality check {name} failed: {value} {threshold}")
+        self.checks.append(check)
+        return check
+
+    def check_input(self, evictions: pd.DataFrame) -> None:
+        """Checks of the Eviction Lab rows going into the merge."""
+        self.run("input", "sealed_share", sealed, evictions)
+
+    def check_fmr_join(
+        self,
+        evictions: Optional[pd.DataFrame],
+        merged: pd.DataFrame,
+        fmrs: Optional[list[pd.DataFrame]] = None,
+        index: Optional[CrosswalkIndex] = None,
+    ) -> None:
+        """Checks of the join of FMRs through the crosswalk.
+
+        The hit rate of the crosswalk and the FMR layouts are only checked if
+        the inputs are given, so a merged output can be checked on its own.
+        """
+        stage: str = "fmr_join"
+        if evictions is not None and fmrs is not None and index is not None:
+            self.run(
+                stage,
+                "crosswalk_hit_rate",
+                crosswalk_hits,
+                self.sample(evictions),
+                fmrs,
+                index,
+            )
+        if fmrs is not None:
+            self.run(stage, "fmr_schema_mismatches", fmr_schema, fmrs)
+
+        if self.budget is not None and self.seconds >= self.budget:
+            # Skip hashing the observations too.
+            codes, n_obs = np.zeros(0, dtype=np.intp), 0
+        else:
+            merged = self.sample(merged)
+            codes, n_obs = _observations(merged)
+        self.run(stage, "fmr_hit_rate", fmr_hits, merged, codes, n_obs)
+        self.run(stage, "fanout_ratio", fanout, codes, n_obs)
+        self.run(stage, "fmr_coverage", fmr_coverage, merged, codes, n_obs)
+
+    def check_neighborhoods(
+        self, merged: pd.DataFrame, rows_before: Optional[int] = None
+    ) -> None:
+        """Checks of the join of neighborhoods on zip code."""
+        if rows_before is not None:
+            self.run(
+                "neighborhoods",
+                "neighborhood_fanout",
+                lambda: (len(merged) / rows_before if rows_before else 1.0, {}),
+            )
+        self.run(
+            "neighborhoods",
+            "neighborhood_hit_rate",
+            neighborhood_hits,
+            self.sample(merged),
+        )
+
+    def check_output(self, merged: pd.DataFrame) -> None:
+        """Checks of the merged output's schema."""
+        self.run("output", "dtype_drift", dtype_drift, merged, self.baseline)
+        self.run("output", "null_shares", null_shares, self.sample(merged))
+
+    @property
+    def failed(self) -> list[Check]:
+        """Checks that failed or errored."""
+        return [check for check in self.checks if check.status in ("fail", "error")]
+
+    def report(self) -> dict[str, Any]:
+        """The checks and their settings as JSON serializable data."""
+        return {
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "status": "fail" if self.failed else "pass",
+            "fraction": self.fraction,
+            "budget": self.budget,
+            "seconds": round(self.seconds, 4),
+            "skipped": sum(check.status == "skipped" for check in self.checks),
+            "checks": [check._asdict() for check in self.checks],
+        }
+
+    def write(self, path: str | PathLike[str] = QUALITY_REPORT) -> dict[str, Any]:
+        """Atomically write the report as JSON and return it."""
+        path = Path(path)
+        report: dict[str, Any] = self.report()
+        logging.info(f"Writing data quality report ({report['status']}) to {path}")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp: Path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temp, "w") as file:
+            json.dump(report, file, indent=2)
+        os.replace(temp, path)
+        return report
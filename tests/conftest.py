@@ -0,0 +1,92 @@
+"""Small fixtures in the formats of the real source files."""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from eviction_analysis import schemas
+from eviction_analysis.crosswalk import CrosswalkIndex
+from eviction_analysis.etl_evict import Sources
+
+# Eviction Lab writes months as "01/2020" and marks suppressed GEOIDs as
+# "sealed." 36061000100 is a tract in 10001.
+EVICTION_CSV: str = """\
+city,type,GEOID,racial_majority,month,filings_2020,filings_avg,last_updated
+"New York, NY",Zip Code,10001,White,01/2020,12,10.5,2022-05-09
+"New York, NY",Zip Code,10001,White,02/2021,3,9.0,2022-05-09
+"New York, NY",Zip Code,10002,Latinx,03/2022,7,6.25,2022-05-09
+"New York, NY",Census Tract,36061000100,White,01/2020,2,1.5,2022-05-09
+"New York, NY",Zip Code,sealed,,02/2021,1,1.0,2022-05-09
+"Boston, MA",Zip Code,2108,White,01/2020,4,3.0,2022-05-09
+"""
+
+
+@pytest.fixture
+def eviction_csv(tmp_path: Path) -> Path:
+    """Eviction Lab CSV with real-format months."""
+    path: Path = tmp_path / "allcities_monthly_2020_2021.csv"
+    path.write_text(EVICTION_CSV)
+    return path
+
+
+@pytest.fixture
+def fmr_workbooks(tmp_path: Path) -> dict[int, Path]:
+    """SAFMR workbooks for 2020 to 2022 with each year's real headers."""
+    paths: dict[int, Path] = {}
+    for offset, (year, schema) in enumerate(schemas.FMR_SCHEMAS.items()):
+        headers: list[str] = [column.variants[0] for column in schema.columns]
+        rows: list[list[int]] = [
+            [10001, 10002],
+            [2500 + offset, 2100 + offset],
+            [2250, 1890],
+            [2750, 2310],
+        ]
+        paths[year] = tmp_path / f"fy{year}_safmrs.xlsx"
+        pd.DataFrame(dict(zip(headers, rows))).to_excel(paths[year], index=False)
+
+    return paths
+
+
+@pytest.fixture
+def sources() -> Sources:
+    """FMRs for 2020 to 2022, a crosswalk, and NYC neighborhoods."""
+    schema: schemas.SourceSchema = schemas.FMR_SCHEMAS[2020]
+    fmrs: list[pd.DataFrame] = []
+    for offset, year in enumerate([2020, 2021, 2022]):
+        fmr: pd.DataFrame = pd.DataFrame(
+            {
+                "zipcode": [10001, 10002, 2108],
+                "fmr_2br": [2500.0 + offset, 2100.0 + offset, 2900.0 + offset],
+                "fmr_2br_90": [2250.0, 1890.0, 2610.0],
+                "fmr_2br_110": [2750.0, 2310.0, 3190.0],
+            }
+        ).astype(schema.dtypes)
+        fmr["fmr_year"] = np.int16(year)
+        fmrs.append(fmr)
+
+    zip_tract: pd.DataFrame = pd.DataFrame(
+        {
+            "zipcode": [10001, 10002, 2108],
+            "tract": [36061000100, 36061000200, 25025030300],
+            "city": ["new york", "new york", "boston"],
+            "state": ["ny", "ny", "ma"],
+        }
+    )
+    neighborhoods: pd.DataFrame = pd.DataFrame(
+        {
+            "zipcode": pd.array([10001, 10002], dtype="Int64"),
+            "borough": pd.Categorical(["Manhattan", "Manhattan"]),
+            "post_office": pd.Categorical(["New York, NY", "New York, NY"]),
+            "neighborhood": pd.Categorical(
+                ["Chelsea and Clinton", "Lower East Side"]
+            ),
+            "population": [21102.0, 81410.0],
+            "density": [33959.0, 92573.0],
+        }
+    )
+    return Sources(
+        fmrs=fmrs,
+        crosswalk=CrosswalkIndex.from_zip_tract(zip_tract),
+        neighborhoods=neighborhoods,
+    )
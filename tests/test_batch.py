@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import pandas as pd
+
+from eviction_analysis import batch, etl_evict
+from eviction_analysis.etl_evict import Sources
+
+
+def test_empty_city_reports_no_rows(
+    eviction_csv: Path, sources: Sources, tmp_path: Path
+) -> None:
+    evictions: pd.DataFrame = etl_evict.load_eviction(
+        eviction_csv, pyarrow=True, cities=["New York, NY", "Boston, MA"]
+    )
+    output: Path = tmp_path / "cities"
+
+    written: dict[str, int] = batch.merge_cities(
+        evictions,
+        sources,
+        cities=["New York, NY", "Boston, MA"],
+        output=output,
+        executor=None,
+    )
+    assert written == {"New York, NY": 5, "Boston, MA": 1}
+    assert output.joinpath("city=Boston%2C%20MA").is_dir()
+
+    # Boston's rows are gone, so its old partition is deleted.
+    written = batch.merge_cities(
+        evictions.loc[evictions.city != "Boston, MA", :],
+        sources,
+        cities=["New York, NY", "Boston, MA", "Chicago, IL"],
+        output=output,
+        executor=None,
+    )
+    assert written == {"New York, NY": 5, "Boston, MA": 0, "Chicago, IL": 0}
+    assert not output.joinpath("city=Boston%2C%20MA").exists()
+    assert output.joinpath("city=New%20York%2C%20NY").is_dir()
+
+
+def test_remerging_a_city_leaves_the_others_untouched(
+    eviction_csv: Path, sources: Sources, tmp_path: Path
+) -> None:
+    evictions: pd.DataFrame = etl_evict.load_eviction(
+        eviction_csv, pyarrow=True, cities=["New York, NY", "Boston, MA"]
+    )
+    output: Path = tmp_path / "cities"
+    batch.merge_cities(evictions, sources, output=output, executor=None)
+
+    boston: Path = output / "city=Boston%2C%20MA"
+    new_york: Path = output / "city=New%20York%2C%20NY"
+    before: dict[Path, int] = {
+        file: file.stat().st_ino for file in boston.rglob("*.parquet")
+    }
+    replaced: set[int] = {file.stat().st_ino for file in new_york.rglob("*.parquet")}
+
+    written: dict[str, int] = batch.merge_cities(
+        evictions, sources, cities=["New York, NY"], output=output, executor="thread"
+    )
+
+    assert written == {"New York, NY": 5}
+    assert {file: file.stat().st_ino for file in boston.rglob("*.parquet")} == before
+    assert replaced.isdisjoint(
+        file.stat().st_ino for file in new_york.rglob("*.parquet")
+    )
+    assert sorted(path.name for path in output.iterdir()) == [
+        boston.name,
+        new_york.name,
+    ]
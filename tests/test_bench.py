@@ -0,0 +1,38 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from eviction_analysis import bench
+
+
+def test_make_synthetic_regenerates_stale_data(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    data: bench.BenchData = bench.make_synthetic(1, tmp_path)
+    months: pd.Series = pd.read_csv(data.eviction, usecols=["month"]).month
+    assert months.iloc[0] == "01/2020"
+
+    # Complete data from the same generator is reused as is.
+    mtime: int = data.eviction.stat().st_mtime_ns
+    bench.make_synthetic(1, tmp_path)
+    assert data.eviction.stat().st_mtime_ns == mtime
+
+    monkeypatch.setattr(bench, "SYNTHETIC_VERSION", bench.SYNTHETIC_VERSION + 1)
+    bench.make_synthetic(1, tmp_path)
+    assert data.eviction.stat().st_mtime_ns != mtime
+
+
+def test_pandas_stages_run_on_synthetic_data(tmp_path: Path) -> None:
+    data: bench.BenchData = bench.make_synthetic(1, tmp_path)
+    stages: list[str] = ["load_eviction", "merge_evic_fmr", "merge_all_cities"]
+
+    results: list[dict] = bench.run([data], stages, repeat=1)
+
+    assert [result["stage"] for result in results] == stages
+    rows: dict[str, int] = {result["stage"]: result["rows"] for result in results}
+    assert rows["load_eviction"] > 0
+    assert rows["merge_evic_fmr"] >= rows["load_eviction"]
+    assert rows["merge_all_cities"] > rows["merge_evic_fmr"]
+    assert all(result["peak_rss_mb"] > 0 for result in results)
+    assert all(result["traced_peak_mb"] > 0 for result in results)
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from eviction_analysis import binning
+from eviction_analysis.binning import FILINGS_BINS, Binning
+
+
+@pytest.mark.parametrize(
+    "value, label",
+    [
+        (0, "0"),
+        (0.5, "1-9"),
+        (1, "1-9"),
+        (9, "1-9"),
+        (9.99, "1-9"),
+        (10, "10-29"),
+        (29, "10-29"),
+        (30, "30-59"),
+        (99, "60-99"),
+        (99.5, "60-99"),
+        (100, ">100"),
+        (np.inf, ">100"),
+        (-1, None),
+        (-0.5, None),
+        (np.nan, None),
+    ],
+)
+def test_filings_bins_edges(value: float, label: str | None) -> None:
+    binned: pd.Categorical = binning.bin_values([value], FILINGS_BINS)
+
+    assert binned.ordered
+    assert list(binned.categories) == FILINGS_BINS.labels
+    assert binned[0] == label if label is not None else pd.isna(binned[0])
+
+
+def test_nullable_values_are_not_binned() -> None:
+    values: pd.Series = pd.Series([3, pd.NA, 100], dtype="Int64")
+
+    assert binning.bin_codes(values, FILINGS_BINS).tolist() == [1, -1, 5]
+
+
+def test_right_closed_bins_with_an_upper_edge() -> None:
+    bins: Binning = Binning([0.0, 10.0], ["low", "high"], closed="right", upper=20.0)
+
+    codes: np.ndarray = binning.bin_codes([0, 0.1, 10, 10.1, 20, 20.1], bins)
+
+    assert codes.tolist() == [-1, 0, 0, 1, 1, -1]
+
+
+def test_every_edge_needs_a_label() -> None:
+    with pytest.raises(ValueError, match="one label per edge"):
+        binning.bin_codes([1], Binning([0.0, 1.0], ["only"]))
+
+
+def test_add_bins_engines_agree() -> None:
+    pl = pytest.importorskip("polars")
+    df: pd.DataFrame = pd.DataFrame({"filings_2020": [0.0, 12.0, np.nan, 250.0]})
+
+    binned: pd.DataFrame = binning.add_bins(df)
+    polars_binned = binning.add_bins(pl.from_pandas(df))
+
+    assert binned.filings_cat.cat.codes.tolist() == [0, 2, -1, 5]
+    assert polars_binned["filings_cat"].to_list() == ["0", "10-29", None, ">100"]
+    assert polars_binned["filings_cat"].dtype == pl.Enum(FILINGS_BINS.labels)
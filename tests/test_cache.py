@@ -0,0 +1,29 @@
+"""Tests for the columnar workbook cache."""
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from eviction_analysis import cache
+
+
+def test_status_never_rewrites_the_cache(tmp_path: Path) -> None:
+    source: Path = tmp_path.joinpath("fmr.xlsx")
+    pd.DataFrame({"ZIP\nCode": ["10001"], "SAFMR\n2BR": [2000]}).to_excel(
+        source, index=False
+    )
+    cached: Path = cache.ensure(source, tmp_path)
+    before: os.stat_result = cached.stat()
+
+    # Same content, new mtime, e.g. after a fresh checkout.
+    os.utime(source, ns=(before.st_mtime_ns + 10**9, before.st_mtime_ns + 10**9))
+    assert cache.check(source, tmp_path) == (True, cache.fingerprint(source))
+
+    assert cache.status([source], tmp_path)[0]["fresh"]
+    after: os.stat_result = cached.stat()
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+
+    # Only a writer refreshes the fingerprint, after which the check is cheap.
+    assert cache.ensure(source, tmp_path) == cached
+    assert cache.check(source, tmp_path) == (True, None)
+    assert cache.cached_fingerprint(source, tmp_path) == cache.fingerprint(source)
@@ -0,0 +1,84 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from eviction_analysis.crosswalk import CrosswalkIndex, attach, expand
+
+# 10001 spans two tracts and tract 36061000300 spans two zip codes. 10003 has
+# FMRs but isn't in the crosswalk.
+ZIP_TRACT: pd.DataFrame = pd.DataFrame(
+    {
+        "zipcode": [10001, 10001, 10002, 10002],
+        "tract": [36061000100, 36061000300, 36061000200, 36061000300],
+        "city": ["new york"] * 4,
+        "state": ["ny"] * 4,
+    }
+)
+FMRS: pd.DataFrame = pd.DataFrame(
+    {
+        "zipcode": [10001, 10002, 10003, 10001, 10002],
+        "fmr_2br": [2500.0, 2100.0, 2300.0, 2600.0, 2100.0],
+        "fmr_year": [2020, 2020, 2020, 2021, 2021],
+    }
+)
+
+
+def melt_and_merge(evictions: pd.DataFrame) -> pd.DataFrame:
+    """The merge `attach` replaced: melt the crosswalk into the FMRs so zip
+    codes and tracts share a column, merge, then drop duplicated rows."""
+    fmrs: pd.DataFrame = (
+        FMRS.merge(ZIP_TRACT, on="zipcode", how="left")
+        .melt(["fmr_2br", "fmr_year", "city", "state"], value_name="code")
+        .dropna(subset=["code"])
+        .astype({"code": np.int64})
+    )
+    merged: pd.DataFrame = evictions.assign(year=evictions.month.dt.year).merge(
+        fmrs, left_on=["geoid", "year"], right_on=["code", "fmr_year"], how="left"
+    )
+    return merged[[*evictions.columns, "fmr_2br"]].drop_duplicates()
+
+
+def test_attach_matches_melt_and_merge() -> None:
+    evictions: pd.DataFrame = pd.DataFrame(
+        {
+            "geoid": [10001, 36061000300, 36061000100, 10003, 10004, 10002],
+            "month": pd.to_datetime(
+                ["2020-01", "2020-01", "2021-06", "2020-03", "2020-01", "2022-01"]
+            ),
+            "filings": np.arange(6),
+        }
+    )
+    index: CrosswalkIndex = CrosswalkIndex.from_zip_tract(ZIP_TRACT)
+
+    attached: pd.DataFrame = attach(evictions, FMRS, index)
+
+    # The shared tract gets both zip codes' FMRs; unknown GEOIDs and years
+    # without FMRs are kept with missing values.
+    assert attached.filings.tolist() == [0, 1, 1, 2, 3, 4, 5]
+    pd.testing.assert_frame_equal(
+        attached, melt_and_merge(evictions).reset_index(drop=True)
+    )
+
+
+def test_expand_finds_every_duplicate() -> None:
+    keys: np.ndarray = np.array([1, 3, 3, 3, 7])
+
+    query_pos, key_pos = expand(keys, np.array([3, 5, 1, 3]))
+
+    assert query_pos.tolist() == [0, 0, 0, 2, 3, 3, 3]
+    assert key_pos.tolist() == [1, 2, 3, 0, 1, 2, 3]
+
+
+def test_index_round_trips_through_arrow(tmp_path: Path) -> None:
+    index: CrosswalkIndex = CrosswalkIndex.from_zip_tract(ZIP_TRACT)
+    path: Path = tmp_path / "index.parquet"
+    pq.write_table(index.to_arrow(), path)
+
+    restored: CrosswalkIndex = CrosswalkIndex.read(path)
+
+    # Two zip codes and three tracts, one of which maps to both zip codes.
+    assert len(restored) == len(index) == 6
+    assert restored.geoid.tolist() == index.geoid.tolist()
+    assert restored.lookup(np.array([36061000300, -1]))[1].tolist() == [10001, 10002]
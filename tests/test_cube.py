@@ -0,0 +1,93 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from eviction_analysis import cube
+from eviction_analysis.cube import Cube
+
+
+@pytest.fixture
+def merged() -> pd.DataFrame:
+    """Merged rows where the Bronx tract fans out to two zip codes' FMRs."""
+    rng: np.random.Generator = np.random.default_rng(0)
+    months: pd.DatetimeIndex = pd.date_range("2020-01-01", "2021-12-01", freq="MS")
+    geoids: list[int] = [10001, 10002, 10451, 36005000100]
+    boroughs: list[str] = ["Manhattan", "Manhattan", "Bronx", "Bronx"]
+    frame: pd.DataFrame = pd.DataFrame(
+        {
+            "city": "New York, NY",
+            "type": "Zip Code",
+            "geoid": np.repeat(geoids, len(months)),
+            "racial_majority": pd.Categorical(
+                np.repeat(["White", "Latinx", "Black", "Black"], len(months))
+            ),
+            "month": np.tile(months, len(geoids)),
+            "filings_2020": rng.integers(0, 30, len(geoids) * len(months)),
+            "filings_avg": rng.uniform(0, 30, len(geoids) * len(months)),
+            "borough": pd.Categorical(np.repeat(boroughs, len(months))),
+            "fmr_2br": rng.uniform(1500, 3000, len(geoids) * len(months)),
+        }
+    )
+    fanned_out: pd.DataFrame = frame.loc[frame.geoid == 36005000100].assign(
+        fmr_2br=lambda df: df.fmr_2br + 100
+    )
+    merged: pd.DataFrame = pd.concat([frame, fanned_out], ignore_index=True)
+    merged["fmr_2br_90"] = merged.fmr_2br * 0.9
+    merged["fmr_2br_110"] = merged.fmr_2br * 1.1
+    merged.loc[merged.sample(frac=0.1, random_state=0).index, "fmr_2br"] = np.nan
+    return merged
+
+
+def test_query_totals_match_the_rows(merged: pd.DataFrame) -> None:
+    levels: dict[str, pd.DataFrame] = cube.build_cube(merged)
+    queried: pd.DataFrame = Cube(levels).query(
+        ["borough", "year"], where={"borough": "Bronx"}
+    )
+
+    # Filings count once per observation, FMRs once per merged row.
+    bronx: pd.DataFrame = merged.loc[merged.borough == "Bronx"].assign(
+        year=lambda df: df.month.dt.year
+    )
+    observations: pd.DataFrame = bronx.drop_duplicates(subset=cube.EVICTION_COLUMNS)
+    filings: pd.Series = observations.groupby("year").filings_2020.sum()
+    fmrs: pd.DataFrame = bronx.groupby("year").fmr_2br.agg(["mean", "min", "max"])
+
+    assert queried.borough.astype(str).tolist() == ["Bronx", "Bronx"]
+    assert queried.rows.tolist() == observations.groupby("year").size().tolist()
+    assert queried.filings_2020_sum.tolist() == filings.tolist()
+    np.testing.assert_allclose(queried.fmr_2br_mean, fmrs["mean"])
+    np.testing.assert_allclose(queried.fmr_2br_min, fmrs["min"])
+    np.testing.assert_allclose(queried.fmr_2br_max, fmrs["max"])
+
+    total: pd.DataFrame = Cube(levels).query([], metrics=["filings_2020"])
+    assert (
+        total.filings_2020_sum.item()
+        == merged.drop_duplicates(subset=cube.EVICTION_COLUMNS).filings_2020.sum()
+    )
+
+
+def test_queries_use_the_smallest_level(merged: pd.DataFrame, tmp_path: Path) -> None:
+    path: Path = tmp_path / "cube"
+    cube.write_cube(cube.build_cube(merged), path)
+    loaded: Cube = Cube.load(path)
+
+    assert loaded.level_for(["year"]) == "year"
+    assert loaded.level_for(["borough", "month"]) == "borough_month"
+    assert loaded.level_for(["geoid", "year"]) == "zip_year"
+    assert loaded.level_for(["racial_majority", "month"]) == "zip_month"
+    with pytest.raises(KeyError):
+        loaded.level_for(["neighborhood"])
+
+    by_month: pd.DataFrame = loaded.query(
+        ["geoid"], where={"month": "2021-03-01"}, metrics=["filings_avg"]
+    )
+    expected: pd.Series = (
+        merged.loc[merged.month == "2021-03-01"]
+        .drop_duplicates(subset=cube.EVICTION_COLUMNS)
+        .groupby("geoid")
+        .filings_avg.sum()
+    )
+    assert by_month.geoid.tolist() == expected.index.tolist()
+    np.testing.assert_allclose(by_month.filings_avg_sum, expected)
@@ -0,0 +1,97 @@
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from eviction_analysis import dataset
+
+
+def merged_frame(months: list[str], boroughs: list[str], filings: int) -> pd.DataFrame:
+    """Rows of every month and borough in the layout of the merged data."""
+    index: pd.MultiIndex = pd.MultiIndex.from_product(
+        [pd.to_datetime(months), boroughs], names=["month", "borough"]
+    )
+    return index.to_frame(index=False).assign(
+        borough=lambda df: df.borough.astype("category"), filings_2020=filings
+    )
+
+
+def test_replace_partitions_swaps_whole_years(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    path: Path = tmp_path / "merged"
+    dataset.write_merged(
+        merged_frame(["2020-01-01", "2021-01-01"], ["Bronx", "Queens"], 1), path
+    )
+    kept: dict[Path, int] = {
+        file: file.stat().st_mtime_ns for file in path.joinpath("year=2020").rglob("*")
+    }
+
+    renames: list[tuple[str, str]] = []
+    replace = os.replace
+
+    def record(src: Path, dst: Path) -> None:
+        renames.append((Path(src).name, Path(dst).name))
+        replace(src, dst)
+
+    monkeypatch.setattr(dataset.os, "replace", record)
+    # Queens has no rows in 2021 anymore.
+    dataset.replace_partitions(merged_frame(["2021-01-01"], ["Bronx"], 2), path)
+
+    # The old year is renamed aside and the staged one renamed into place,
+    # rather than moving files one by one.
+    retired: str = renames[0][1]
+    assert retired.startswith(".year=2021.")
+    assert renames == [("year=2021", retired), ("year=2021", "year=2021")]
+    assert sorted(p.name for p in path.iterdir()) == ["year=2020", "year=2021"]
+    assert [p.name for p in path.joinpath("year=2021").iterdir()] == ["borough=Bronx"]
+    assert {
+        file: file.stat().st_mtime_ns for file in path.joinpath("year=2020").rglob("*")
+    } == kept
+
+    merged: pd.DataFrame = dataset.read_merged(path)
+    assert merged.groupby("year", observed=True).filings_2020.sum().to_dict() == {
+        2020: 2,
+        2021: 2,
+    }
+    assert not list(tmp_path.glob(".*"))
+
+
+def test_replace_partitions_ignores_empty_frames(tmp_path: Path) -> None:
+    path: Path = tmp_path / "merged"
+    dataset.write_merged(merged_frame(["2020-01-01"], ["Bronx"], 1), path)
+
+    dataset.replace_partitions(merged_frame([], ["Bronx"], 1), path)
+
+    assert len(dataset.read_merged(path)) == 1
+
+
+def test_read_merged_prunes_partitions(tmp_path: Path) -> None:
+    path: Path = tmp_path / "merged"
+    dataset.write_merged(
+        merged_frame(
+            ["2020-01-01", "2021-01-01", "2021-02-01"], ["Bronx", "Queens"], 1
+        ),
+        path,
+    )
+    # Partitions that are pruned are never opened, so corrupting them is
+    # harmless unless the filter fails to prune. The first file is left alone
+    # because the schema is read from it.
+    for file in path.glob("year=*/borough=Queens/*.parquet"):
+        file.write_bytes(b"not parquet")
+
+    bronx: pd.DataFrame = dataset.read_merged(
+        path,
+        filters=[
+            ("year", "=", 2021),
+            ("borough", "=", "Bronx"),
+            ("month", "=", pd.Timestamp("2021-02-01")),
+        ],
+    )
+
+    assert len(bronx) == 1
+    assert bronx.month.tolist() == [pd.Timestamp("2021-02-01")]
+    assert bronx.borough.dtype == "category"
+    with pytest.raises(ValueError, match="borough=Queens"):
+        dataset.read_merged(path, filters=[("year", "=", 2021)])
@@ -0,0 +1,66 @@
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from eviction_analysis import etl_arrow, etl_evict
+from eviction_analysis.etl_evict import Sources
+
+
+def test_load_eviction_parses_months(eviction_csv: Path) -> None:
+    batches: list[pa.RecordBatch] = list(
+        etl_arrow.load_eviction(eviction_csv, cities="New York, NY")
+    )
+    table: pa.Table = pa.Table.from_batches(batches)
+
+    assert pa.types.is_timestamp(table.schema.field("month").type)
+    assert pa.types.is_timestamp(table.schema.field("last_updated").type)
+    assert table.column("month").to_pylist()[:3] == [
+        pd.Timestamp("2020-01-01"),
+        pd.Timestamp("2021-02-01"),
+        pd.Timestamp("2022-03-01"),
+    ]
+    # Sealed GEOIDs are missing rather than errors.
+    assert table.column("geoid").null_count == 1
+    assert set(table.column("city").to_pylist()) == {"New York, NY"}
+
+
+def test_merge_matches_pandas(eviction_csv: Path, sources: Sources) -> None:
+    batches = etl_arrow.load_eviction(eviction_csv, cities="New York, NY")
+    merged: pd.DataFrame = etl_arrow.to_pandas(
+        etl_arrow.merge_evic_fmr(batches, sources=sources)
+    )
+
+    evictions: pd.DataFrame = etl_evict.load_eviction(
+        eviction_csv, pyarrow=True, cities="New York, NY"
+    )
+    expected: pd.DataFrame = etl_evict.merge_evic_fmr(evictions, sources=sources)
+
+    assert len(merged) == len(expected) == 5
+    pd.testing.assert_frame_equal(
+        merged[expected.columns],
+        expected,
+        check_dtype=False,
+        check_categorical=False,
+    )
+
+
+def test_write_parquet_leaves_no_partial_file(tmp_path: Path) -> None:
+    path: Path = tmp_path.joinpath("merged.parquet")
+
+    with pytest.raises(ValueError, match="No merged rows"):
+        etl_arrow.write_parquet([], path)
+    assert list(tmp_path.iterdir()) == []
+
+    def interrupted() -> Iterator[pa.Table]:
+        yield pa.table({"rent": [1.0, 2.0]})
+        raise OSError("source went away")
+
+    with pytest.raises(OSError, match="source went away"):
+        etl_arrow.write_parquet(interrupted(), path)
+    assert list(tmp_path.iterdir()) == []
+
+    assert etl_arrow.write_parquet([pa.table({"rent": [1.0]})], path) == 1
+    assert list(tmp_path.iterdir()) == [path]
@@ -0,0 +1,201 @@
+import functools
+import tracemalloc
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from eviction_analysis import bench, crosswalk, etl_evict, schemas, snapshot
+from eviction_analysis.etl_evict import Sources
+
+
+@pytest.mark.parametrize("cities", [None, "New York, NY"])
+def test_load_eviction_pandas_parses_months(
+    eviction_csv: Path, cities: Optional[str]
+) -> None:
+    evictions: pd.DataFrame = etl_evict.load_eviction(
+        eviction_csv, pyarrow=False, cities=cities
+    )
+
+    assert evictions.month.dtype == "datetime64[ns]"
+    assert evictions.last_updated.dtype == "datetime64[ns]"
+    assert evictions.month.tolist()[:3] == [
+        pd.Timestamp("2020-01-01"),
+        pd.Timestamp("2021-02-01"),
+        pd.Timestamp("2022-03-01"),
+    ]
+    assert evictions.last_updated.eq(pd.Timestamp("2022-05-09")).all()
+    assert evictions.geoid.isna().sum() == 1
+
+
+def test_load_eviction_engines_agree(eviction_csv: Path) -> None:
+    pd.testing.assert_frame_equal(
+        etl_evict.load_eviction(eviction_csv, pyarrow=False),
+        etl_evict.load_eviction(eviction_csv, pyarrow=True),
+        check_categorical=False,
+    )
+
+
+def test_load_fmr_compact_dtypes(tmp_path: Path) -> None:
+    path: Path = tmp_path / "fy2020_safmrs_revised.xlsx"
+    headers: list[str] = [
+        column.variants[0] for column in schemas.FMR_SCHEMAS[2020].columns
+    ]
+    pd.DataFrame(
+        dict(zip(headers, [[10001, 10002], [2500, 2100], [2250, 1890], [2750, 2310]]))
+    ).to_excel(path, index=False)
+
+    fmr: pd.DataFrame = etl_evict.load_fmr(path, 2020, cache=False)
+
+    assert fmr.dtypes.to_dict() == {
+        "zipcode": pd.Int32Dtype(),
+        "fmr_2br": np.float32,
+        "fmr_2br_90": np.float32,
+        "fmr_2br_110": np.float32,
+        "fmr_year": np.int16,
+    }
+
+
+def test_merge_round_trips_compact_dtypes(
+    eviction_csv: Path, sources: Sources, tmp_path: Path
+) -> None:
+    # A neighborhood without a zip code must not match the sealed GEOID.
+    neighborhoods: pd.DataFrame = pd.concat(
+        [
+            sources.neighborhoods,
+            pd.DataFrame(
+                {"zipcode": pd.array([pd.NA], dtype="Int64"), "borough": ["Unknown"]}
+            ),
+        ],
+        ignore_index=True,
+    ).astype(
+        {"borough": "category", "post_office": "category", "neighborhood": "category"}
+    )
+    evictions: pd.DataFrame = etl_evict.load_eviction(
+        eviction_csv, pyarrow=True, cities="New York, NY"
+    )
+    merged: pd.DataFrame = etl_evict.merge_evic_fmr(
+        evictions, sources=sources, neighborhoods=neighborhoods
+    )
+
+    assert len(merged) == 5
+    assert merged.borough.isna().to_numpy().tolist() == [
+        False,
+        False,
+        False,
+        True,
+        True,
+    ]
+    assert merged.geoid.dtype == "category"
+    assert (merged[["fmr_2br", "fmr_2br_90", "fmr_2br_110"]].dtypes == np.float32).all()
+
+    # Parquet keeps the compact types, and the Arrow snapshot keeps every dtype.
+    path: Path = tmp_path / "merged.parquet"
+    merged.to_parquet(path)
+    assert (
+        pd.read_parquet(path).dtypes[merged.dtypes == np.float32] == np.float32
+    ).all()
+    restored: pd.DataFrame = snapshot.read_snapshot(
+        snapshot.write_snapshot(merged, tmp_path / "merged.arrow")
+    )
+    pd.testing.assert_frame_equal(
+        restored.drop(columns="geoid"), merged.drop(columns="geoid")
+    )
+    # Arrow has no nullable flavor of the categories' integer type.
+    assert restored.geoid.astype("Int64").equals(merged.geoid.astype("Int64"))
+
+
+def test_merge_peak_memory_at_1x(tmp_path: Path) -> None:
+    data: bench.BenchData = bench.make_synthetic(1, tmp_path)
+    evictions, sources = bench._setup_merge(data)
+
+    tracemalloc.start()
+    try:
+        merged: pd.DataFrame = etl_evict.merge_evic_fmr(evictions, sources=sources)
+        peak: int = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # The merge gathers each output column once. Throwaway copies of the
+    # input or output (a melt, a merge and drop_duplicates, a city filter
+    # copy) push the peak well past this.
+    frames: int = int(
+        evictions.memory_usage(deep=True).sum() + merged.memory_usage(deep=True).sum()
+    )
+    print(f"merge_evic_fmr tracemalloc peak at 1x: {peak / 2**20:.2f} MiB")
+    assert peak < 3 * frames
+
+
+@pytest.fixture
+def source_paths(
+    tmp_path: Path, fmr_workbooks: dict[int, Path], monkeypatch: pytest.MonkeyPatch
+) -> dict[str, Path]:
+    """Crosswalk and neighborhoods files next to the SAFMR workbooks."""
+    zip_tract: Path = tmp_path / "ZIP_TRACT_122021.xlsx"
+    pd.DataFrame(
+        {
+            "ZIP": [10001, 10002],
+            "TRACT": [36061000100, 36061000200],
+            "USPS_ZIP_PREF_CITY": ["NEW YORK", "NEW YORK"],
+            "USPS_ZIP_PREF_STATE": ["NY", "NY"],
+        }
+    ).to_excel(zip_tract, index=False)
+    neighborhoods: Path = tmp_path / "nyc_zip_borough_neighborhoods_pop.csv"
+    neighborhoods.write_text(
+        "zip,borough,post_office,neighborhood,population,density\n"
+        '10001,Manhattan,"New York, NY",Chelsea and Clinton,21102,33959\n'
+    )
+
+    # Keep the workbook cache and crosswalk index out of the shared cache.
+    monkeypatch.setattr(
+        etl_evict, "load_fmr", functools.partial(etl_evict.load_fmr, cache=False)
+    )
+    monkeypatch.setattr(
+        etl_evict,
+        "load_index",
+        functools.partial(crosswalk.load_index, cache_dir=tmp_path),
+    )
+    return {"zip_tract": zip_tract, "neighborhoods": neighborhoods}
+
+
+def test_load_sources_is_ordered_for_every_executor(
+    fmr_workbooks: dict[int, Path], source_paths: dict[str, Path]
+) -> None:
+    loaded: dict[Optional[str], Sources] = {
+        executor: etl_evict.load_sources(
+            list(fmr_workbooks.values()),
+            list(fmr_workbooks),
+            source_paths["zip_tract"],
+            source_paths["neighborhoods"],
+            executor=executor,
+        )
+        for executor in [None, "thread"]
+    }
+
+    for sources in loaded.values():
+        assert [fmr.fmr_year.iloc[0] for fmr in sources.fmrs] == [2020, 2021, 2022]
+        assert [fmr.fmr_2br.iloc[0] for fmr in sources.fmrs] == [2500, 2501, 2502]
+        # Both zip codes and both tracts are keys.
+        assert len(sources.crosswalk) == 4
+        assert sources.neighborhoods.zipcode.tolist() == [10001]
+    for serial, pooled in zip(loaded[None].fmrs, loaded["thread"].fmrs):
+        pd.testing.assert_frame_equal(serial, pooled)
+
+
+def test_load_sources_names_the_failed_data_set(
+    tmp_path: Path, fmr_workbooks: dict[int, Path], source_paths: dict[str, Path]
+) -> None:
+    missing: Path = tmp_path / "fy2021_missing.xlsx"
+
+    with pytest.raises(
+        RuntimeError, match=f"Failed to load 2021 Fair Market Rate data \\({missing}"
+    ) as error:
+        etl_evict.load_sources(
+            [fmr_workbooks[2020], missing],
+            [2020, 2021],
+            source_paths["zip_tract"],
+            None,
+        )
+    assert isinstance(error.value.__cause__, FileNotFoundError)
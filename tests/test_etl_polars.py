@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from eviction_analysis import etl_evict
+from eviction_analysis.etl_evict import Sources
+
+pl = pytest.importorskip("polars")
+etl_polars = pytest.importorskip("eviction_analysis.etl_polars")
+
+
+def polars_sources(sources: Sources) -> Sources:
+    """Sources as the LazyFrames and dtypes of `etl_polars.load_sources`."""
+    return Sources(
+        fmrs=[
+            pl.from_pandas(fmr)
+            .lazy()
+            .with_columns(
+                pl.col("zipcode").cast(pl.Int64), pl.col("fmr_year").cast(pl.Int32)
+            )
+            for fmr in sources.fmrs
+        ],
+        crosswalk=sources.crosswalk,
+        neighborhoods=pl.from_pandas(sources.neighborhoods).lazy(),
+    )
+
+
+def test_load_eviction_parses_months(eviction_csv: Path) -> None:
+    evictions = etl_polars.load_eviction(eviction_csv).collect()
+
+    assert evictions.schema["month"] == pl.Datetime("ns")
+    assert evictions.schema["last_updated"] == pl.Datetime("ns")
+    assert evictions["month"].null_count() == 0
+    assert evictions["month"].to_list()[:3] == [
+        pd.Timestamp("2020-01-01"),
+        pd.Timestamp("2021-02-01"),
+        pd.Timestamp("2022-03-01"),
+    ]
+    assert evictions["geoid"].null_count() == 1
+
+
+def test_merge_matches_pandas(eviction_csv: Path, sources: Sources) -> None:
+    merged: pd.DataFrame = etl_polars.merge_evic_fmr(
+        etl_polars.load_eviction(eviction_csv), sources=polars_sources(sources)
+    ).to_pandas()
+
+    evictions: pd.DataFrame = etl_evict.load_eviction(
+        eviction_csv, pyarrow=True, cities="New York, NY"
+    )
+    expected: pd.DataFrame = etl_evict.merge_evic_fmr(evictions, sources=sources)
+
+    assert list(merged.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(
+        merged, expected, check_dtype=False, check_categorical=False
+    )
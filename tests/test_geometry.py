@@ -0,0 +1,101 @@
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pytest
+import shapely
+
+from eviction_analysis import geometry
+
+# Squares are 0.01 degrees wide with a vertex every 50th of a side, all on one
+# grid so that neighbors share their vertices exactly.
+SIDE: float = 0.01
+STEPS: int = 50
+
+
+def square(x: int, y: int) -> list[list[float]]:
+    """Ring of a square in Midtown with many collinear vertices."""
+    grid: list[tuple[int, int]] = (
+        [(x * STEPS + i, y * STEPS) for i in range(STEPS)]
+        + [((x + 1) * STEPS, y * STEPS + i) for i in range(STEPS)]
+        + [((x + 1) * STEPS - i, (y + 1) * STEPS) for i in range(STEPS)]
+        + [(x * STEPS, (y + 1) * STEPS - i) for i in range(STEPS + 1)]
+    )
+    return [[-73.99 + i * SIDE / STEPS, 40.75 + j * SIDE / STEPS] for i, j in grid]
+
+
+def feature(zipcode: str, borough: str, x: int, y: int) -> dict[str, Any]:
+    return {
+        "type": "Feature",
+        "properties": {"postalCode": zipcode, "borough": borough},
+        "geometry": {"type": "Polygon", "coordinates": [square(x, y)]},
+    }
+
+
+@pytest.fixture
+def zcta_path(tmp_path: Path) -> Path:
+    """Three neighboring ZCTAs, one of which is split into two polygons."""
+    path: Path = tmp_path / "nyc_zcta.geojson"
+    features: list[dict[str, Any]] = [
+        feature("10002", "Manhattan", 1, 0),
+        feature("10001", "Manhattan", 0, 0),
+        feature("10451", "Bronx", 0, 1),
+        feature("10451", "Bronx", 1, 1),
+    ]
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+    return path
+
+
+def test_simplified_zctas_keep_shared_borders(zcta_path: Path, tmp_path: Path) -> None:
+    zctas = geometry.load(9, zcta_path, tmp_path)
+    full = geometry.read_zcta(zcta_path)
+
+    assert zctas.zipcode.tolist() == [10001, 10002, 10451]
+    assert zctas.borough.astype(str).tolist() == ["Manhattan", "Manhattan", "Bronx"]
+    assert shapely.get_num_coordinates(zctas.geometry.to_numpy()).sum() < (
+        shapely.get_num_coordinates(full.geometry.to_numpy()).sum() / 10
+    )
+    # Neighbors neither overlap nor leave slivers between them.
+    projected = zctas.geometry.to_crs(geometry.WEB_MERCATOR)
+    union: float = shapely.union_all(projected.to_numpy()).area
+    assert union == pytest.approx(projected.area.sum(), rel=1e-6)
+    assert union == pytest.approx(
+        full.geometry.to_crs(geometry.WEB_MERCATOR).area.sum(), rel=1e-3
+    )
+
+
+def test_zoom_levels_are_cached_until_the_source_changes(
+    zcta_path: Path, tmp_path: Path
+) -> None:
+    paths: dict[int, Path] = geometry.ensure(zcta_path, tmp_path)
+    built: dict[int, int] = {
+        zoom: path.stat().st_mtime_ns for zoom, path in paths.items()
+    }
+
+    assert sorted(paths) == geometry.ZOOMS
+    assert geometry.ensure(zcta_path, tmp_path) == paths
+    assert {zoom: path.stat().st_mtime_ns for zoom, path in paths.items()} == built
+
+    with open(zcta_path, "a") as file:
+        file.write("\n")
+    os.utime(zcta_path, ns=(1, 1))
+    geometry.ensure(zcta_path, tmp_path)
+    assert all(path.stat().st_mtime_ns != built[zoom] for zoom, path in paths.items())
+
+
+def test_join_attaches_geometry_by_zip_code(zcta_path: Path, tmp_path: Path) -> None:
+    zctas = geometry.load(11, zcta_path, tmp_path)
+    df: pd.DataFrame = pd.DataFrame(
+        {"geoid": pd.array([10451, None, 10001, 99999], dtype="Int64")}
+    )
+
+    joined = geometry.join(df, zctas=zctas)
+
+    assert joined.geometry.isna().tolist() == [False, True, False, True]
+    assert joined.geometry.iloc[0].equals(zctas.geometry.iloc[2])
+    features: list[dict[str, Any]] = geometry.geojson(zipcodes=[10002], zctas=zctas)[
+        "features"
+    ]
+    assert [feature["id"] for feature in features] == ["10002"]
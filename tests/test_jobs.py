@@ -0,0 +1,47 @@
+"""Tests for running named jobs on pools."""
+import threading
+import time
+from typing import Optional
+
+import pytest
+
+from eviction_analysis.jobs import Jobs, run_jobs
+
+
+@pytest.mark.parametrize("executor", [None, "thread", "process"])
+def test_results_follow_submission_order(executor: Optional[str]) -> None:
+    # Builtins pickle, so they also run in spawned workers.
+    jobs: Jobs = {f"{n} squared": (pow, (n, 2)) for n in [3, 1, 2]}
+
+    assert run_jobs(jobs, executor, 2) == {
+        "3 squared": 9,
+        "1 squared": 1,
+        "2 squared": 4,
+    }
+
+
+def test_failure_names_the_job_and_cancels_the_rest() -> None:
+    started: list[str] = []
+    release = threading.Event()
+
+    def fail() -> None:
+        started.append("bad")
+        raise ValueError("corrupt")
+
+    def wait(name: str) -> str:
+        started.append(name)
+        release.wait(5)
+        return name
+
+    jobs: Jobs = {"bad.csv": (fail, ()), "slow.csv": (wait, ("slow",))}
+    jobs.update({f"{n}.csv": (wait, (str(n),)) for n in range(10)})
+    threading.Timer(0.5, release.set).start()
+
+    with pytest.raises(RuntimeError, match="Failed to load bad.csv") as error:
+        run_jobs(jobs, "thread", 2, "load")
+
+    assert isinstance(error.value.__cause__, ValueError)
+    # The worker freed by the failure may pick up one more job before the
+    # rest are cancelled.
+    time.sleep(0.1)
+    assert {"bad", "slow"} <= set(started) and len(started) <= 3
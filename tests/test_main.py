@@ -0,0 +1,78 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from eviction_analysis import __main__ as cli
+from eviction_analysis import paths
+
+HEAVY: list[str] = ["pandas", "pyarrow", "polars", "geopandas", "folium"]
+
+
+def test_parsing_imports_no_heavy_modules() -> None:
+    # A fresh interpreter, since this one has pandas loaded already.
+    script: str = (
+        "import sys\n"
+        "from eviction_analysis import __main__ as cli\n"
+        "cli.parse_args(['cache', 'status'])\n"
+        "cli.parse_args([])\n"
+        f"print([name for name in {HEAVY!r} if name in sys.modules])\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=Path(__file__).parents[1],
+    )
+
+    assert result.stdout.strip() == "[]"
+
+
+def test_no_command_runs_the_etl_with_its_defaults() -> None:
+    args = cli.parse_args([])
+
+    assert args.func is cli.run_etl
+    assert args.cities == ["New York, NY"]
+    assert args.fmr == paths.FMR_PATHS
+    assert args.neighborhoods == paths.NYC_BOROUGH
+
+
+def test_etl_takes_paths_and_cities(tmp_path: Path) -> None:
+    args = cli.parse_args(
+        [
+            "etl",
+            "--cities",
+            "all",
+            "--eviction",
+            str(tmp_path / "evictions.csv"),
+            "--fmr",
+            "a.xlsx",
+            "b.xlsx",
+            "--fmr-years",
+            "2021",
+            "2022",
+            "--no-neighborhoods",
+        ]
+    )
+
+    assert args.cities == ["all"]
+    assert args.eviction == tmp_path / "evictions.csv"
+    assert args.fmr == [Path("a.xlsx"), Path("b.xlsx")]
+    assert args.fmr_years == [2021, 2022]
+    assert args.neighborhoods is None
+
+
+@pytest.mark.parametrize(
+    "argv, message",
+    [
+        (["etl", "--incremental", "--engine", "arrow"], "Incremental merges"),
+        (["etl", "--by-city", "--engine", "polars"], "Per city merges"),
+    ],
+)
+def test_unsupported_combinations_exit_early(argv: list[str], message: str) -> None:
+    args = cli.parse_args(argv)
+
+    with pytest.raises(SystemExit, match=message):
+        args.func(args)
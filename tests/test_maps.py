@@ -0,0 +1,94 @@
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("folium")
+
+from eviction_analysis import cube, maps  # noqa: E402
+from eviction_analysis.cube import Cube  # noqa: E402
+
+GEOJSON: dict[str, Any] = {
+    "type": "FeatureCollection",
+    "features": [
+        {
+            "type": "Feature",
+            "id": zipcode,
+            "properties": {"zipcode": int(zipcode)},
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [
+                    [[-73.99, 40.75], [-73.98, 40.75], [-73.98, 40.76], [-73.99, 40.75]]
+                ],
+            },
+        }
+        for zipcode in ["10001", "10002", "10451"]
+    ],
+}
+
+
+@pytest.fixture
+def merged_cube() -> Cube:
+    months: pd.DatetimeIndex = pd.date_range("2020-01-01", "2021-12-01", freq="MS")
+    merged: pd.DataFrame = pd.DataFrame(
+        {
+            "city": "New York, NY",
+            "type": "Zip Code",
+            "geoid": np.repeat([10001, 10002], len(months)),
+            "racial_majority": "White",
+            "month": np.tile(months, 2),
+            "filings_2020": np.arange(2 * len(months)),
+            "filings_avg": 1.0,
+            "borough": pd.Categorical(["Manhattan"] * 2 * len(months)),
+            "fmr_2br": 2000.0,
+            "fmr_2br_90": 1800.0,
+            "fmr_2br_110": 2200.0,
+        }
+    )
+    return Cube(cube.build_cube(merged))
+
+
+def test_period_filter() -> None:
+    assert maps.period_filter(2021) == {"year": 2021}
+    assert maps.period_filter("2021") == {"year": 2021}
+    assert maps.period_filter("2021-03") == {"month": pd.Timestamp("2021-03-01")}
+
+
+def test_maps_share_one_geojson_and_scale(
+    merged_cube: Cube, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(maps.geometry, "geojson", lambda zoom: GEOJSON)
+    scales: list[tuple[float, float]] = []
+    render = maps.render
+
+    def record(*args: Any) -> Path:
+        scales.append(args[-2:])
+        return render(*args)
+
+    monkeypatch.setattr(maps, "render", record)
+    specs: list[maps.MapSpec] = [
+        maps.MapSpec("filings_2020", 2020, "sum"),
+        maps.MapSpec("filings_2020", "2021-03", "sum"),
+    ]
+
+    assert maps.zip_values(merged_cube, specs[1]) == {"10001": 14.0, "10002": 38.0}
+
+    paths: dict[str, Path] = maps.render_maps(
+        specs, tmp_path, cube=merged_cube, max_workers=0
+    )
+
+    assert list(paths) == ["filings_2020-sum-2020", "filings_2020-sum-2021-03"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "filings_2020-sum-2020.html",
+        "filings_2020-sum-2021-03.html",
+        f"zcta-z{maps.geometry.nearest_zoom(maps.geometry.DEFAULT_ZOOM)}.geojson",
+    ]
+    # Maps of a metric share one scale across periods.
+    assert scales == [(14.0, 354.0), (14.0, 354.0)]
+    for path in paths.values():
+        html: str = path.read_text()
+        # The geometry is linked rather than embedded.
+        assert "zcta-z11.geojson" in html
+        assert "-73.99" not in html
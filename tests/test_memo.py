@@ -0,0 +1,32 @@
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+import pytest
+
+from eviction_analysis import memo
+
+
+@memo.memoize()
+def load_numbers(path: str | Path) -> pd.DataFrame:
+    return pd.read_csv(path)
+
+
+@pytest.fixture
+def memoized(tmp_path: Path) -> Iterator[None]:
+    memo.enable(memo_dir=tmp_path / "memo")
+    yield
+    memo.disable()
+
+
+def test_in_place_edits_stay_out_of_the_cache(tmp_path: Path, memoized: None) -> None:
+    path: Path = tmp_path / "numbers.csv"
+    path.write_text("a,b\n1,2.5\n3,4.5\n")
+
+    first: pd.DataFrame = load_numbers(path)
+    first.loc[0, "a"] = 100
+    first["b"] = first.b.fillna(0) * 2
+
+    second: pd.DataFrame = load_numbers(path)
+    assert memo.info()["hits"] == 1
+    pd.testing.assert_frame_equal(second, pd.DataFrame({"a": [1, 3], "b": [2.5, 4.5]}))
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import pytest
+
+from eviction_analysis import mirror
+
+ETAG: str = '"v1"'
+LAST_MODIFIED: str = "Mon, 09 May 2022 00:00:00 GMT"
+# Larger than a read chunk so that a download can stop partway.
+BODY: bytes = bytes(range(256)) * (3 * mirror.CHUNK_SIZE // 256)
+
+
+class Upstream(ThreadingHTTPServer):
+    """Stand-in for a data set's host with ETags and byte ranges."""
+
+    body: bytes = BODY
+    etag: str = ETAG
+    # Bytes to send before dropping the connection on the next response
+    truncate: Optional[int] = None
+    requests: list[dict[str, str]]
+
+
+class Handler(BaseHTTPRequestHandler):
+    server: Upstream
+
+    def do_GET(self) -> None:
+        self.server.requests.append(dict(self.headers))
+        body: bytes = self.server.body
+        if self.headers.get("If-None-Match") == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        start: int = 0
+        byte_range: Optional[str] = self.headers.get("Range")
+        if byte_range and self.headers.get("If-Range") == self.server.etag:
+            start = int(byte_range.removeprefix("bytes=").rstrip("-"))
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}"
+            )
+        else:
+            self.send_response(200)
+        self.send_header("ETag", self.server.etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+
+        payload: bytes = body[start:]
+        if self.server.truncate is not None:
+            payload, self.server.truncate = payload[: self.server.truncate], None
+        self.wfile.write(payload)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def upstream(monkeypatch: pytest.MonkeyPatch) -> Iterator[Upstream]:
+    """Local server that every known data set is fetched from."""
+    server: Upstream = Upstream(("127.0.0.1", 0), Handler)
+    server.requests = []
+    thread: threading.Thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    monkeypatch.setenv(mirror.MIRROR_ENV, f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.delenv(mirror.OFFLINE_ENV, raising=False)
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+FILENAME: str = next(iter(mirror.sources()))
+
+
+def test_fetch_then_reuse_unchanged_copy(upstream: Upstream, tmp_path: Path) -> None:
+    path: Path = mirror.fetch(FILENAME, mirror_dir=tmp_path)
+
+    assert path.read_bytes() == BODY
+    entry: dict[str, Any] = mirror.read_manifest(tmp_path)[FILENAME]
+    assert entry["sha256"] == hashlib.sha256(BODY).hexdigest()
+    assert entry["etag"] == ETAG
+
+    # Stored copies are served without asking the server.
+    assert mirror.fetch(FILENAME, mirror_dir=tmp_path) == path
+    assert len(upstream.requests) == 1
+
+    # A refresh is conditional, and a 304 keeps the stored copy.
+    assert mirror.fetch(FILENAME, refresh=True, mirror_dir=tmp_path) == path
+    assert upstream.requests[1]["If-None-Match"] == ETAG
+    assert upstream.requests[1]["If-Modified-Since"] == LAST_MODIFIED
+
+    upstream.body, upstream.etag = BODY[::-1], '"v2"'
+    changed: Path = mirror.fetch(FILENAME, refresh=True, mirror_dir=tmp_path)
+    assert changed != path
+    assert changed.read_bytes() == BODY[::-1]
+
+
+def test_interrupted_download_resumes(upstream: Upstream, tmp_path: Path) -> None:
+    upstream.truncate = mirror.CHUNK_SIZE + 1000
+    with pytest.raises(ConnectionError):
+        mirror.fetch(FILENAME, mirror_dir=tmp_path)
+
+    partial: Path = tmp_path.joinpath("partial", f"{FILENAME}.part")
+    received: int = partial.stat().st_size
+    assert 0 < received < len(BODY)
+
+    path: Path = mirror.fetch(FILENAME, mirror_dir=tmp_path)
+
+    assert upstream.requests[-1]["Range"] == f"bytes={received}-"
+    assert upstream.requests[-1]["If-Range"] == ETAG
+    assert path.read_bytes() == BODY
+    assert not partial.exists()
+
+
+def test_verify_reports_corrupt_objects(upstream: Upstream, tmp_path: Path) -> None:
+    path: Path = mirror.fetch(FILENAME, mirror_dir=tmp_path)
+    assert mirror.verify(tmp_path) == []
+
+    path.write_bytes(BODY[::-1])
+
+    assert mirror.verify(tmp_path) == [FILENAME]
+
+
+def test_offline_with_empty_mirror(
+    upstream: Upstream, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv(mirror.OFFLINE_ENV, "1")
+
+    with pytest.raises(FileNotFoundError):
+        mirror.fetch(FILENAME, mirror_dir=tmp_path)
+    assert upstream.requests == []
+
+
+def test_locate_keeps_unknown_urls(tmp_path: Path) -> None:
+    url: str = "https://example.com/data/allcities.csv?raw=true"
+    assert mirror.locate(url, offline=True, mirror_dir=tmp_path) == url
+
+
+def test_locate_keeps_local_files(tmp_path: Path) -> None:
+    path: Path = tmp_path / "local.csv"
+    path.write_text("a\n1\n")
+    assert mirror.locate(str(path), offline=True, mirror_dir=tmp_path) == path
@@ -0,0 +1,85 @@
+import json
+from pathlib import Path
+from typing import Any, Iterator
+
+import pandas as pd
+import pytest
+
+from eviction_analysis import profiling
+
+
+@pytest.fixture
+def records() -> Iterator[list[dict[str, Any]]]:
+    """Records of every stage run while the test runs."""
+    collected: list[dict[str, Any]] = []
+    hook: profiling.Hook = profiling.add_hook(collected.append)
+    yield collected
+    profiling.remove_hook(hook)
+
+
+@profiling.instrument()
+def double(df: pd.DataFrame) -> pd.DataFrame:
+    with profiling.stage("concat", rows_in=len(df)) as record:
+        doubled: pd.DataFrame = pd.concat([df, df])
+        record["rows_out"] = len(doubled)
+    return doubled
+
+
+def test_stages_nest_and_count_rows(records: list[dict[str, Any]]) -> None:
+    double(pd.DataFrame({"a": range(3)}))
+
+    # Inner stages finish first.
+    assert [record["stage"] for record in records] == ["double/concat", "double"]
+    assert [(record["rows_in"], record["rows_out"]) for record in records] == [
+        (3, 6),
+        (3, 6),
+    ]
+    outer: dict[str, Any] = records[1]
+    assert outer["wall_seconds"] >= records[0]["wall_seconds"] >= 0
+    assert outer["peak_rss_mb"] > 0
+
+
+def test_nothing_is_recorded_without_hooks() -> None:
+    with profiling.stage("idle") as record:
+        pass
+
+    assert record == {"stage": "idle", "rows_in": None, "rows_out": None}
+
+
+def test_broken_hooks_are_isolated(
+    records: list[dict[str, Any]], tmp_path: Path
+) -> None:
+    def broken(record: dict[str, Any]) -> None:
+        raise RuntimeError("hook failed")
+
+    path: Path = tmp_path / "stages.jsonl"
+    hooks: list[profiling.Hook] = [
+        profiling.add_hook(broken),
+        profiling.add_hook(profiling.JsonLinesHook(path)),
+    ]
+    try:
+        double(pd.DataFrame({"a": [1]}))
+    finally:
+        for hook in hooks:
+            profiling.remove_hook(hook)
+
+    assert len(records) == 2
+    lines: list[dict[str, Any]] = [
+        json.loads(line) for line in path.read_text().splitlines()
+    ]
+    assert [line["stage"] for line in lines] == ["double/concat", "double"]
+
+
+def test_profiling_dumps_reports(tmp_path: Path) -> None:
+    profiling.enable_profiling(tmp_path)
+    try:
+        double(pd.DataFrame({"a": [1]}))
+    finally:
+        profiling.disable_profiling()
+
+    # Only the outermost stage is profiled; every stage gets a memory report.
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "double.prof",
+        "double.tracemalloc.txt",
+        "double_concat.tracemalloc.txt",
+    ]
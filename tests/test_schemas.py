@@ -0,0 +1,90 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from eviction_analysis import etl_evict, schemas
+
+# Header rows of the HUD SAFMR workbooks, including columns that aren't kept.
+HEADERS: dict[int, list[str]] = {
+    2020: [
+        "zcta",
+        "cbsamet",
+        "cbsanmet",
+        "SAFMR 2020 0br",
+        "SAFMR20 0br 90pct pay_std",
+        "SAFMR 2020 2br",
+        "SAFMR20 2br 90pct pay_std",
+        "safmr20 2br 110pct pay_std",
+    ],
+    2021: [
+        "ZIP\nCode",
+        "HUD Area Code",
+        "HUD Fair Market Rent Area Name",
+        "2021 SAFMR\n0BR",
+        "2021 SAFMR\n2BR",
+        "SAFMR21\n2BR -\n90%\nPayment\nStandard",
+        "SAFMR21\n2BR -\n110%\nPayment\nStandard",
+    ],
+    2022: [
+        "ZIP\nCode",
+        "HUD Area Code",
+        "HUD Metro Fair Market Rent Area Name",
+        "SAFMR\n0BR",
+        "SAFMR\n2BR",
+        "SAFMR\n2BR -\n90%\nPayment\nStandard",
+        "SAFMR\n2BR -\n110%\nPayment\nStandard",
+    ],
+}
+
+
+@pytest.mark.parametrize("year", sorted(HEADERS))
+def test_each_year_detects_its_layout(year: int) -> None:
+    schema, mapping = schemas.detect(HEADERS[year], year)
+
+    assert schema is schemas.FMR_SCHEMAS[year]
+    assert list(mapping.values()) == ["zipcode", "fmr_2br", "fmr_2br_90", "fmr_2br_110"]
+    assert set(mapping) <= set(HEADERS[year])
+
+
+def test_headers_match_despite_spacing_and_case() -> None:
+    headers: list[str] = [
+        " ".join(header.split()).upper() + " " for header in HEADERS[2021]
+    ]
+
+    schema, mapping = schemas.detect(headers, 2021)
+
+    assert schema.name == "FY2021 SAFMR"
+    assert list(mapping)[1] == "2021 SAFMR 2BR "
+
+
+def test_reused_layouts_are_detected_for_other_years() -> None:
+    # FY2023 kept the FY2022 headers.
+    schema, _ = schemas.detect(HEADERS[2022], 2023)
+
+    assert schema is schemas.FMR_SCHEMAS[2022]
+
+
+def test_unknown_layouts_report_missing_columns() -> None:
+    headers: list[str] = [
+        header for header in HEADERS[2022] if header != "SAFMR\n2BR"
+    ] + ["SAFMR\n2 BR"]
+
+    with pytest.raises(ValueError, match="fy2022.xlsx") as error:
+        schemas.detect(headers, 2022, source="fy2022.xlsx")
+
+    message: str = str(error.value)
+    assert "Missing from the FY2022 SAFMR layout" in message
+    assert "fmr_2br: expected one of ['SAFMR\\n2BR']" in message
+    assert "closest: ['SAFMR\\n2 BR'" in message
+    assert "fmr_2br_90" not in message.split("Headers:")[0]
+
+
+def test_workbooks_are_read_by_detected_layout(fmr_workbooks: dict[int, Path]) -> None:
+    for year, path in fmr_workbooks.items():
+        assert schemas.detect(schemas.read_excel_header(path), year)[0].name == (
+            f"FY{year} SAFMR"
+        )
+        fmr: pd.DataFrame = etl_evict.load_fmr(path, year, cache=False)
+        assert list(fmr.columns) == schemas.FMR_SCHEMAS[year].names + ["fmr_year"]
+        assert fmr.zipcode.tolist() == [10001, 10002]
@@ -0,0 +1,171 @@
+import asyncio
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterator
+
+import pandas as pd
+import pytest
+
+from eviction_analysis import serve
+
+
+def write_merged(path: Path, filings: int) -> None:
+    """Merged rows of two boroughs with one fanned out observation."""
+    pd.DataFrame(
+        {
+            "city": "New York, NY",
+            "type": "Zip Code",
+            "geoid": [10451, 10451, 11226, 11226],
+            "racial_majority": "Black",
+            "month": pd.to_datetime(["2021-01-01"] * 3 + ["2021-02-01"]),
+            "filings_2020": [filings, filings, 2 * filings, 3 * filings],
+            "filings_avg": 1.0,
+            "borough": ["Bronx", "Bronx", "Brooklyn", "Brooklyn"],
+            "fmr_2br": [1800.0, 1900.0, 2200.0, 2300.0],
+            "fmr_2br_90": 0.0,
+            "fmr_2br_110": 0.0,
+        }
+    ).to_parquet(path)
+
+
+class Client:
+    """Keep-alive connection to a running server."""
+
+    def __init__(self, port: int) -> None:
+        self.connection = http.client.HTTPConnection(serve.HOST, port, timeout=5)
+
+    def get(
+        self, target: str, headers: dict[str, str] = {}
+    ) -> tuple[int, dict[str, str], Any]:
+        self.connection.request("GET", target, headers=headers)
+        response: http.client.HTTPResponse = self.connection.getresponse()
+        body: bytes = response.read()
+        return (
+            response.status,
+            dict(response.getheaders()),
+            json.loads(body) if body else None,
+        )
+
+
+async def cancel_tasks() -> None:
+    """Cancel every other task on the running loop and wait for them."""
+    tasks: set[asyncio.Task] = asyncio.all_tasks() - {asyncio.current_task()}
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@pytest.fixture
+def running(tmp_path: Path) -> Iterator[tuple[serve.Server, Client, Path]]:
+    """A server on its own thread over a merged file that reloads at once."""
+    path: Path = tmp_path / "merged.parquet"
+    write_merged(path, 1)
+    server: serve.Server = serve.Server(serve.Store(path, reload_interval=0))
+    with socket.socket() as probe:
+        probe.bind((serve.HOST, 0))
+        port: int = probe.getsockname()[1]
+
+    loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+    thread: threading.Thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    serving = asyncio.run_coroutine_threadsafe(server.serve(serve.HOST, port), loop)
+    for _ in range(100):
+        try:
+            socket.create_connection((serve.HOST, port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+
+    client: Client = Client(port)
+    yield server, client, path
+
+    client.connection.close()
+    # Cancel the server along with any connections it's still holding.
+    asyncio.run_coroutine_threadsafe(cancel_tasks(), loop).result(5)
+    assert serving.cancelled()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+def test_repeated_queries_are_answered_from_the_cache(
+    running: tuple[serve.Server, Client, Path], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    server, client, _ = running
+    calls: list[serve.Query] = []
+    run_query = serve.run_query
+
+    def counted(table: Any, query: serve.Query) -> list[dict[str, Any]]:
+        calls.append(query)
+        return run_query(table, query)
+
+    monkeypatch.setattr(serve, "run_query", counted)
+
+    status, headers, body = client.get(
+        "/query?by=borough&metrics=filings_2020,fmr_2br&year=2021"
+    )
+    assert status == 200
+    # The fanned out Bronx row's filings count once; its FMR counts.
+    assert body["rows"] == [
+        {
+            "borough": "Bronx",
+            "rows": 1,
+            "filings_2020_sum": 1,
+            "filings_2020_mean": 1.0,
+            "fmr_2br_sum": 3700.0,
+            "fmr_2br_mean": 1850.0,
+        },
+        {
+            "borough": "Brooklyn",
+            "rows": 2,
+            "filings_2020_sum": 5,
+            "filings_2020_mean": 2.5,
+            "fmr_2br_sum": 4500.0,
+            "fmr_2br_mean": 2250.0,
+        },
+    ]
+
+    # The same query spelled differently shares the entry.
+    again = client.get("/query?year=2021&metrics=filings_2020,fmr_2br&by=borough")
+    assert again == (200, again[1], body)
+    assert again[1]["ETag"] == headers["ETag"]
+    assert len(calls) == 1
+    assert server.stats()["cache_hits"] == 1
+
+    status, _, _ = client.get(
+        "/query?by=borough&metrics=filings_2020,fmr_2br&year=2021",
+        {"If-None-Match": headers["ETag"]},
+    )
+    assert status == 304
+    assert len(calls) == 1
+
+
+def test_replaced_data_is_never_answered_from_the_cache(
+    running: tuple[serve.Server, Client, Path],
+) -> None:
+    server, client, path = running
+    _, _, before = client.get("/query?metrics=filings_2020")
+
+    write_merged(path, 10)
+    # A new mtime even on coarse clocks
+    os.utime(path, ns=(time.time_ns() + 10**9,) * 2)
+    _, _, after = client.get("/query?metrics=filings_2020")
+
+    assert before["rows"][0]["filings_2020_sum"] == 6
+    assert after["rows"][0]["filings_2020_sum"] == 60
+    assert after["version"] != before["version"]
+    assert server.stats()["cache_hits"] == 0
+
+
+def test_bad_queries_are_rejected(running: tuple[serve.Server, Client, Path]) -> None:
+    _, client, _ = running
+
+    status, _, body = client.get("/query?by=county")
+
+    assert status == 400
+    assert "county" in body["error"]
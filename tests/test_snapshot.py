@@ -0,0 +1,90 @@
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pytest
+
+from eviction_analysis import snapshot
+
+
+@pytest.fixture
+def merged() -> pd.DataFrame:
+    """Merged rows with categoricals, nullable GEOIDs and compact floats."""
+    n: int = 1000
+    return pd.DataFrame(
+        {
+            "city": pd.Categorical(["New York, NY", "Boston, MA"] * (n // 2)),
+            "geoid": pd.array(np.arange(n) % 7 + 10001, dtype="Int64"),
+            "month": pd.date_range("2020-01-01", periods=n, freq="D"),
+            "filings_2020": np.arange(n, dtype=np.int64),
+            "fmr_2br": np.linspace(1500, 3000, n, dtype=np.float32),
+            "borough": pd.Categorical(["Bronx", None, "Queens", "Bronx"] * (n // 4)),
+        }
+    )
+
+
+@pytest.mark.parametrize("compression", [None, "lz4", "zstd"])
+def test_round_trip_keeps_dtypes(
+    merged: pd.DataFrame, tmp_path: Path, compression: Optional[str]
+) -> None:
+    path: Path = snapshot.write_snapshot(
+        merged, tmp_path / "merged.arrow", compression=compression, chunksize=100
+    )
+
+    restored: pd.DataFrame = snapshot.read_snapshot(path)
+
+    assert list(tmp_path.iterdir()) == [path]
+    pd.testing.assert_frame_equal(
+        restored.drop(columns="geoid"), merged.drop(columns="geoid")
+    )
+    assert restored.geoid.dtype == "category"
+    assert restored.geoid.astype("Int64").equals(merged.geoid)
+
+
+def test_batches_share_one_dictionary_per_column(
+    merged: pd.DataFrame, tmp_path: Path
+) -> None:
+    path: Path = snapshot.write_snapshot(
+        merged, tmp_path / "merged.arrow", chunksize=100
+    )
+
+    with ipc.open_file(path) as reader:
+        batches: list[pa.RecordBatch] = [
+            reader.get_batch(i) for i in range(reader.num_record_batches)
+        ]
+    assert len(batches) == 10
+    for col in ["city", "geoid", "borough"]:
+        assert pa.types.is_dictionary(batches[0].schema.field(col).type)
+        assert all(
+            batch.column(col).dictionary.equals(batches[0].column(col).dictionary)
+            for batch in batches
+        )
+
+
+def test_uncompressed_snapshots_load_without_copying(
+    merged: pd.DataFrame, tmp_path: Path
+) -> None:
+    path: Path = snapshot.write_snapshot(merged, tmp_path / "merged.arrow")
+    allocated: int = pa.total_allocated_bytes()
+
+    table: pa.Table = snapshot.load_snapshot(path, columns=["filings_2020"])
+
+    assert table.column_names == ["filings_2020"]
+    assert table.column(0).to_pylist()[-1] == len(merged) - 1
+    # The column points into the mapped file rather than Arrow's memory pool.
+    assert pa.total_allocated_bytes() == allocated
+
+
+def test_arrow_tables_are_encoded_too(merged: pd.DataFrame, tmp_path: Path) -> None:
+    table: pa.Table = pa.Table.from_pandas(
+        merged.astype({"city": str}), preserve_index=False
+    )
+
+    path: Path = snapshot.write_snapshot(table, tmp_path / "merged.arrow")
+
+    restored: pd.DataFrame = snapshot.read_snapshot(path, columns=["city"])
+    assert restored.city.dtype == "category"
+    assert restored.city.tolist() == merged.city.tolist()
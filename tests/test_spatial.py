@@ -0,0 +1,82 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import box
+
+from eviction_analysis import spatial
+
+
+def test_overlay_weights_sum_to_one() -> None:
+    # 10118 is a building zip code nested inside 10001, and 00083 is Central
+    # Park rather than a ZCTA.
+    zctas: gpd.GeoDataFrame = gpd.GeoDataFrame(
+        {"zipcode": np.array([83, 10001, 10002, 10118], dtype=np.int32)},
+        geometry=[
+            box(0, 2, 1, 3),
+            box(0, 0, 2, 2),
+            box(2, 0, 4, 2),
+            box(0.5, 0.5, 1, 1),
+        ],
+        crs=spatial.EQUAL_AREA,
+    )
+    tracts: gpd.GeoDataFrame = gpd.GeoDataFrame(
+        {"geoid": np.array([36061000100, 36061000200], dtype=np.int64)},
+        geometry=[box(0, 0, 1, 3), box(1, 0, 3, 2)],
+        crs=spatial.EQUAL_AREA,
+    )
+
+    weights: spatial.WeightMatrix = spatial.overlay(tracts, zctas)
+
+    assert 83 not in weights.zipcode
+    totals: np.ndarray = np.bincount(
+        np.unique(weights.geoid, return_inverse=True)[1], weights=weights.weight
+    )
+    np.testing.assert_allclose(totals, 1.0)
+
+    tract: np.ndarray = weights.geoid == 36061000100
+    np.testing.assert_array_equal(weights.zipcode[tract], [10001, 10118])
+    np.testing.assert_allclose(weights.weight[tract], [2 / 2.25, 0.25 / 2.25])
+
+
+def test_allocate_matches_a_weighted_groupby() -> None:
+    weights: spatial.WeightMatrix = spatial.WeightMatrix(
+        np.array([10001, 10002, 36061000100, 36061000100, 36061000200], np.int64),
+        np.array([10001, 10002, 10001, 10118, 10002], np.int32),
+        np.array([1.0, 1.0, 0.75, 0.25, 1.0]),
+    )
+    evictions: pd.DataFrame = pd.DataFrame(
+        {
+            "geoid": pd.array(
+                [10001, 36061000100, 36061000100, 36061000200, 2108, None],
+                dtype="Int64",
+            ),
+            "month": pd.to_datetime(
+                ["2020-01", "2020-01", "2020-02", "2020-02", "2020-01", "2020-01"]
+            ),
+            "filings_2020": [4.0, 8.0, np.nan, 2.0, 5.0, 1.0],
+        }
+    )
+
+    allocated: pd.DataFrame = spatial.allocate(
+        evictions, weights, values=["filings_2020"]
+    )
+
+    # Rows outside the matrix are dropped and missing filings count as zero.
+    expected: pd.DataFrame = (
+        evictions.astype({"geoid": "float64"})
+        .merge(
+            pd.DataFrame(
+                {
+                    "geoid": weights.geoid.astype("float64"),
+                    "zipcode": weights.zipcode,
+                    "weight": weights.weight,
+                }
+            ),
+            on="geoid",
+        )
+        .assign(filings_2020=lambda df: df.filings_2020.fillna(0) * df.weight)
+        .groupby(["zipcode", "month"], as_index=False)
+        .filings_2020.sum()
+    )
+    pd.testing.assert_frame_equal(allocated, expected, check_dtype=False)
+    assert allocated.filings_2020.sum() == 4.0 + 8.0 + 2.0
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from eviction_analysis import timeseries
+
+
+@pytest.fixture
+def monthly() -> pd.DataFrame:
+    """Two years of three GEOIDs with missing months and values."""
+    rng: np.random.Generator = np.random.default_rng(1)
+    months: pd.DatetimeIndex = pd.date_range("2020-01-01", "2021-12-01", freq="MS")
+    df: pd.DataFrame = pd.DataFrame(
+        {
+            "geoid": np.repeat([10001, 10002, 36061000100], len(months)),
+            "month": np.tile(months, 3),
+            "filings_2020": rng.integers(0, 20, 3 * len(months)).astype(float),
+            "filings_avg": rng.uniform(0, 10, 3 * len(months)),
+            "fmr_2br": np.repeat(rng.uniform(1500, 3000, 6), 12),
+        }
+    )
+    df.loc[rng.choice(len(df), 8, replace=False), "filings_2020"] = np.nan
+    # Shuffled, with gaps that windows and lags must not treat as neighbors
+    return df.drop(index=rng.choice(len(df), 10, replace=False)).sample(
+        frac=1, random_state=1
+    )
+
+
+def reference(df: pd.DataFrame) -> pd.DataFrame:
+    """The same features from a groupby over series reindexed to every month."""
+    months: pd.DatetimeIndex = pd.date_range(df.month.min(), df.month.max(), freq="MS")
+    features: list[pd.DataFrame] = []
+    for geoid, series in df.groupby("geoid"):
+        full: pd.DataFrame = series.set_index("month").reindex(months)
+        out: pd.DataFrame = pd.DataFrame(index=months)
+        for col in timeseries.VALUES:
+            for window in timeseries.WINDOWS:
+                out[f"{col}_roll{window}"] = (
+                    full[col].rolling(window, min_periods=1).mean()
+                )
+            for lag in timeseries.LAGS:
+                out[f"{col}_lag{lag}"] = full[col].shift(lag)
+        out["fmr_2br_yoy"] = full.fmr_2br / full.fmr_2br.shift(12) - 1
+        out["geoid"] = geoid
+        features.append(
+            out.loc[series.month.sort_values()].rename_axis("month").reset_index()
+        )
+    return pd.concat(features, ignore_index=True)
+
+
+def test_compute_matches_a_groupby(monthly: pd.DataFrame) -> None:
+    computed: pd.DataFrame = timeseries.compute(monthly)
+    expected: pd.DataFrame = reference(monthly)
+
+    assert computed[["geoid", "month"]].equals(expected[["geoid", "month"]])
+    for col in expected.columns.drop(["geoid", "month"]):
+        np.testing.assert_allclose(computed[col], expected[col], err_msg=col)
+    np.testing.assert_allclose(
+        computed.excess_filings, computed.filings_2020 - computed.filings_avg
+    )
+
+
+def test_append_matches_a_full_recompute(monthly: pd.DataFrame) -> None:
+    cutoff: pd.Timestamp = pd.Timestamp("2021-07-01")
+    history: pd.DataFrame = timeseries.compute(monthly.loc[monthly.month < cutoff])
+    # The last month of history is revised along with the new months.
+    new: pd.DataFrame = monthly.loc[monthly.month >= cutoff - pd.DateOffset(months=1)]
+    new = new.assign(filings_2020=new.filings_2020 + 1)
+
+    appended: pd.DataFrame = timeseries.append(history, new)
+
+    revised: pd.DataFrame = pd.concat(
+        [monthly.loc[monthly.month < cutoff - pd.DateOffset(months=1)], new]
+    )
+    pd.testing.assert_frame_equal(appended, timeseries.compute(revised))
+
+
+def test_duplicated_periods_are_rejected(monthly: pd.DataFrame) -> None:
+    with pytest.raises(ValueError, match="aren't unique"):
+        timeseries.compute(pd.concat([monthly, monthly.head(1)]))
@@ -0,0 +1,107 @@
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pytest
+
+from eviction_analysis import etl_evict, validate
+from eviction_analysis.etl_evict import Sources
+
+
+@pytest.fixture
+def evictions(eviction_csv: Path) -> pd.DataFrame:
+    """New York City rows without the sealed GEOID."""
+    df: pd.DataFrame = etl_evict.load_eviction(
+        eviction_csv, pyarrow=True, cities="New York, NY"
+    )
+    return df.loc[df.geoid.notna()]
+
+
+def statuses(validator: validate.Validator) -> dict[str, str]:
+    return {check.name: check.status for check in validator.checks}
+
+
+def test_a_clean_merge_passes(evictions: pd.DataFrame, sources: Sources) -> None:
+    validator: validate.Validator = validate.Validator()
+
+    etl_evict.merge_evic_fmr(evictions, sources=sources, validator=validator)
+
+    assert statuses(validator) == {
+        "sealed_share": "pass",
+        "crosswalk_hit_rate": "pass",
+        "fmr_schema_mismatches": "pass",
+        "fmr_hit_rate": "pass",
+        "fanout_ratio": "pass",
+        "fmr_coverage": "pass",
+        "neighborhood_fanout": "pass",
+        "neighborhood_hit_rate": "pass",
+        "dtype_drift": "info",
+        "null_shares": "info",
+    }
+    assert validator.report()["status"] == "pass"
+
+
+def test_a_bad_merge_fails_its_thresholds(
+    evictions: pd.DataFrame, sources: Sources, tmp_path: Path
+) -> None:
+    # 10002 lost its rents, and its only observation is in 2022.
+    fmrs: list[pd.DataFrame] = [fmr.loc[fmr.zipcode != 10002] for fmr in sources.fmrs]
+    validator: validate.Validator = validate.Validator()
+
+    etl_evict.merge_evic_fmr(
+        evictions, sources=sources._replace(fmrs=fmrs), validator=validator
+    )
+
+    assert [check.name for check in validator.failed] == [
+        "fmr_hit_rate",
+        "fmr_coverage",
+    ]
+    checks: dict[str, validate.Check] = {
+        check.name: check for check in validator.checks
+    }
+    assert checks["fmr_hit_rate"].value == 0.75
+    assert checks["fmr_hit_rate"].detail == {"observations": 4, "without_fmr": 1}
+    assert checks["fmr_coverage"].detail["by_year"] == {
+        "2020": 1.0,
+        "2021": 1.0,
+        "2022": 0.0,
+    }
+    # The zip code is still in the crosswalk.
+    assert checks["crosswalk_hit_rate"].status == "pass"
+
+    report: dict[str, Any] = validator.write(tmp_path / "quality.json")
+    assert report["status"] == "fail"
+    assert (tmp_path / "quality.json").exists()
+
+
+def test_dtype_drift_against_an_earlier_report(
+    evictions: pd.DataFrame, sources: Sources, tmp_path: Path
+) -> None:
+    first: validate.Validator = validate.Validator()
+    etl_evict.merge_evic_fmr(evictions, sources=sources, validator=first)
+    first.write(tmp_path / "quality.json")
+
+    second: validate.Validator = validate.Validator(
+        baseline=validate.load_baseline(tmp_path / "quality.json")
+    )
+    etl_evict.merge_evic_fmr(
+        evictions.astype({"filings_2020": "float64"}),
+        sources=sources,
+        validator=second,
+    )
+
+    assert [check.name for check in second.failed] == ["dtype_drift"]
+    assert second.failed[0].detail["changed"] == {"filings_2020": ["int64", "float64"]}
+
+
+def test_spent_budgets_skip_all_but_the_schema_checks(
+    evictions: pd.DataFrame, sources: Sources
+) -> None:
+    validator: validate.Validator = validate.Validator(budget=0.0)
+
+    etl_evict.merge_evic_fmr(evictions, sources=sources, validator=validator)
+
+    assert {
+        name for name, status in statuses(validator).items() if status != "skipped"
+    } == validate.UNBUDGETED
+    assert validator.report()["skipped"] == len(validator.checks) - 1